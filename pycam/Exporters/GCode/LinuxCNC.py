@@ -19,7 +19,7 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
 import pycam.Exporters.GCode
-from pycam.Toolpath import ToolpathPathMode
+from pycam.Toolpath import ArcPlane, ToolpathPathMode
 from pycam.workspace import LengthUnit
 
 
@@ -31,6 +31,11 @@ DEFAULT_HEADER = (("G40", "disable tool radius compensation"),
 
 DEFAULT_DIGITS = 6
 
+# the plane selection command and the names of the center offset axes for each arc plane
+ARC_PLANES = {ArcPlane.XY: ("G17", "XY plane", "IJ"),
+              ArcPlane.XZ: ("G18", "XZ plane", "IK"),
+              ArcPlane.YZ: ("G19", "YZ plane", "JK")}
+
 
 def _render_number(number):
     if int(number) == number:
@@ -79,6 +84,82 @@ class LinuxCNC(pycam.Exporters.GCode.BaseGenerator):
         if command.strip():
             self.add_command(command)
 
+    def add_straight_moves(self, moves):
+        """ write a sequence of straight moves at once
+
+        The output is identical to calling "add_move" for every single move.  But the lines are
+        collected and written in large chunks.
+        """
+        if not moves:
+            return
+        self.destination.write(self.format_straight_moves(
+            moves, self._get_cache("rapid_move", None), self._get_cache("position", None)))
+        self._cache["position"], self._cache["rapid_move"] = moves[-1]
+
+    @staticmethod
+    def format_straight_moves(moves, is_rapid_before, previous):
+        """ return the text of a sequence of straight moves
+
+        The modal state before the first move is given by "is_rapid_before" and "previous"
+        (the last position).  Positions with all three axes changing (the usual case) are
+        formatted in a single step.
+        """
+        linesep = os.linesep
+        lines = []
+        if previous is None:
+            previous = (None, None, None)
+        for position, is_rapid in moves:
+            if is_rapid_before != is_rapid:
+                prefix = "G0" if is_rapid else "G1"
+                is_rapid_before = is_rapid
+            else:
+                # improve gcode style
+                prefix = " "
+            if len(position) != 3:
+                components = [prefix]
+                previous = tuple(previous) + (None, ) * (len(position) - len(previous))
+                for (axis, value, last) in zip("XYZABCUVW", position, previous):
+                    if (last is None) or (last != value):
+                        components.append("%s%.6f" % (axis, value))
+                line = " ".join(components)
+            else:
+                x, y, z = position
+                last_x, last_y, last_z = previous[:3]
+                changed_x = (last_x is None) or (last_x != x)
+                changed_y = (last_y is None) or (last_y != y)
+                changed_z = (last_z is None) or (last_z != z)
+                if changed_x and changed_y and changed_z:
+                    line = "%s X%.6f Y%.6f Z%.6f" % (prefix, x, y, z)
+                else:
+                    line = prefix
+                    if changed_x:
+                        line += " X%.6f" % x
+                    if changed_y:
+                        line += " Y%.6f" % y
+                    if changed_z:
+                        line += " Z%.6f" % z
+            if line.strip():
+                lines.append(line)
+                lines.append(linesep)
+            previous = position
+        return "".join(lines)
+
+    def add_arc(self, coordinates, center, clockwise, plane):
+        plane_command, plane_comment, offset_axes = ARC_PLANES[plane]
+        if self._get_cache("arc_plane", None) != plane:
+            self.add_command(plane_command, plane_comment)
+            self._cache["arc_plane"] = plane
+        components = ["G2" if clockwise else "G3"]
+        previous = self._get_cache("position", [None] * len(coordinates))
+        for (axis, value, last) in zip("XYZ", coordinates, previous):
+            if (last is None) or (last != value):
+                components.append("%s%.6f" % (axis, value))
+        # the center is specified relative to the start position
+        for offset_axis in offset_axes:
+            index = "IJK".index(offset_axis)
+            components.append("%s%.6f" % (offset_axis, center[index] - previous[index]))
+        self.add_command(" ".join(components))
+
     def command_feedrate(self, feedrate):
         self.add_command("F%s" % _render_number(feedrate), "set feedrate")
 
@@ -17,15 +17,44 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import io
+
 import pycam.Utils.log
 import pycam.Toolpath.Filters
-from pycam.Toolpath import MOVE_STRAIGHT_RAPID, MACHINE_SETTING, COMMENT, MOVES_LIST
+from pycam.Utils.threading import run_in_parallel
+from pycam.Toolpath import MOVE_ARC, MOVE_STRAIGHT_RAPID, MACHINE_SETTING, COMMENT, MOVES_LIST
 
 _log = pycam.Utils.log.get_logger()
 
+# maximum number of consecutive straight moves to be passed to "add_straight_moves" at once
+# (this is also the minimum number of moves within a chunk formatted by a separate process)
+MOVES_BUFFER_SIZE = 10000
+# number of chunks to be formatted in parallel before writing them
+PARALLEL_CHUNKS_PER_BATCH = 16
+
+
+def _is_straight_move(step):
+    return (step.action in MOVES_LIST) and not ((step.action == MOVE_ARC)
+                                                and (step.center is not None))
+
+
+# We need to use a global function here - otherwise it does not work with
+# the multiprocessing Pool.
+def _get_chunk_text(chunk):
+    formatter, segments = chunk
+    # a segment is either the text of other steps (formatted before) or the arguments for the
+    # formatter of a sequence of straight moves
+    return "".join(segment if isinstance(segment, str) else formatter(*segment)
+                   for segment in segments)
+
 
 class BaseGenerator:
 
+    # Generators may implement a static method "format_straight_moves(moves, is_rapid_before,
+    # previous_position)" returning the text for a sequence of straight moves (see
+    # "add_straight_moves").  This allows parallel formatting.
+    format_straight_moves = None
+
     def __init__(self, destination, comment=None):
         if hasattr(destination, "write"):
             # assume that "destination" is something like a StringIO instance or an open file
@@ -59,6 +88,19 @@ class BaseGenerator:
     def add_move(self, coordinates, is_rapid=False):
         raise NotImplementedError("someone forgot to implement 'add_move'")
 
+    def add_arc(self, coordinates, center, clockwise, plane):
+        raise NotImplementedError("someone forgot to implement 'add_arc'")
+
+    def add_straight_moves(self, moves):
+        """ add a sequence of straight moves - each is given as a tuple (position, is_rapid)
+
+        Generators may override this method in order to process long sequences of moves faster.
+        """
+        for position, is_rapid in moves:
+            self.add_move(position, is_rapid)
+            self._cache["position"] = position
+            self._cache["rapid_move"] = is_rapid
+
     def add_footer(self):
         raise NotImplementedError("someone forgot to implement 'add_footer'")
 
@@ -67,29 +109,124 @@ class BaseGenerator:
         if self._close_stream_on_exit:
             self.destination.close()
 
-    def add_moves(self, moves, filters=None):
+    def add_moves(self, moves, filters=None, parallel=False):
+        """ filter and write the given moves
+
+        @param parallel: format long sequences of straight moves in parallel processes (only
+            available for generators providing "format_straight_moves")
+        """
         # combine both lists/tuples in a type-agnostic way
         all_filters = list(self._filters)
         if filters:
             all_filters.extend(filters)
-        filtered_moves = pycam.Toolpath.Filters.get_filtered_moves(moves, all_filters)
+        # the moves are processed one after another - "moves" may be a generator
+        filtered_moves = pycam.Toolpath.Filters.get_filtered_moves_stream(moves, all_filters)
+        if parallel and (self.format_straight_moves is not None):
+            self._add_moves_parallel(filtered_moves)
+            return
+        # consecutive straight moves are collected and written in batches
+        straight_moves = []
+        for step in filtered_moves:
+            if _is_straight_move(step):
+                straight_moves.append((step.position, step.action == MOVE_STRAIGHT_RAPID))
+                if len(straight_moves) >= MOVES_BUFFER_SIZE:
+                    self.add_straight_moves(straight_moves)
+                    straight_moves = []
+                continue
+            if straight_moves:
+                self.add_straight_moves(straight_moves)
+                straight_moves = []
+            self._add_step(step)
+        if straight_moves:
+            self.add_straight_moves(straight_moves)
+
+    def _add_step(self, step):
+        """ write a step except for straight moves """
+        if step.action == MOVE_ARC:
+            self.add_arc(step.position, step.center, step.clockwise, step.plane)
+            self._cache["position"] = step.position
+            # the next straight move needs to reset the modal motion mode
+            self._cache["rapid_move"] = None
+        elif step.action == COMMENT:
+            self.add_comment(step.text)
+        elif step.action == MACHINE_SETTING:
+            func_name = "command_%s" % step.key
+            if hasattr(self, func_name):
+                _log.debug("GCode: machine setting '%s': %s", step.key, step.value)
+                getattr(self, func_name)(step.value)
+                self._cache[step.key] = step.value
+                self._cache["rapid_move"] = None
+            else:
+                _log.warn("The current GCode exporter does not support the machine setting "
+                          "'%s=%s' -> ignore", step.key, step.value)
+        else:
+            _log.warn("A non-basic toolpath item (%s) remained in the queue -> ignore", step)
+
+    def _add_moves_parallel(self, filtered_moves):
+        """ split the moves into chunks, format them in parallel and write them in order
+
+        A chunk consists of sequences of straight moves (formatted by a separate process) and the
+        text of other steps in between (formatted directly).  The modal state (position and
+        rapid move) at the end of a sequence of straight moves is known without formatting it.
+        Thus it is handed over to the next sequence in advance.
+        The chunks are collected in batches of limited size.  Each batch is formatted in
+        parallel and written, before the next batch is collected.
+        """
+        chunks = []
+        for chunk in self._get_chunks(filtered_moves):
+            chunks.append(chunk)
+            if len(chunks) >= PARALLEL_CHUNKS_PER_BATCH:
+                self._write_chunks(chunks)
+                chunks = []
+        if chunks:
+            self._write_chunks(chunks)
+
+    def _get_chunks(self, filtered_moves):
+        segments = []
+        moves_count = 0
+        straight_moves = []
         for step in filtered_moves:
-            if step.action in MOVES_LIST:
-                is_rapid = step.action == MOVE_STRAIGHT_RAPID
-                self.add_move(step.position, is_rapid)
-                self._cache["position"] = step.position
-                self._cache["rapid_move"] = is_rapid
-            elif step.action == COMMENT:
-                self.add_comment(step.text)
-            elif step.action == MACHINE_SETTING:
-                func_name = "command_%s" % step.key
-                if hasattr(self, func_name):
-                    _log.debug("GCode: machine setting '%s': %s", step.key, step.value)
-                    getattr(self, func_name)(step.value)
-                    self._cache[step.key] = step.value
-                    self._cache["rapid_move"] = None
-                else:
-                    _log.warn("The current GCode exporter does not support the machine setting "
-                              "'%s=%s' -> ignore", step.key, step.value)
+            if _is_straight_move(step):
+                straight_moves.append((step.position, step.action == MOVE_STRAIGHT_RAPID))
+                if moves_count + len(straight_moves) >= MOVES_BUFFER_SIZE:
+                    segments.append(self._get_straight_moves_segment(straight_moves))
+                    yield (self.format_straight_moves, segments)
+                    segments = []
+                    moves_count = 0
+                    straight_moves = []
             else:
-                _log.warn("A non-basic toolpath item (%s) remained in the queue -> ignore", step)
+                if straight_moves:
+                    segments.append(self._get_straight_moves_segment(straight_moves))
+                    moves_count += len(straight_moves)
+                    straight_moves = []
+                segments.append(self._get_step_text(step))
+                if len(segments) >= MOVES_BUFFER_SIZE:
+                    # limit the size of chunks without straight moves, too
+                    yield (self.format_straight_moves, segments)
+                    segments = []
+                    moves_count = 0
+        if straight_moves:
+            segments.append(self._get_straight_moves_segment(straight_moves))
+        if segments:
+            yield (self.format_straight_moves, segments)
+
+    def _get_step_text(self, step):
+        """ render a step into a separate buffer """
+        destination = self.destination
+        self.destination = io.StringIO()
+        try:
+            self._add_step(step)
+            return self.destination.getvalue()
+        finally:
+            self.destination = destination
+
+    def _get_straight_moves_segment(self, straight_moves):
+        segment = (straight_moves, self._get_cache("rapid_move", None),
+                   self._get_cache("position", None))
+        # the modal state at the end of the sequence
+        self._cache["position"], self._cache["rapid_move"] = straight_moves[-1]
+        return segment
+
+    def _write_chunks(self, chunks):
+        for text in run_in_parallel(_get_chunk_text, chunks):
+            self.destination.write(text)
@@ -21,20 +21,33 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 import math
 import uuid
 
+try:
+    import numpy
+except ImportError:
+    # required for visualization and for slicing multiple levels at once
+    numpy = None
+
 from pycam.Geometry import epsilon, INFINITE, TransformableContainer, IDGenerator, Box3D, Point3D
 from pycam.Geometry.Matrix import TRANSFORMATIONS
 from pycam.Geometry.Line import Line
 from pycam.Geometry.Plane import Plane
 from pycam.Geometry.Polygon import Polygon
+from pycam.Geometry.PolygonBoolean import BooleanOperation, get_polygon_boolean
 from pycam.Geometry.PointUtils import pcross, pdist, pmul, pnorm, pnormalized, psub
+from pycam.Geometry.RTree import RTree
 from pycam.Geometry.Triangle import Triangle
 from pycam.Geometry.TriangleKdtree import TriangleKdtree
 from pycam.Toolpath import Bounds
 from pycam.Utils import ProgressCounter
+from pycam.Utils.threading import run_in_parallel
 import pycam.Utils.log
 log = pycam.Utils.log.get_logger()
 
 
+# number of consecutive levels sliced by one parallel job (see "Model.get_waterline_contours")
+SLICE_LEVELS_PER_JOB = 8
+
+
 def get_combined_bounds(models):
     low = [None, None, None]
     high = [None, None, None]
@@ -57,6 +70,65 @@ def get_combined_bounds(models):
         return Box3D(Point3D(*low), Point3D(*high))
 
 
+def _slice_triangles(args):
+    """ intersect triangles with horizontal planes
+
+    The result is equivalent to "Plane.intersect_triangle" (with "counter_clockwise" enabled)
+    applied to every triangle and every level.  Only the pairs of triangles and levels with
+    overlapping height ranges are processed.
+    We need to use a global function here - otherwise it does not work with the multiprocessing
+    Pool.
+    @param args: tuple of the corners of the triangles (count x 3 x 3), their normals
+        (count x 3) and the sorted heights of the levels
+    @returns: two arrays of start and end points and an array of the level index for each line
+        (sorted by level and the index of the triangle)
+    """
+    corners, normals, levels = args
+    vectors = numpy.roll(corners, -1, axis=1) - corners
+    lengths = numpy.sqrt((vectors ** 2).sum(axis=2))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        directions = vectors / lengths[:, :, None]
+    # the levels within the height range of each triangle
+    first_level = numpy.searchsorted(levels, corners[:, :, 2].min(axis=1) - epsilon, "left")
+    last_level = numpy.searchsorted(levels, corners[:, :, 2].max(axis=1) + epsilon, "right")
+    counts = numpy.maximum(last_level - first_level, 0)
+    triangles = numpy.repeat(numpy.arange(len(corners)), counts)
+    level_indices = (first_level[triangles] + numpy.arange(len(triangles))
+                     - numpy.repeat(numpy.cumsum(counts) - counts, counts))
+    heights = levels[level_indices][:, None]
+    starts = corners[triangles]
+    edge_directions = directions[triangles]
+    slopes = edge_directions[:, :, 2]
+    sloped = slopes != 0
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        distances = (heights - starts[:, :, 2]) / slopes
+    # the end of an edge is the start of the next edge - thus it is excluded
+    hits = sloped & (distances > -epsilon) & (distances < lengths[triangles] - epsilon)
+    # flat edges on the plane contribute their start point
+    flat = ~sloped & (abs(heights - starts[:, :, 2]) < epsilon)
+    points = numpy.where(flat[:, :, None], starts,
+                         starts + edge_directions * numpy.where(hits, distances, 0)[:, :, None])
+    hits |= flat
+    # exactly two collisions result in a line (three: the triangle lies on the plane)
+    valid = numpy.flatnonzero(hits.sum(axis=1) == 2)
+    first_edge = numpy.argmax(hits[valid], axis=1)
+    second_edge = 2 - numpy.argmax(hits[valid, ::-1], axis=1)
+    line_starts = points[valid, first_edge]
+    line_ends = points[valid, second_edge]
+    triangles = triangles[valid]
+    level_indices = level_indices[valid]
+    line_vectors = line_ends - line_starts
+    # lines run counter-clockwise around the material
+    normal_dots = (line_vectors[:, 0] * normals[triangles, 1]
+                   - line_vectors[:, 1] * normals[triangles, 0])
+    reverse = normal_dots >= 0
+    line_starts[reverse], line_ends[reverse] = line_ends[reverse], line_starts[reverse].copy()
+    # skip lines of zero length (e.g. a triangle touching the plane with one corner)
+    valid = (line_vectors ** 2).sum(axis=1) >= epsilon ** 2
+    order = numpy.argsort(level_indices[valid], kind="stable")
+    return (line_starts[valid][order], line_ends[valid][order], level_indices[valid][order])
+
+
 def get_combined_model(models):
     # remove all "None" models
     models = [model for model in models if model is not None]
@@ -284,7 +356,124 @@ class Model(BaseModel):
             return self._t_kdtree.search(minx, maxx, miny, maxy)
         return self._triangles
 
+    def get_mesh_arrays(self):
+        """ return the corners of all triangles and their smooth normals (e.g. for OpenGL)
+
+        The normal of a corner is the sum of the normals of all triangles sharing its vertex.
+        These normals are weighted by the area of their triangle and by their alignment with the
+        normal of the corner's own triangle.  Triangles facing away from the corner's triangle
+        (more than 90 degrees) are ignored.  Thus edges between perpendicular faces stay sharp.
+        @returns: two arrays (float32) of vertices (three per triangle in counter-clockwise
+            order) and normals
+        """
+        # The triangle's points are in clockwise order, but GL expects counter-clockwise sorting.
+        corners = numpy.array([(t.p1, t.p3, t.p2) for t in self._triangles],
+                              dtype=float).reshape(-1, 3, 3)
+        normals = numpy.array([t.normal[:3] for t in self._triangles], dtype=float).reshape(-1, 3)
+        lengths = numpy.sqrt((normals ** 2).sum(axis=1))
+        normals /= numpy.where(lengths > 0, lengths, 1)[:, numpy.newaxis]
+        areas = numpy.sqrt((numpy.cross(corners[:, 2] - corners[:, 0],
+                                        corners[:, 1] - corners[:, 0]) ** 2).sum(axis=1)) / 2
+        vertices = corners.reshape(-1, 3)
+        _, vertex_ids = numpy.unique(vertices, axis=0, return_inverse=True)
+        vertex_ids = vertex_ids.reshape(-1)
+        corner_count = len(vertex_ids)
+        vertex_count = vertex_ids.max() + 1 if corner_count else 0
+        # the corners grouped by their vertex
+        corners_by_vertex = numpy.argsort(vertex_ids, kind="stable")
+        group_sizes = numpy.bincount(vertex_ids, minlength=vertex_count)
+        group_starts = numpy.cumsum(group_sizes) - group_sizes
+        # all pairs of a corner and another corner (including itself) sharing its vertex
+        pair_counts = group_sizes[vertex_ids]
+        pair_corners = numpy.repeat(numpy.arange(corner_count), pair_counts)
+        pair_offsets = (numpy.arange(len(pair_corners))
+                        - numpy.repeat(numpy.cumsum(pair_counts) - pair_counts, pair_counts))
+        pair_faces = corners_by_vertex[group_starts[vertex_ids[pair_corners]] + pair_offsets] // 3
+        pair_normals = normals[pair_faces]
+        dots = (normals[pair_corners // 3] * pair_normals).sum(axis=1)
+        weights = numpy.maximum(dots, 0) * areas[pair_faces]
+        corner_normals = numpy.stack([numpy.bincount(pair_corners,
+                                                     weights=weights * pair_normals[:, index],
+                                                     minlength=corner_count)
+                                      for index in range(3)], axis=1)
+        corner_face_normals = numpy.repeat(normals, 3, axis=0)
+        lengths = numpy.sqrt((corner_normals ** 2).sum(axis=1))
+        # degenerate triangles keep their own normal
+        valid = lengths > epsilon
+        corner_normals[valid] /= lengths[valid, numpy.newaxis]
+        corner_normals[~valid] = corner_face_normals[~valid]
+        return vertices.astype(numpy.float32), corner_normals.astype(numpy.float32)
+
+    def get_waterline_contours(self, z_levels, callback=None):
+        """ slice the model with horizontal planes at the given heights
+
+        The result is the same as calling "get_waterline_contour" for every level.  But the
+        triangles are intersected with all levels in one pass: only the pairs of levels and
+        triangles with overlapping height ranges are processed (vectorized).  Ranges of
+        consecutive levels are sliced in parallel.
+        @returns: list of ContourModel instances (one for each level) or None (if cancelled)
+        """
+        planes = [Plane((0, 0, z), (0, 0, 1, 'v')) for z in z_levels]
+        if numpy is None:
+            # slow fallback: process one level after the other
+            contours = []
+            for plane in planes:
+                contour = self._get_waterline_contour_by_triangles(plane, callback=callback)
+                if contour is None:
+                    return None
+                contours.append(contour)
+            return contours
+        levels = numpy.unique(numpy.array(z_levels, dtype=float))
+        corners = numpy.array([(t.p1, t.p2, t.p3) for t in self._triangles],
+                              dtype=float).reshape(-1, 3, 3)
+        normals = numpy.array([t.normal[:3] for t in self._triangles],
+                              dtype=float).reshape(-1, 3)
+        lower = corners[:, :, 2].min(axis=1) - epsilon
+        upper = corners[:, :, 2].max(axis=1) + epsilon
+        jobs = []
+        for first in range(0, len(levels), SLICE_LEVELS_PER_JOB):
+            job_levels = levels[first:first + SLICE_LEVELS_PER_JOB]
+            relevant = (lower <= job_levels[-1]) & (upper >= job_levels[0])
+            jobs.append((corners[relevant], normals[relevant], job_levels))
+        progress_counter = ProgressCounter(len(jobs) + len(planes), callback)
+        lines_by_level = {}
+        for (starts, ends, level_indices), (_, _, job_levels) in zip(
+                run_in_parallel(_slice_triangles, jobs, callback=progress_counter.update), jobs):
+            boundaries = numpy.searchsorted(level_indices, numpy.arange(len(job_levels) + 1))
+            for index, height in enumerate(job_levels.tolist()):
+                begin, end = boundaries[index], boundaries[index + 1]
+                lines_by_level[height] = (starts[begin:end], ends[begin:end])
+            if progress_counter.increment():
+                return None
+        if len(lines_by_level) < len(levels):
+            # cancel requested
+            return None
+        contours = []
+        for plane, height in zip(planes, z_levels):
+            contour = ContourModel(plane=plane)
+            starts, ends = lines_by_level[float(height)]
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                contour.append(Line(tuple(start), tuple(end)))
+            contours.append(contour)
+            if progress_counter.increment():
+                return None
+        return contours
+
     def get_waterline_contour(self, plane, callback=None):
+        """ slice the model with a plane
+
+        Horizontal planes are processed via "get_waterline_contours" (vectorized).
+        """
+        normal = pnormalized(plane.n)
+        if (numpy is not None) and (abs(normal[0]) < epsilon) and (abs(normal[1]) < epsilon) \
+                and (normal[2] > 0):
+            contours = self.get_waterline_contours([plane.p[2]], callback=callback)
+            return None if contours is None else contours[0]
+        else:
+            return self._get_waterline_contour_by_triangles(plane, callback=callback)
+
+    def _get_waterline_contour_by_triangles(self, plane, callback=None):
+        """ intersect the triangles with the plane one by one """
         collision_lines = []
         progress_max = 2 * len(self._triangles)
         counter = 0
@@ -309,6 +498,14 @@ class Model(BaseModel):
         return contour
 
 
+def _get_point_key(point):
+    """ quantize a point for the endpoint index of a ContourModel
+
+    Intersections of adjacent triangles with a plane may differ by rounding errors.
+    """
+    return (round(point[0] / epsilon), round(point[1] / epsilon), round(point[2] / epsilon))
+
+
 class ContourModel(BaseModel):
 
     def __init__(self, plane=None):
@@ -319,19 +516,32 @@ class ContourModel(BaseModel):
             # the default plane points upwards along the z axis
             plane = Plane((0, 0, 0), (0, 0, 1, 'v'))
         self._plane = plane
-        self._line_groups = []
-        self._item_groups.append(self._line_groups)
+        # the polygons by their id (in insertion order) - thus merged polygons are removed quickly
+        self._line_groups = {}
+        self._item_groups.append(self._line_groups.values())
         # there is always just one plane
         self._plane_groups = [self._plane]
         self._item_groups.append(self._plane_groups)
         self._export_function = pycam.Exporters.SVGExporter.SVGExporterContourModel
+        self._endpoint_index = None
+        # closed polygons were added via "append" with "unify_overlaps" (see "_unify_overlaps")
+        self._unify_pending = False
 
     def __len__(self):
         """ Return the number of available items in the model.
         This is mainly useful for evaluating an empty model as False.
         """
+        self._unify_overlaps()
         return len(self._line_groups)
 
+    def __next__(self):
+        self._unify_overlaps()
+        yield from super().__next__()
+
+    def get_children_count(self):
+        self._unify_overlaps()
+        return super().get_children_count()
+
     def __iter__(self):
         yield from self.get_polygons()
 
@@ -341,73 +551,116 @@ class ContourModel(BaseModel):
             result.append(polygon.copy())
         return result
 
+    def reset_cache(self):
+        super().reset_cache()
+        # the polygons may have been transformed or reversed
+        self._endpoint_index = None
+
+    def _get_endpoint_index(self):
+        """ return the open polygons by the (quantized) keys of their first and last points
+
+        The index consists of two dictionaries (start points and end points) mapping a key to
+        the list of polygons.  It is built on demand and updated by "append".
+        """
+        if self._endpoint_index is None:
+            self._endpoint_index = ({}, {})
+            for polygon in self._line_groups.values():
+                self._register_endpoints(polygon)
+        return self._endpoint_index
+
+    def _register_endpoints(self, polygon):
+        if (self._endpoint_index is None) or polygon.is_closed or not polygon:
+            return
+        starts, ends = self._endpoint_index
+        first, last = polygon.get_endpoints()
+        starts.setdefault(_get_point_key(first), []).append(polygon)
+        ends.setdefault(_get_point_key(last), []).append(polygon)
+
+    def _unregister_endpoints(self, polygon):
+        if (self._endpoint_index is None) or polygon.is_closed or not polygon:
+            return
+        for table, point in zip(self._endpoint_index, polygon.get_endpoints()):
+            candidates = table.get(_get_point_key(point), [])
+            if polygon in candidates:
+                candidates.remove(polygon)
+
+    def _find_polygon(self, is_start, key, excluded=None):
+        """ find an open polygon starting (or ending) at the given point key
+
+        The most recently registered polygon is preferred.  Polygons changed outside of the
+        model (e.g. reversed) are skipped.
+        """
+        candidates = self._get_endpoint_index()[1 - int(is_start)].get(key)
+        if candidates:
+            for polygon in reversed(candidates):
+                if (polygon is not excluded) and not polygon.is_closed \
+                        and (_get_point_key(polygon.get_endpoints()[1 - int(is_start)]) == key):
+                    return polygon
+        return None
+
+    def _connect_points(self, polygon, points, at_end):
+        """ extend a polygon by a sequence of points
+
+        The first (or last for "at_end=False") point of the sequence is expected to match the
+        end (or start) of the polygon.  Points matching the other end of the polygon are replaced
+        by this point - thus the polygon is closed without rounding errors.
+        """
+        first, last = polygon.get_endpoints()
+        if at_end:
+            previous = last
+            for point in points[1:]:
+                if _get_point_key(point) == _get_point_key(first):
+                    point = first
+                if pdist(previous, point) >= epsilon:
+                    polygon.append(Line(previous, point))
+                    previous = point
+                if polygon.is_closed:
+                    break
+        else:
+            following = first
+            for point in reversed(points[:-1]):
+                if _get_point_key(point) == _get_point_key(last):
+                    point = last
+                if pdist(point, following) >= epsilon:
+                    polygon.append(Line(point, following))
+                    following = point
+                if polygon.is_closed:
+                    break
+
     def _merge_polygon_if_possible(self, other_polygon, allow_reverse=False):
         """ Check if the given 'other_polygon' can be connected to another
         polygon of the the current model. Both polygons are merged if possible.
         This function should be called after any "append" event, if the lines to
         be added are given in a random order (e.g. by the "waterline" function).
+        The polygons are found via the endpoint index (see "_get_endpoint_index").
         """
-        if other_polygon.is_closed:
-            return
-        connectors = []
-        connectors.append(other_polygon.get_points()[0])
-        connectors.append(other_polygon.get_points()[-1])
-        # filter all polygons that can be combined with 'other_polygon'
-        connectables = []
-        for lg in self._line_groups:
-            if lg is other_polygon:
-                continue
-            for connector in connectors:
-                if lg.is_connectable(connector):
-                    connectables.append(lg)
-                    break
-        # merge 'other_polygon' with all other connectable polygons
-        for polygon in connectables:
-            # check again, if the polygon is still connectable
-            for connector in connectors:
-                if polygon.is_connectable(connector):
-                    break
-            else:
-                # skip this polygon
-                continue
-            if other_polygon.get_points()[-1] == polygon.get_points()[0]:
-                for line in polygon.get_lines():
-                    if other_polygon.is_closed:
-                        return
-                    other_polygon.append(line)
-                self._line_groups.remove(polygon)
-            elif other_polygon.get_points()[0] == polygon.get_points()[-1]:
-                lines = polygon.get_lines()
-                lines.reverse()
-                for line in lines:
-                    if other_polygon.is_closed:
-                        return
-                    other_polygon.append(line)
-                self._line_groups.remove(polygon)
-            elif allow_reverse:
-                if other_polygon.get_points()[-1] == polygon.get_points()[-1]:
-                    polygon.reverse_direction()
-                    for line in polygon.get_lines():
-                        if other_polygon.is_closed:
-                            return
-                        other_polygon.append(line)
-                    self._line_groups.remove(polygon)
-                elif other_polygon.get_points()[0] == polygon.get_points()[0]:
-                    polygon.reverse_direction()
-                    lines = polygon.get_lines()
-                    lines.reverse()
-                    for line in lines:
-                        if other_polygon.is_closed:
-                            return
-                        other_polygon.append(line)
-                    self._line_groups.remove(polygon)
-                else:
-                    pass
-            else:
-                pass
-            if other_polygon.is_closed:
-                # we are finished
-                return
+        self._unregister_endpoints(other_polygon)
+        while not other_polygon.is_closed:
+            first, last = other_polygon.get_endpoints()
+            start_key, end_key = _get_point_key(first), _get_point_key(last)
+            # the end of 'other_polygon' matches the start of another polygon (or vice versa)
+            polygon = self._find_polygon(True, end_key, excluded=other_polygon)
+            at_end = True
+            reverse = False
+            if polygon is None:
+                polygon = self._find_polygon(False, start_key, excluded=other_polygon)
+                at_end = False
+            if (polygon is None) and allow_reverse:
+                reverse = True
+                polygon = self._find_polygon(False, end_key, excluded=other_polygon)
+                at_end = True
+                if polygon is None:
+                    polygon = self._find_polygon(True, start_key, excluded=other_polygon)
+                    at_end = False
+            if polygon is None:
+                break
+            self._unregister_endpoints(polygon)
+            del self._line_groups[id(polygon)]
+            points = polygon.get_points()
+            if reverse:
+                points.reverse()
+            self._connect_points(other_polygon, points, at_end)
+        self._register_endpoints(other_polygon)
 
     def append(self, item, unify_overlaps=False, allow_reverse=False):
         super().append(item)
@@ -415,89 +668,118 @@ class ContourModel(BaseModel):
             item_list = [item]
             if allow_reverse:
                 item_list.append(Line(item.p2, item.p1))
-            found = False
-            # Going back from the end to start. The last line_group always has
-            # the highest chance of being suitable for the next line.
-            line_group_indexes = range(len(self._line_groups) - 1, -1, -1)
-            for line_group_index in line_group_indexes:
-                line_group = self._line_groups[line_group_index]
-                for candidate in item_list:
-                    if line_group.is_connectable(candidate):
-                        line_group.append(candidate)
-                        self._merge_polygon_if_possible(line_group, allow_reverse=allow_reverse)
-                        found = True
-                        break
-                if found:
+            # The endpoint index delivers the connectable polygons (with an expected constant
+            # effort).  A line is appended to the end of a polygon or prepended to its start.
+            for candidate in item_list:
+                start_key = _get_point_key(candidate.p1)
+                end_key = _get_point_key(candidate.p2)
+                line_group = self._find_polygon(False, start_key)
+                if line_group is not None:
+                    self._unregister_endpoints(line_group)
+                    self._connect_points(line_group, (candidate.p1, candidate.p2), True)
+                    self._merge_polygon_if_possible(line_group, allow_reverse=allow_reverse)
+                    break
+                line_group = self._find_polygon(True, end_key)
+                if line_group is not None:
+                    self._unregister_endpoints(line_group)
+                    self._connect_points(line_group, (candidate.p1, candidate.p2), False)
+                    self._merge_polygon_if_possible(line_group, allow_reverse=allow_reverse)
                     break
             else:
                 # add a single line as part of a new group
                 new_line_group = Polygon(plane=self._plane)
                 new_line_group.append(item)
-                self._line_groups.append(new_line_group)
+                self._line_groups[id(new_line_group)] = new_line_group
+                self._register_endpoints(new_line_group)
         elif isinstance(item, Polygon):
             if not unify_overlaps or (len(self._line_groups) == 0):
-                self._line_groups.append(item)
+                self._line_groups[id(item)] = item
+                self._register_endpoints(item)
                 for subitem in next(item):
                     self._update_limits(subitem)
             else:
-                # go through all polygons and check if they can be combined
-                is_outer = item.is_outer()
-                new_queue = [item]
-                processed_polygons = []
-                queue = self.get_polygons()
-                while len(queue) > 0:
-                    polygon = queue.pop()
-                    if polygon.is_outer() != is_outer:
-                        processed_polygons.append(polygon)
-                    else:
-                        processed = []
-                        while len(new_queue) > 0:
-                            new = new_queue.pop()
-                            if new.is_polygon_inside(polygon):
-                                # "polygon" is obsoleted by "new"
-                                processed.extend(new_queue)
-                                break
-                            elif polygon.is_polygon_inside(new):
-                                # "new" is obsoleted by "polygon"
-                                continue
-                            elif not new.is_overlap(polygon):
-                                processed.append(new)
-                                continue
-                            else:
-                                union = polygon.union(new)
-                                if union:
-                                    for p in union:
-                                        if p.is_outer() == is_outer:
-                                            new_queue.append(p)
-                                        else:
-                                            processed_polygons.append(p)
-                                else:
-                                    processed.append(new)
-                                break
-                        else:
-                            processed_polygons.append(polygon)
-                        new_queue = processed
-                while len(self._line_groups) > 0:
-                    self._line_groups.pop()
-                log.info("Processed polygons: %s", [len(p.get_lines())
-                                                    for p in processed_polygons])
-                log.info("New queue: %s", [len(p.get_lines()) for p in new_queue])
-                for processed_polygon in processed_polygons + new_queue:
-                    self._line_groups.append(processed_polygon)
-                # TODO: this is quite expensive - can we do it differently?
-                self.reset_cache()
+                # the new polygon is merged with all overlapping closed polygons later
+                self._line_groups[id(item)] = item
+                self._unify_pending = True
+                # the merged polygons do not exceed the previous limits (including the new item)
+                for subitem in next(item):
+                    self._update_limits(subitem)
         else:
             # ignore any non-supported items (they are probably handled by a
             # parent class)
             pass
 
+    def _unify_overlaps(self):
+        """ merge the overlapping closed polygons (see "union")
+
+        Polygons added via "append" with "unify_overlaps" are collected and merged in a single
+        pass, before the polygons of the model are accessed.
+        """
+        if not self._unify_pending:
+            return
+        self._unify_pending = False
+        merged = self._get_boolean_result(None, BooleanOperation.UNION)
+        open_polygons = [polygon for polygon in self._line_groups.values()
+                         if not polygon.is_closed]
+        self._line_groups.clear()
+        for polygon in open_polygons + merged.get_polygons():
+            self._line_groups[id(polygon)] = polygon
+
+    def _get_boolean_result(self, other, operation):
+        """ combine the closed polygons of this model with the closed polygons of another model
+
+        Open polygons are ignored.  Overlapping polygons of the same model are merged.
+        See "pycam.Geometry.PolygonBoolean" for details.
+        """
+        closed_polygons = [polygon for polygon in self.get_polygons() if polygon.is_closed]
+        if closed_polygons:
+            z = closed_polygons[0].get_points()[0][2]
+        else:
+            z = self._plane.p[2]
+        subject = [[(point[0], point[1]) for point in polygon.get_points()]
+                   for polygon in closed_polygons]
+        if other is None:
+            clip = []
+        else:
+            clip = [[(point[0], point[1]) for point in polygon.get_points()]
+                    for polygon in other.get_polygons() if polygon.is_closed]
+        result = ContourModel(plane=self._plane.copy())
+        for contour in get_polygon_boolean(subject, clip, operation):
+            polygon = Polygon(plane=result._plane)
+            points = [(x, y, z) for x, y in contour]
+            previous = points[-1]
+            for point in points:
+                # skip tiny fragments caused by rounding errors
+                if pdist(previous, point) >= epsilon:
+                    polygon.append(Line(previous, point))
+                    previous = point
+            if polygon.is_closed:
+                result.append(polygon)
+        return result
+
+    def union(self, other=None):
+        """ return a new model covering the area of both models
+
+        Without "other" the overlapping polygons of this model are merged.
+        """
+        return self._get_boolean_result(other, BooleanOperation.UNION)
+
+    def difference(self, other):
+        """ return a new model covering the area of this model outside of the other model """
+        return self._get_boolean_result(other, BooleanOperation.DIFFERENCE)
+
+    def intersection(self, other):
+        """ return a new model covering the area shared by both models """
+        return self._get_boolean_result(other, BooleanOperation.INTERSECTION)
+
     def get_polygons(self, z=None, ignore_below=True):
+        self._unify_overlaps()
         if z is None:
-            return self._line_groups
+            return list(self._line_groups.values())
         elif ignore_below:
-            return [group for group in self._line_groups if group.minz == z]
+            return [group for group in self._line_groups.values() if group.minz == z]
         else:
-            return [group for group in self._line_groups if group.minz <= z]
+            return [group for group in self._line_groups.values() if group.minz <= z]
 
     def revise_directions(self, callback=None):
         """ Go through all open polygons and try to merge them regardless of
@@ -516,7 +798,8 @@ class ContourModel(BaseModel):
             progress_callback = None
         # try to connect all open polygons
         for poly in open_polygons:
-            self._line_groups.remove(poly)
+            self._unregister_endpoints(poly)
+            del self._line_groups[id(poly)]
         poly_open_before = len(open_polygons)
         for poly in open_polygons:
             for line in poly.get_lines():
@@ -536,17 +819,24 @@ class ContourModel(BaseModel):
             # shift the counter back by the number of new closed polygons
             progress_callback(2 * (number_of_initial_closed_polygons - len(remaining_polys)))
         remaining_polys.sort(key=lambda poly: abs(poly.get_area()))
-        while remaining_polys:
+        # only polygons with overlapping bounding boxes may contain each other
+        tree = RTree(((poly.minx, poly.miny, poly.maxx, poly.maxy), index)
+                     for index, poly in enumerate(remaining_polys))
+        outer_flags = {}
+        for index in range(len(remaining_polys) - 1, -1, -1):
             # pick the largest polygon
-            current = remaining_polys.pop()
+            current = remaining_polys[index]
             # start with the smallest finished polygon
-            for comp, is_outer in finished:
-                if comp.is_polygon_inside(current):
-                    finished.insert(0, (current, not is_outer))
+            candidates = sorted(other for other in tree.get_overlapping(
+                (current.minx, current.miny, current.maxx, current.maxy)) if other > index)
+            for other in candidates:
+                if remaining_polys[other].is_polygon_inside(current):
+                    outer_flags[index] = not outer_flags[other]
                     break
             else:
                 # no enclosing polygon was found
-                finished.insert(0, (current, True))
+                outer_flags[index] = True
+            finished.insert(0, (current, outer_flags[index]))
             if progress_callback and progress_callback():
                 return
         # Adjust the directions of all polygons according to the result
@@ -568,7 +858,7 @@ class ContourModel(BaseModel):
                                                             callback).increment
         else:
             progress_callback = None
-        for polygon in self._line_groups:
+        for polygon in self.get_polygons():
             polygon.reverse_direction()
             if progress_callback and progress_callback():
                 self.reset_cache()
@@ -587,7 +877,7 @@ class ContourModel(BaseModel):
 
     def get_cropped_model(self, minx, maxx, miny, maxy, minz, maxz):
         new_line_groups = []
-        for group in self._line_groups:
+        for group in self.get_polygons():
             new_groups = group.get_cropped_polygons(minx, maxx, miny, maxy, minz, maxz)
             if new_groups is not None:
                 new_line_groups.extend(new_groups)
@@ -612,8 +902,8 @@ class ContourModel(BaseModel):
         """ do a spherical extrusion of a 2D model.
         This is mainly useful for extruding text in a visually pleasant way ...
         """
-        outer_polygons = [(poly, []) for poly in self._line_groups if poly.is_outer()]
-        for poly in self._line_groups:
+        outer_polygons = [(poly, []) for poly in self.get_polygons() if poly.is_outer()]
+        for poly in self.get_polygons():
             # ignore open polygons
             if not poly.is_closed:
                 continue
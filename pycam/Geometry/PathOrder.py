@@ -0,0 +1,281 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import itertools
+import math
+import time
+
+from pycam.Geometry import epsilon
+from pycam.Geometry.PointGrid import PointGrid, get_grid_cell_size
+
+
+# number of neighbours to be considered for improving the order
+CANDIDATE_COUNT = 8
+# maximum number of improvement passes
+MAX_PASSES = 4
+# maximum length of a chain of items, that is moved by the "or-opt" step
+MAX_CHAIN_LENGTH = 3
+
+
+def _get_distance(p1, p2):
+    return math.hypot(p2[0] - p1[0], p2[1] - p1[1])
+
+
+def get_route_length(starts, ends, order, start_position=None):
+    """ calculate the summed (x/y) distance of the transitions between the ordered items """
+    result = 0
+    position = start_position
+    for index in order:
+        if position is not None:
+            result += _get_distance(position, starts[index])
+        position = ends[index]
+    return result
+
+
+def _get_dependents(predecessors):
+    """ invert the precedence constraints: list the items waiting for each item """
+    dependents = [[] for _ in predecessors]
+    for index, item_predecessors in enumerate(predecessors):
+        for predecessor in item_predecessors:
+            dependents[predecessor].append(index)
+    return dependents
+
+
+def get_nearest_neighbour_order(starts, ends, start_position=None, predecessors=None):
+    """ pick the items greedily: always continue with the one starting next to the current end
+
+    Without a start position the first item is kept in front (the first available item, if
+    precedence constraints are given).
+    Precedence constraints ("predecessors") contain a collection of item indices for every item.
+    These items need to be picked before.  Only items without pending predecessors are
+    available - thus the nesting levels of the items are processed as a topological order.
+    """
+    count = len(starts)
+    if count == 0:
+        return []
+    if predecessors is None:
+        grid = PointGrid(get_grid_cell_size(starts), enumerate(starts))
+    else:
+        dependents = _get_dependents(predecessors)
+        pending_counts = [len(item_predecessors) for item_predecessors in predecessors]
+        grid = PointGrid(get_grid_cell_size(starts),
+                         [(index, starts[index]) for index in range(count)
+                          if pending_counts[index] == 0])
+
+    def pick(index):
+        grid.remove(index)
+        order.append(index)
+        if predecessors is not None:
+            for dependent in dependents[index]:
+                pending_counts[dependent] -= 1
+                if pending_counts[dependent] == 0:
+                    grid.add(dependent, starts[dependent])
+
+    order = []
+    if start_position is None:
+        pick(min(index for index in range(count) if index in grid))
+        position = ends[order[0]]
+    else:
+        position = start_position
+    while len(grid) > 0:
+        index = grid.get_nearest(position)
+        pick(index)
+        position = ends[index]
+    if len(order) < count:
+        raise ValueError("The precedence constraints of the items contain a cycle")
+    return order
+
+
+def improve_order(starts, ends, order, start_position=None, max_passes=MAX_PASSES,
+                  predecessors=None, time_limit=None):
+    """ shorten the transitions between items via "2-opt" and "or-opt" steps
+
+    The items are directed (e.g. toolpath segments with a start and an end).  They are never
+    reversed - thus the "2-opt" step needs to take the changed direction of all transitions
+    within the reversed part of the order into account.  Candidate moves are limited to the
+    nearest neighbours of each transition.
+    The first item stays in place if no start position is given.
+    Moves violating the precedence constraints (see "get_nearest_neighbour_order") are skipped.
+    The improvement stops after "time_limit" seconds (if given) instead of "max_passes".  Every
+    step shortens the route - thus the result is never worse than the given order.
+    """
+    order = list(order)
+    count = len(order)
+    if count < 3:
+        return order
+    deadline = None if time_limit is None else time.time() + time_limit
+    cell_size = get_grid_cell_size(starts)
+    start_grid = PointGrid(cell_size, enumerate(starts))
+    end_grid = PointGrid(cell_size, enumerate(ends))
+    candidate_count = min(CANDIDATE_COUNT, count)
+    start_candidates = {}
+    end_candidates = {}
+
+    def get_starts_near(point_index):
+        # the nearest item starts next to the end of the given item
+        if point_index not in start_candidates:
+            start_candidates[point_index] = start_grid.get_nearest_keys(
+                ends[point_index] if point_index is not None else start_position,
+                candidate_count)
+        return start_candidates[point_index]
+
+    def get_ends_near(point_index):
+        if point_index not in end_candidates:
+            end_candidates[point_index] = end_grid.get_nearest_keys(starts[point_index],
+                                                                    candidate_count)
+        return end_candidates[point_index]
+
+    def link(before, after):
+        """ distance between the end of "before" and the start of "after" (both are positions
+        within the order)
+        """
+        if after >= count:
+            return 0
+        elif before < 0:
+            if start_position is None:
+                return 0
+            return _get_distance(start_position, starts[order[after]])
+        else:
+            return _get_distance(ends[order[before]], starts[order[after]])
+
+    def get_prefix_sums():
+        forward = [0] * count
+        backward = [0] * count
+        for index in range(1, count):
+            first, second = order[index - 1], order[index]
+            forward[index] = forward[index - 1] + _get_distance(ends[first], starts[second])
+            backward[index] = backward[index - 1] + _get_distance(ends[second], starts[first])
+        return forward, backward
+
+    def has_predecessors_within(items, first, last):
+        """ check if one of the items depends on an item within the given range of positions """
+        return any(first <= positions[predecessor] <= last
+                   for item in items for predecessor in predecessors[item])
+
+    def is_reversible(first, last):
+        if predecessors is None:
+            return True
+        return not has_predecessors_within(order[first:last + 1], first, last)
+
+    def is_movable(first, last, target):
+        """ check if the chain between "first" and "last" may be moved behind "target" """
+        if predecessors is None:
+            return True
+        if target > last:
+            # the skipped items must not depend on the chain
+            return not has_predecessors_within(order[last + 1:target + 1], first, last)
+        else:
+            # the chain must not depend on the skipped items
+            return not has_predecessors_within(order[first:last + 1], target + 1, first - 1)
+
+    def is_expired():
+        return (deadline is not None) and (time.time() > deadline)
+
+    # the first item is fixed, if there is no defined start position
+    first_movable = 0 if start_position is not None else 1
+    for _ in (range(max_passes) if deadline is None else itertools.count()):
+        improved = False
+        # 2-opt: reverse the order of the items between "first" and "last"
+        positions = {item: index for index, item in enumerate(order)}
+        forward, backward = get_prefix_sums()
+        for first in range(first_movable, count - 1):
+            if is_expired():
+                return order
+            previous = order[first - 1] if first > 0 else None
+            for candidate in get_starts_near(previous):
+                last = positions[candidate]
+                if last <= first:
+                    continue
+                old_cost = (link(first - 1, first) + forward[last] - forward[first]
+                            + link(last, last + 1))
+                new_cost = ((_get_distance(ends[previous], starts[order[last]])
+                             if previous is not None
+                             else _get_distance(start_position, starts[order[last]]))
+                            + backward[last] - backward[first]
+                            + (_get_distance(ends[order[first]], starts[order[last + 1]])
+                               if last + 1 < count else 0))
+                if (new_cost < old_cost - epsilon) and is_reversible(first, last):
+                    order[first:last + 1] = reversed(order[first:last + 1])
+                    positions = {item: index for index, item in enumerate(order)}
+                    forward, backward = get_prefix_sums()
+                    improved = True
+                    break
+        # or-opt: move a short chain of items to a different location
+        positions = {item: index for index, item in enumerate(order)}
+        for chain_length in range(1, MAX_CHAIN_LENGTH + 1):
+            first = first_movable
+            while first + chain_length <= count:
+                if is_expired():
+                    return order
+                last = first + chain_length - 1
+                removal_gain = (link(first - 1, first) + link(last, last + 1)
+                                - link(first - 1, last + 1))
+                best = None
+                for candidate in get_ends_near(order[first]):
+                    target = positions[candidate]
+                    if first - 1 <= target <= last:
+                        continue
+                    if target + 1 < count:
+                        following = _get_distance(ends[order[last]], starts[order[target + 1]])
+                    else:
+                        following = 0
+                    insertion_cost = (link(target, first) + following
+                                      - link(target, target + 1))
+                    gain = removal_gain - insertion_cost
+                    if (gain > epsilon) and ((best is None) or (gain > best[0])) \
+                            and is_movable(first, last, target):
+                        best = (gain, target)
+                if best is None:
+                    first += 1
+                else:
+                    target = best[1]
+                    chain = order[first:last + 1]
+                    if target > last:
+                        order[target + 1:target + 1] = chain
+                        del order[first:last + 1]
+                    else:
+                        del order[first:last + 1]
+                        order[target + 1:target + 1] = chain
+                    positions = {item: index for index, item in enumerate(order)}
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def get_optimized_order(starts, ends, start_position=None, predecessors=None, time_limit=None):
+    """ sort directed items (defined by start and end positions) for short transitions
+
+    The result is a list of indices.  The original order is returned, if the optimization does
+    not lead to a shorter route.  Otherwise the route is never longer than the greedy
+    (nearest neighbour) route.
+    The precedence constraints ("predecessors") are respected by the result (see
+    "get_nearest_neighbour_order").  The original order needs to fulfill them, too.
+    The improvement of the greedy route stops after "time_limit" seconds (if given).
+    """
+    original = list(range(len(starts)))
+    if len(starts) < 2:
+        return original
+    order = get_nearest_neighbour_order(starts, ends, start_position=start_position,
+                                        predecessors=predecessors)
+    order = improve_order(starts, ends, order, start_position=start_position,
+                          predecessors=predecessors, time_limit=time_limit)
+    if (get_route_length(starts, ends, order, start_position)
+            < get_route_length(starts, ends, original, start_position) - epsilon):
+        return order
+    else:
+        return original
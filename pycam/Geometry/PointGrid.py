@@ -0,0 +1,146 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import heapq
+import math
+
+
+def get_xy_distance(p1, p2):
+    return math.hypot(p2[0] - p1[0], p2[1] - p1[1])
+
+
+def get_grid_cell_size(points):
+    """ guess a suitable cell size for a grid containing the given points
+
+    Roughly one point per cell is the goal.
+    """
+    points = list(points)
+    if not points:
+        return 1.0
+    width = max(p[0] for p in points) - min(p[0] for p in points)
+    height = max(p[1] for p in points) - min(p[1] for p in points)
+    area = width * height
+    if area > 0:
+        return math.sqrt(area / len(points))
+    elif max(width, height) > 0:
+        return max(width, height) / len(points)
+    else:
+        return 1.0
+
+
+class PointGrid:
+    """ uniform grid of points (only x/y are used) for nearest neighbour queries
+
+    Every point is stored together with a unique key.  Points can be removed again - this is
+    useful for greedy algorithms picking one point after another.
+    The points are sorted into cells by their x/y coordinates.  A different distance function
+    (e.g. including the z axis) may be used, if it is never shorter than the x/y distance.
+    """
+
+    def __init__(self, cell_size, items=None, get_distance=get_xy_distance):
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.get_distance = get_distance
+        self._cells = {}
+        self._points = {}
+        self._cell_range = None
+        if items:
+            for key, point in items:
+                self.add(key, point)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _get_cell(self, point):
+        return (int(math.floor(point[0] / self.cell_size)),
+                int(math.floor(point[1] / self.cell_size)))
+
+    def add(self, key, point):
+        if key in self._points:
+            self.remove(key)
+        cell = self._get_cell(point)
+        self._cells.setdefault(cell, {})[key] = point
+        self._points[key] = point
+        if self._cell_range is None:
+            self._cell_range = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            self._cell_range[0] = min(self._cell_range[0], cell[0])
+            self._cell_range[1] = min(self._cell_range[1], cell[1])
+            self._cell_range[2] = max(self._cell_range[2], cell[0])
+            self._cell_range[3] = max(self._cell_range[3], cell[1])
+
+    def remove(self, key):
+        point = self._points.pop(key)
+        cell = self._get_cell(point)
+        content = self._cells[cell]
+        del content[key]
+        if not content:
+            del self._cells[cell]
+
+    def _get_ring_cells(self, center, radius):
+        """ iterate all existing cells with the given (chessboard) distance from the center """
+        min_x, min_y, max_x, max_y = self._cell_range
+        cx, cy = center
+        if radius == 0:
+            candidates = [center]
+        else:
+            candidates = []
+            for x in range(max(cx - radius, min_x), min(cx + radius, max_x) + 1):
+                if cy - radius >= min_y:
+                    candidates.append((x, cy - radius))
+                if cy + radius <= max_y:
+                    candidates.append((x, cy + radius))
+            for y in range(max(cy - radius + 1, min_y), min(cy + radius - 1, max_y) + 1):
+                if cx - radius >= min_x:
+                    candidates.append((cx - radius, y))
+                if cx + radius <= max_x:
+                    candidates.append((cx + radius, y))
+        for cell in candidates:
+            content = self._cells.get(cell)
+            if content:
+                yield content
+
+    def _get_max_radius(self, center):
+        min_x, min_y, max_x, max_y = self._cell_range
+        return max(center[0] - min_x, max_x - center[0], center[1] - min_y, max_y - center[1])
+
+    def get_nearest_keys(self, point, count):
+        """ return the keys of the "count" nearest points (sorted by distance and key) """
+        if not self._points or count <= 0:
+            return []
+        center = self._get_cell(point)
+        max_radius = self._get_max_radius(center)
+        found = []
+        radius = 0
+        while radius <= max_radius:
+            for content in self._get_ring_cells(center, radius):
+                for key, other in content.items():
+                    found.append((self.get_distance(point, other), key))
+            # all points outside of the current ring are farther away than this limit
+            if len(found) >= count:
+                nearest = heapq.nsmallest(count, found)
+                if nearest[-1][0] <= radius * self.cell_size:
+                    return [key for distance, key in nearest]
+            radius += 1
+        return [key for distance, key in heapq.nsmallest(count, found)]
+
+    def get_nearest(self, point):
+        """ return the key of the nearest point (or None for an empty grid) """
+        keys = self.get_nearest_keys(point, 1)
+        return keys[0] if keys else None
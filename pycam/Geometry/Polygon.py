@@ -17,11 +17,23 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import collections
+
+try:
+    import numpy
+except ImportError:
+    # required for testing many points at once
+    numpy = None
+
 from pycam.Geometry import epsilon, number, TransformableContainer, IDGenerator
 from pycam.Geometry.Line import Line
+from pycam.Geometry.PathOrder import get_optimized_order
 from pycam.Geometry.Plane import Plane
+from pycam.Geometry.PolygonBoolean import BooleanOperation, FillRule, get_polygon_boolean, \
+        get_split_edges
 from pycam.Geometry.PointUtils import padd, pcross, pdist, pdiv, pdot, pis_inside, pmul, pnorm, \
         pnormalized, psub
+from pycam.Geometry.RTree import RTree
 from pycam.Geometry.utils import get_bisector
 from pycam.Utils import log
 log = log.get_logger()
@@ -37,6 +49,16 @@ except ImportError:
 
 LINE_WIDTH_INNER = 0.7
 LINE_WIDTH_OUTER = 1.3
+# the maximum distance of a shifted corner (relative to the offset)
+OFFSET_MITER_LIMIT = 4
+# the maximum distance of a shifted corner (relative to the offset) regarded as nearly flat
+OFFSET_FLAT_LIMIT = 1.02
+# the precision of offset vertices regarded as identical
+OFFSET_VERTEX_DIGITS = 9
+# the maximum number of point/edge combinations tested at once
+CONTAINS_POINTS_CHUNK_SIZE = 2 ** 20
+# the maximum duration (in seconds) of improving the order of polygons
+POLYGON_ORDER_TIME_LIMIT = 2
 
 
 class PolygonInTree(IDGenerator):
@@ -46,7 +68,8 @@ class PolygonInTree(IDGenerator):
     def __init__(self, polygon):
         super().__init__()
         self.start = polygon.get_points()[0]
-        self.end = polygon.get_points()[-1]
+        # a closed polygon ends at its start
+        self.end = self.start if polygon.is_closed else polygon.get_points()[-1]
         self.polygon = polygon
         self.area = polygon.get_area()
         self.children = []
@@ -63,143 +86,49 @@ class PolygonInTree(IDGenerator):
         if self.polygon.is_polygon_inside(other.polygon):
             self.children.append(other)
 
-    def get_cost(self, other):
-        return pdist(other.start, self.end)
-
-
-class PolygonPositionSorter:
-    """ sort PolygonInTree objects for a minimized way length.
-    The sorter takes care that no polygons are processed before their children
-    (inside polygons).
-    """
-
-    def __init__(self, polygons):
-        self.polygons = []
-        for poly in polygons:
-            self._append(poly)
-        self.optimize_order()
-        self.branches = []
-        for poly in self.polygons:
-            self.branches.append([poly])
-
-    def _append(self, poly):
-        if self.polygons:
-            min_cost = poly.get_cost(self.polygons[0])
-            min_index = -1
-            for index in range(len(self.polygons)):
-                prev_item = self.polygons[index]
-                cost = prev_item.get_cost(poly)
-                try:
-                    next_item = self.polygons[index + 1]
-                except IndexError:
-                    pass
-                else:
-                    cost += poly.get_cost(next_item)
-                    cost -= prev_item.get_cost(next_item)
-                if cost < min_cost:
-                    min_cost = cost
-                    min_index = index
-            self.polygons.insert(min_index + 1, poly)
-        else:
-            self.polygons.append(poly)
-
-    def append(self, poly):
-        min_cost = None
-        min_branch = None
-        for branch_index in range(len(self.branches) - 1, -1, -1):
-            this_branch = self.branches[branch_index]
-            cost = this_branch[-1].get_cost(poly)
-            try:
-                next_branch = self.branches[branch_index + 1]
-            except IndexError:
-                pass
-            else:
-                cost += poly.get_cost(next_branch[0])
-                cost -= this_branch[-1].get_cost(next_branch[0])
-            if (min_cost is None) or (cost < min_cost):
-                min_cost = cost
-                min_branch = this_branch
-            for child in poly.children:
-                if child in this_branch:
-                    break
-            else:
-                continue
-            break
-        if min_branch:
-            min_branch.append(poly)
-
-    def optimize_order(self):
-        """ re-insert all items until their order stabilizes """
-        finished = False
-        counter_left = len(self.polygons)
-        while not finished and (counter_left > 0):
-            finished = True
-            for index in range(len(self.polygons)):
-                item = self.polygons.pop(index)
-                self._append(item)
-                if self.polygons[index] != item:
-                    finished = False
-            counter_left -= 1
-
-    def get_polygons(self):
-        result = []
-        for branch in self.branches:
-            result.extend(branch)
-        return result
-
 
 class PolygonSorter:
-    """ sort Plygon instances according to the following rules:
-    * inner polygons first (with no inside polygons)
-    * inner polygons with inside polygons that are already processed
-    * outer polygons (with no polygons inside that are not yet processed)
-    * remaining outer polygons
-    The order of polygons is slightly optimized (minimizing the way length).
+    """ sort Polygon instances according to the following rules:
+    * polygons are processed after all polygons inside of them
+    * the way length between the polygons is minimized (within "time_limit" seconds)
     """
 
-    def __init__(self, polygons, callback=None):
-        self.polygons = []
-        self.sorter = None
+    def __init__(self, polygons, callback=None, time_limit=POLYGON_ORDER_TIME_LIMIT):
+        self.polygons = [PolygonInTree(polygon) for polygon in polygons]
         self.callback = callback
-        for poly in polygons:
-            self._append(poly)
+        self.time_limit = time_limit
+        # only polygons with overlapping bounding boxes may contain each other
+        boxes = [(item.polygon.minx, item.polygon.miny, item.polygon.maxx, item.polygon.maxy)
+                 for item in self.polygons]
+        tree = RTree(zip(boxes, self.polygons))
+        for item, box in zip(self.polygons, boxes):
+            for other in tree.get_overlapping(box):
+                if other is not item:
+                    other.insert_if_child(item)
         self.optimize_order()
 
-    def _append(self, polygon):
-        new_item = PolygonInTree(polygon)
-        for item in self.polygons:
-            item.insert_if_child(new_item)
-            new_item.insert_if_child(item)
-        self.polygons.append(new_item)
-
     def optimize_order(self):
-        self.polygons.sort()
-        remaining_polygons = list(self.polygons)
-        done_polygons = []
-        while remaining_polygons:
-            if self.callback:
-                self.callback()
-            usable_polys = []
-            for poly in remaining_polygons:
-                for child in poly.children:
-                    if child not in done_polygons:
-                        break
-                else:
-                    usable_polys.append(poly)
-            for poly in usable_polys:
-                remaining_polygons.remove(poly)
-            if self.sorter is None:
-                self.sorter = PolygonPositionSorter(usable_polys)
-            else:
-                for poly in usable_polys:
-                    self.sorter.append(poly)
-            done_polygons.extend(usable_polys)
+        # Smaller polygons are processed first.  This order fulfills the constraints and it is
+        # used for resolving identical polygons (being inside of each other).  The area of holes
+        # is negative - thus the absolute size is relevant.
+        self.polygons.sort(key=lambda item: abs(item.area))
+        positions = {item.id: index for index, item in enumerate(self.polygons)}
+        predecessors = [[positions[child.id] for child in item.children
+                         if positions[child.id] < index]
+                        for index, item in enumerate(self.polygons)]
+        if self.callback:
+            self.callback()
+        order = get_optimized_order([item.start for item in self.polygons],
+                                    [item.end for item in self.polygons],
+                                    predecessors=predecessors, time_limit=self.time_limit)
+        self.polygons = [self.polygons[index] for index in order]
 
     def get_polygons(self):
-        if not self.sorter:
-            return []
-        else:
-            return [poly.polygon for poly in self.sorter.get_polygons()]
+        return [item.polygon for item in self.polygons]
+
+
+def _get_vertex_key(point):
+    return (round(point[0], OFFSET_VERTEX_DIGITS), round(point[1], OFFSET_VERTEX_DIGITS))
 
 
 class Polygon(TransformableContainer):
@@ -220,6 +149,7 @@ class Polygon(TransformableContainer):
         self.minz = None
         self._lines_cache = None
         self._area_cache = None
+        self._edge_arrays_cache = None
         self._cached_offset_polygons = {}
 
     def copy(self):
@@ -251,8 +181,8 @@ class Polygon(TransformableContainer):
                     self._update_limits(line.p2)
                 else:
                     self.is_closed = True
-                # take care that the line_cache is flushed
-                self.reset_cache()
+                # take care that the line_cache is flushed (the limits are still valid)
+                self._reset_derived_cache()
             else:
                 # the new Line can be added to the beginning of the polygon
                 if (len(self._points) > 1) and \
@@ -264,8 +194,8 @@ class Polygon(TransformableContainer):
                     self._update_limits(line.p1)
                 else:
                     self.is_closed = True
-                # take care that the line_cache is flushed
-                self.reset_cache()
+                # take care that the line_cache is flushed (the limits are still valid)
+                self._reset_derived_cache()
 
     def __len__(self):
         if self.is_closed:
@@ -444,10 +374,10 @@ class Polygon(TransformableContainer):
                 (self.miny > polygon.maxy) or (self.maxy < polygon.miny) or \
                 (self.minz > polygon.maxz) or (self.maxz < polygon.minz):
             return False
-        for point in polygon.get_points():
-            if not self.is_point_inside(point):
-                return False
-        return True
+        if numpy is None:
+            return all(self.is_point_inside(point) for point in polygon.get_points())
+        else:
+            return bool(self.contains_points(polygon._points).all())
 
     def is_point_on_outline(self, p):
         for line in self.get_lines():
@@ -502,9 +432,58 @@ class Polygon(TransformableContainer):
             log.debug("polygon.is_point_inside: unclear decision")
             return True
 
+    def contains_points(self, points):
+        """ Test for many points at once, if they are inside of the polygon.
+        The result for each point is the same as for "is_point_inside".
+
+        @param points: sequence of 3D points (or an array with one point per row)
+        @returns: numpy array of booleans (a list, if numpy is not available)
+        """
+        if numpy is None:
+            return [self.is_point_inside(point) for point in points]
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        result = numpy.zeros(len(points), dtype=bool)
+        if not self.is_closed:
+            return result
+        # First: check if the points are within the boundary of the polygon.
+        candidates = numpy.flatnonzero(
+            (points[:, 0] >= self.minx - epsilon) & (points[:, 0] <= self.maxx + epsilon)
+            & (points[:, 1] >= self.miny - epsilon) & (points[:, 1] <= self.maxy + epsilon)
+            & (points[:, 2] >= self.minz - epsilon) & (points[:, 2] <= self.maxz + epsilon))
+        x1, y1, x2, y2 = self._get_edge_arrays()
+        chunk_size = max(1, CONTAINS_POINTS_CHUNK_SIZE // len(x1))
+        for chunk_start in range(0, len(candidates), chunk_size):
+            indices = candidates[chunk_start:chunk_start + chunk_size]
+            px = points[indices, 0][:, numpy.newaxis]
+            py = points[indices, 1][:, numpy.newaxis]
+            # count the crossings of the edges with a ray along the x axis (see "is_point_inside")
+            is_crossing = ((y1 < py) & (py <= y2)) | ((y2 < py) & (py <= y1))
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                crossing_x = x1 + (py - y1) / (y2 - y1) * (x2 - x1)
+            left_odd = (is_crossing & (crossing_x < px + epsilon)).sum(axis=1) % 2 == 1
+            right_odd = (is_crossing & (crossing_x > px - epsilon)).sum(axis=1) % 2 == 1
+            # points with an unclear decision are on the line -> inside
+            result[indices] = left_odd | right_odd
+        return result
+
+    def _get_edge_arrays(self):
+        """ return the coordinates of all edges of the closed polygon as numpy arrays
+
+        @returns: tuple of arrays (x1, y1, x2, y2) containing the start and end of each edge
+        """
+        if self._edge_arrays_cache is None:
+            starts = numpy.array(self._points, dtype=float)[:, :2]
+            ends = numpy.roll(starts, -1, axis=0)
+            self._edge_arrays_cache = (starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1])
+        return self._edge_arrays_cache
+
     def get_points(self):
         return self._points[:]
 
+    def get_endpoints(self):
+        """ return the first and the last point of the polygon (without copying all points) """
+        return self._points[0], self._points[-1]
+
     def get_lines(self):
         """ Caching is necessary to avoid constant recalculation due to
         the "to_opengl" method.
@@ -562,11 +541,16 @@ class Polygon(TransformableContainer):
             self.maxz = max(self.maxz, point[2])
         self._lines_cache = None
         self._area_cache = None
+        self._edge_arrays_cache = None
 
-    def reset_cache(self):
+    def _reset_derived_cache(self):
         self._cached_offset_polygons = {}
         self._lines_cache = None
         self._area_cache = None
+        self._edge_arrays_cache = None
+
+    def reset_cache(self):
+        self._reset_derived_cache()
         self.minx, self.miny, self.minz = None, None, None
         self.maxx, self.maxy, self.maxz = None, None, None
         # update the limit for each line
@@ -838,62 +822,40 @@ class Polygon(TransformableContainer):
 
     def get_offset_polygons(self, offset, callback=None):
         def simplify_polygon_intersections(lines):
-            new_group = lines[:]
-            # remove all non-adjacent intersecting lines (this splits the group)
-            if len(new_group) > 0:
-                group_starts = []
-                index1 = 0
-                while index1 < len(new_group):
-                    index2 = 0
-                    while index2 < len(new_group):
-                        index_distance = min(abs(index2 - index1),
-                                             abs(len(new_group) - (index2 - index1)))
-                        # skip neighbours
-                        if index_distance > 1:
-                            line1 = new_group[index1]
-                            line2 = new_group[index2]
-                            intersection, factor = line1.get_intersection(line2)
-                            if intersection and (pdist(intersection, line1.p1) > epsilon) \
-                                    and (pdist(intersection, line1.p2) > epsilon):
-                                del new_group[index1]
-                                new_group.insert(index1, Line(line1.p1, intersection))
-                                new_group.insert(index1 + 1, Line(intersection, line1.p2))
-                                # Shift all items in "group_starts" by one if
-                                # they reference a line whose index changed.
-                                for i in range(len(group_starts)):
-                                    if group_starts[i] > index1:
-                                        group_starts[i] += 1
-                                if index1 + 1 not in group_starts:
-                                    group_starts.append(index1 + 1)
-                                # don't update index2 -> maybe there are other hits
-                            elif intersection and (pdist(intersection, line1.p1) < epsilon):
-                                if index1 not in group_starts:
-                                    group_starts.append(index1)
-                                index2 += 1
-                            else:
-                                index2 += 1
-                        else:
-                            index2 += 1
-                    index1 += 1
+            # split the lines at their intersections (this splits the group)
+            if len(lines) > 0:
+                new_group = []
+                # the same (snapped) point of adjacent lines must be identical
+                vertices = {}
+                for line, split_points in zip(
+                        lines, get_split_edges([(line.p1, line.p2) for line in lines])):
+                    if len(split_points) < 2:
+                        # skip tiny lines
+                        continue
+                    direction = psub(line.p2, line.p1)
+                    length_sq = direction[0] ** 2 + direction[1] ** 2
+                    points = []
+                    for x, y in split_points:
+                        # interpolate the height (if the plane is not horizontal)
+                        factor = ((x - line.p1[0]) * direction[0]
+                                  + (y - line.p1[1]) * direction[1]) / length_sq
+                        points.append(vertices.setdefault(
+                            (x, y), (x, y, line.p1[2] + factor * direction[2])))
+                    for p1, p2 in zip(points, points[1:]):
+                        new_group.append(Line(p1, p2))
+                # A new group starts at every point, where the lines cross or touch each other.
+                start_counts = collections.Counter(line.p1 for line in new_group)
+                group_starts = [index for index, line in enumerate(new_group)
+                                if start_counts[line.p1] > 1]
                 # The lines intersect each other
                 # We need to split the group.
                 if len(group_starts) > 0:
-                    group_starts.sort()
-                    groups = []
-                    last_start = 0
-                    for group_start in group_starts:
-                        transfer_group = new_group[last_start:group_start]
-                        # add only non-empty groups
-                        if transfer_group:
-                            groups.append(transfer_group)
-                        last_start = group_start
-
-                    # Add the remaining lines to the first group or as a new
-                    # group.
-                    if groups[0][0].p1 == new_group[-1].p2:
-                        groups[0] = new_group[last_start:] + groups[0]
-                    else:
-                        groups.append(new_group[last_start:])
+                    # rotate the lines - the first group starts at the beginning
+                    first_start = group_starts[0]
+                    new_group = new_group[first_start:] + new_group[:first_start]
+                    group_starts = [index - first_start for index in group_starts]
+                    groups = [new_group[start:end] for start, end in zip(
+                        group_starts, group_starts[1:] + [len(new_group)])]
                     # try to find open groups that can be combined
                     combined_groups = []
                     for index, current_group in enumerate(groups):
@@ -926,6 +888,63 @@ class Polygon(TransformableContainer):
             else:
                 return None
 
+        def get_offset_regions(shifted_points):
+            # The shifted lines are connected to a contour (similar to X. Chen and S. McMains:
+            # "Polygon Offsetting by Computing Winding Numbers", 2005).  The valid regions are
+            # enclosed by this contour with the orientation of the original polygon.  Reversed
+            # loops (e.g. at collapsed corners) are ignored.
+            count = len(self._points)
+            directions = [pnormalized(psub(self._points[(index + 1) % count], point))
+                          for index, point in enumerate(self._points)]
+            shifts = [pmul(pnormalized(pcross(direction, self.plane.n)), offset)
+                      for direction in directions]
+            points = []
+            for index, point in enumerate(self._points):
+                shifted = shifted_points[index]
+                previous_direction, direction = directions[index - 1], directions[index]
+                if pdot(pcross(previous_direction, direction), self.plane.n) * offset < 0:
+                    # Converging lines are connected via the original vertex.  Only a nearly flat
+                    # corner with lines keeping their direction is replaced with its shifted
+                    # vertex (reducing the number of lines).
+                    if ((pdist(shifted, point) > OFFSET_FLAT_LIMIT * abs(offset))
+                            or (pdot(psub(shifted, shifted_points[index - 1]),
+                                     previous_direction) < 0)
+                            or (pdot(psub(shifted_points[(index + 1) % count], shifted),
+                                     direction) < 0)):
+                        points.extend((padd(point, shifts[index - 1]), point,
+                                       padd(point, shifts[index])))
+                        continue
+                elif pdist(shifted, point) > OFFSET_MITER_LIMIT * abs(offset):
+                    # diverging lines with a very sharp corner: limit the distance
+                    points.append(padd(padd(point, shifts[index - 1]),
+                                       pmul(previous_direction, abs(offset))))
+                    points.append(psub(padd(point, shifts[index]), pmul(direction, abs(offset))))
+                    continue
+                points.append(shifted)
+            is_outer = self.is_outer()
+            # The corners of the contours are (rounded) crossings of the shifted lines.  They are
+            # replaced with nearby shifted vertices.  The contours start at the first of these.
+            vertices = {}
+            for index, point in enumerate(shifted_points + points):
+                vertices.setdefault(_get_vertex_key(point), (index, point))
+            groups = []
+            for contour in get_polygon_boolean([points if is_outer else points[::-1]], [],
+                                               BooleanOperation.UNION,
+                                               fill_rule=FillRule.POSITIVE):
+                if not is_outer:
+                    contour.reverse()
+                contour = [vertices.get(_get_vertex_key(point),
+                                        (len(vertices), (point[0], point[1], points[0][2])))
+                           for point in contour]
+                first = min(range(len(contour)), key=lambda index: contour[index][0])
+                contour = [point for index, point in contour[first:] + contour[:first]]
+                contour = [point for point, previous in zip(contour, contour[-1:] + contour)
+                           if point != previous]
+                if len(contour) < 3:
+                    continue
+                groups.append([Line(p1, p2) for p1, p2 in zip(contour, contour[1:] + contour[:1])])
+            return groups
+
         offset = number(offset)
         if offset == 0:
             return [self]
@@ -942,16 +961,17 @@ class Polygon(TransformableContainer):
         points = []
         for index in range(len(self._points)):
             points.append(self.get_shifted_vertex(index, offset))
-        new_lines = []
-        for index in range(len(points) - 1):
-            p1 = points[index]
-            p2 = points[(index + 1)]
-            new_lines.append(Line(p1, p2))
-        if self.is_closed and (len(points) > 1):
-            new_lines.append(Line(points[-1], points[0]))
         if callback and callback():
             return None
-        cleaned_line_groups = simplify_polygon_intersections(new_lines)
+        if self.is_closed:
+            cleaned_line_groups = get_offset_regions(points)
+        else:
+            new_lines = []
+            for index in range(len(points) - 1):
+                p1 = points[index]
+                p2 = points[(index + 1)]
+                new_lines.append(Line(p1, p2))
+            cleaned_line_groups = simplify_polygon_intersections(new_lines)
         if cleaned_line_groups is None:
             log.debug("Skipping offset polygon: intersections could not be "
                       "simplified")
@@ -1048,68 +1068,17 @@ class Polygon(TransformableContainer):
         return False
 
     def union(self, other):
-        """ This "union" of two polygons only works for polygons without
-        shared edges. TODO: fix the issues of shared edges!
+        """ return the polygons covering the area of both polygons
+
+        See "ContourModel.union" for details.
         """
         # don't import earlier to avoid circular imports
         from pycam.Geometry.Model import ContourModel
-        # check if one of the polygons is completely inside of the other
-        if self.is_polygon_inside(other):
-            return [self]
-        if other.is_polygon_inside(self):
-            return [other]
-        # check if there is any overlap at all
-        if not self.is_overlap(other):
-            # no changes
-            return [self, other]
-        contour = ContourModel(self.plane)
-
-        def get_outside_lines(poly1, poly2):
-            result = []
-            for line in poly1.get_lines():
-                collisions = []
-                for o_line in poly2.get_lines():
-                    cp, dist = o_line.get_intersection(line)
-                    if (cp is not None) and (0 < dist < 1):
-                        collisions.append((cp, dist))
-                # sort the collisions according to the distance
-                collisions.append((line.p1, 0))
-                collisions.append((line.p2, 1))
-                collisions.sort(key=lambda collision: collision[1])
-                for index in range(len(collisions) - 1):
-                    p1 = collisions[index][0]
-                    p2 = collisions[index + 1][0]
-                    if pdist(p1, p2) < epsilon:
-                        # ignore zero-length lines
-                        continue
-                    # Use the middle between p1 and p2 to check the
-                    # inner/outer state.
-                    p_middle = pdiv(padd(p1, p2), 2)
-                    p_inside = (poly2.is_point_inside(p_middle)
-                                and not poly2.is_point_on_outline(p_middle))
-                    if not p_inside:
-                        result.append(Line(p1, p2))
-            return result
-
-        outside_lines = []
-        outside_lines.extend(get_outside_lines(self, other))
-        outside_lines.extend(get_outside_lines(other, self))
-        for line in outside_lines:
-            contour.append(line)
-        # fix potential overlapping at the beginning and end of each polygon
-        result = []
-        for poly in contour.get_polygons():
-            if not poly.is_closed:
-                lines = poly.get_lines()
-                line1 = lines[-1]
-                line2 = lines[0]
-                if (line1.dir == line2.dir) \
-                        and (line1.is_point_inside(line2.p1)):
-                    # remove the last point and define the polygon as closed
-                    poly._points.pop(-1)
-                    poly.is_closed = True
-            result.append(poly)
-        return result
+        model = ContourModel(self.plane)
+        model.append(self)
+        other_model = ContourModel(self.plane)
+        other_model.append(other)
+        return model.union(other_model).get_polygons()
 
     def split_line(self, line):
         outer = []
@@ -0,0 +1,521 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+
+
+Boolean operations for sets of planar polygons
+
+The edges of both operands are processed by two sweep-lines (similar to F. Martinez, A. J. Rueda
+and F. R. Feito: "A new algorithm for computing Boolean operations on polygons", 2009):
+  1) all edges are split at their intersections (including touching and overlapping edges)
+  2) the edges (now without crossings) are sorted along the sweep-line - thus the winding numbers
+     of both operands are known on both sides of every edge
+Identical edges (e.g. shared edges of adjacent polygons) are combined after the first step.
+Overlapping polygons of the same operand are merged (by default with the non-zero fill rule).
+
+The contours are sequences of (x, y) coordinates.  Outer contours are counter-clockwise, holes
+are clockwise (the same convention as "Polygon.is_outer").
+"""
+
+import collections
+import enum
+import functools
+import heapq
+import itertools
+
+from pycam.Geometry import epsilon
+import pycam.Utils.log
+
+
+_log = pycam.Utils.log.get_logger()
+
+
+class BooleanOperation(enum.Enum):
+    UNION = "union"
+    INTERSECTION = "intersection"
+    DIFFERENCE = "difference"
+    XOR = "xor"
+
+
+class FillRule(enum.Enum):
+    """ the winding numbers of the regions considered to be inside of the contours """
+    NONZERO = "nonzero"
+    POSITIVE = "positive"
+
+
+_FILL_RULE_FUNCTIONS = {
+    FillRule.NONZERO: lambda winding: winding != 0,
+    FillRule.POSITIVE: lambda winding: winding > 0,
+}
+
+
+_INSIDE_FUNCTIONS = {
+    BooleanOperation.UNION: lambda subject, clip: subject or clip,
+    BooleanOperation.INTERSECTION: lambda subject, clip: subject and clip,
+    BooleanOperation.DIFFERENCE: lambda subject, clip: subject and not clip,
+    BooleanOperation.XOR: lambda subject, clip: subject != clip,
+}
+
+
+def _signed_area(p0, p1, p2):
+    return (p0[0] - p2[0]) * (p1[1] - p2[1]) - (p1[0] - p2[0]) * (p0[1] - p2[1])
+
+
+class _SweepEvent:
+    """ one endpoint of an edge
+
+    The "contribution" of an edge is the change of the winding numbers (subject, clip) from
+    below the edge to above it (the left side of an edge pointing from left to right).  "below"
+    is the pair of winding numbers just below the edge.  It is only used for left events.
+    "origins" contains the identifiers of the input edges covered by this edge.
+    """
+
+    __slots__ = ("point", "is_left", "other", "contribution", "below", "index", "origins")
+
+    _index_generator = itertools.count()
+
+    def __init__(self, point, is_left, other, contribution, origins=()):
+        self.point = point
+        self.is_left = is_left
+        self.other = other
+        self.contribution = contribution
+        self.below = (0, 0)
+        self.origins = origins
+        # a unique and stable tie-breaker for the ordering of events
+        self.index = next(self._index_generator)
+
+    def is_below(self, point):
+        """ check if the edge is below the given point """
+        if self.is_left:
+            return _signed_area(self.point, self.other.point, point) > 0
+        else:
+            return _signed_area(self.other.point, self.point, point) > 0
+
+    def get_above(self):
+        return (self.below[0] + self.contribution[0], self.below[1] + self.contribution[1])
+
+
+def _create_edge(left, right, contribution, origins=()):
+    left_event = _SweepEvent(left, True, None, contribution, origins)
+    right_event = _SweepEvent(right, False, left_event, contribution, origins)
+    left_event.other = right_event
+    return left_event, right_event
+
+
+def _compare_events(event1, event2):
+    """ the order of the event queue: from left to right, from bottom to top """
+    p1, p2 = event1.point, event2.point
+    if p1[0] != p2[0]:
+        return 1 if p1[0] > p2[0] else -1
+    if p1[1] != p2[1]:
+        return 1 if p1[1] > p2[1] else -1
+    if event1.is_left != event2.is_left:
+        # right endpoints are processed first
+        return 1 if event1.is_left else -1
+    if _signed_area(p1, event1.other.point, event2.other.point) != 0:
+        # the event of the lower edge is processed first
+        return -1 if event1.is_below(event2.other.point) else 1
+    return -1 if event1.index < event2.index else 1
+
+
+def _get_side(event, other):
+    """ check if the edge of the left event "event" is below (-1) or above (1) the other edge
+
+    The other edge starts within the range of "event".  If it starts on the edge of "event", then
+    its right endpoint is used.  Thus edges starting on a vertical edge are below it (the left
+    side of an edge is "above").
+    """
+    area = _signed_area(event.point, event.other.point, other.point)
+    if area == 0:
+        area = _signed_area(event.point, event.other.point, other.other.point)
+    return -1 if area > 0 else 1
+
+
+def _compare_segments(event1, event2):
+    """ the order of the sweep line status: from bottom to top """
+    if event1 is event2:
+        return 0
+    if (_signed_area(event1.point, event1.other.point, event2.point) != 0) \
+            or (_signed_area(event1.point, event1.other.point, event2.other.point) != 0):
+        # the edges are not collinear
+        if event1.point == event2.point:
+            # a shared left endpoint: use the right endpoints
+            return -1 if event1.is_below(event2.other.point) else 1
+        if _compare_events(event1, event2) > 0:
+            # "event1" was inserted after "event2"
+            return -_get_side(event2, event1)
+        return _get_side(event1, event2)
+    # collinear edges
+    if event1.point == event2.point:
+        return -1 if event1.index < event2.index else 1
+    return _compare_events(event1, event2)
+
+
+# the resolution of calculated crossings (far below "epsilon")
+_CROSSING_GRID = 2 ** 40
+
+
+def _get_crossing(a1, a2, b1, b2):
+    """ calculate the intersection point of two crossing edges (or None) """
+    va = (a2[0] - a1[0], a2[1] - a1[1])
+    vb = (b2[0] - b1[0], b2[1] - b1[1])
+    cross = va[0] * vb[1] - va[1] * vb[0]
+    if cross == 0:
+        # parallel edges: overlaps are handled via the endpoints (see "_is_on_edge")
+        return None
+    offset = (b1[0] - a1[0], b1[1] - a1[1])
+    s = (offset[0] * vb[1] - offset[1] * vb[0]) / cross
+    t = (offset[0] * va[1] - offset[1] * va[0]) / cross
+    if (s < 0) or (s > 1) or (t < 0) or (t > 1):
+        return None
+    # Crossings are rounded to a fine binary grid: the intersections of three edges meeting in
+    # one point should not differ by rounding errors.  The point is located within the bounding
+    # boxes of both edges.  This keeps intersections with horizontal and vertical edges exact.
+    return tuple(min(max(round((a1[axis] + s * va[axis]) * _CROSSING_GRID) / _CROSSING_GRID,
+                         min(a1[axis], a2[axis]), min(b1[axis], b2[axis])),
+                     max(a1[axis], a2[axis]), max(b1[axis], b2[axis]))
+                 for axis in (0, 1))
+
+
+def _is_on_edge(point, event):
+    """ check if a point is located within the interior of the edge of a left event
+
+    Points closer than "epsilon" to the edge are accepted - unless they are too close to one of
+    the endpoints.
+    """
+    start, end = event.point, event.other.point
+    direction = (end[0] - start[0], end[1] - start[1])
+    offset = (point[0] - start[0], point[1] - start[1])
+    length_sq = direction[0] * direction[0] + direction[1] * direction[1]
+    position = offset[0] * direction[0] + offset[1] * direction[1]
+    if (position <= 0) or (position >= length_sq):
+        return False
+    cross = direction[0] * offset[1] - direction[1] * offset[0]
+    limit = epsilon * epsilon * length_sq
+    return ((cross * cross <= limit) and (position * position > limit)
+            and ((length_sq - position) ** 2 > limit))
+
+
+class _SweepLineStatus:
+    """ the left events of the edges crossing the sweep-line - sorted from bottom to top
+
+    The events are kept in a plain list: the position is found via bisection, but inserting and
+    removing an event moves the following items.  Thus every event costs O(log s + s) for s
+    edges crossing the sweep-line (usually a small fraction of all edges).
+    """
+
+    def __init__(self):
+        self._items = []
+
+    def _find_position(self, event):
+        low, high = 0, len(self._items)
+        while low < high:
+            middle = (low + high) // 2
+            if _compare_segments(self._items[middle], event) < 0:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def insert(self, event):
+        """ insert a left event
+
+        @returns: the neighbours (below and above) of the event (or None)
+        """
+        index = self._find_position(event)
+        self._items.insert(index, event)
+        return self.get_neighbours(index)
+
+    def get_neighbours(self, index):
+        return (self._items[index - 1] if index > 0 else None,
+                self._items[index + 1] if index + 1 < len(self._items) else None)
+
+    def remove(self, event):
+        """ remove a left event
+
+        @returns: the neighbours (below and above) of the removed event (or None)
+        """
+        index = self._find_position(event)
+        if (index >= len(self._items)) or (self._items[index] is not event):
+            # the order is not consistent (rounding errors) - search the hard way
+            for index, item in enumerate(self._items):
+                if item is event:
+                    break
+            else:
+                return None, None
+        neighbours = self.get_neighbours(index)
+        del self._items[index]
+        return neighbours
+
+
+class _EdgeSplitter:
+    """ split edges at their intersections (Bentley-Ottmann) """
+
+    def __init__(self):
+        self._queue = []
+        self._status = _SweepLineStatus()
+        # all vertices indexed by their quantized position (see "_snap_point")
+        self._vertices = {}
+        # the endpoints of the parts of each input edge (see "origin" of "add_edge")
+        self.split_points = collections.defaultdict(set)
+
+    def _snap_point(self, point):
+        """ replace a point by an existing vertex close to it (or register it as a new vertex)
+
+        Intersections calculated for different pairs of edges differ by rounding errors.
+        """
+        key_x, key_y = round(point[0] / epsilon), round(point[1] / epsilon)
+        for offset_x in (0, -1, 1):
+            for offset_y in (0, -1, 1):
+                vertex = self._vertices.get((key_x + offset_x, key_y + offset_y))
+                if (vertex is not None) and (abs(vertex[0] - point[0]) < epsilon) \
+                        and (abs(vertex[1] - point[1]) < epsilon):
+                    return vertex
+        self._vertices[(key_x, key_y)] = point
+        return point
+
+    def add_edge(self, start, end, contribution, origin=None):
+        """ add an edge to be processed by "get_edges"
+
+        @param origin: optional identifier of the edge - the endpoints of its parts are
+            collected in "split_points"
+        @returns: the snapped start and end point
+        """
+        start, end = self._snap_point(start), self._snap_point(end)
+        if start == end:
+            return start, end
+        left, right = (start, end) if start < end else (end, start)
+        if start > end:
+            contribution = (-contribution[0], -contribution[1])
+        origins = () if origin is None else (origin, )
+        for event in _create_edge(left, right, contribution, origins):
+            self._push(event)
+        return start, end
+
+    def _push(self, event):
+        # The order of events at the same point does not matter (see "_get_result_edges").
+        # Right events are processed first.
+        heapq.heappush(self._queue, (event.point, event.is_left, event.index, event))
+
+    def _divide_edge(self, event, point):
+        """ split the edge of a left event at the given point
+
+        @returns: the left event of the new (right) part of the edge
+        """
+        right = _SweepEvent(point, False, event, event.contribution, event.origins)
+        left = _SweepEvent(point, True, event.other, event.contribution, event.origins)
+        if _compare_events(left, event.other) > 0:
+            # Rounding errors: the left event would be processed after the right event.  Thus the
+            # direction of the new edge is reversed.
+            event.other.is_left = True
+            left.is_left = False
+            reversed_contribution = (-event.contribution[0], -event.contribution[1])
+            event.other.contribution = left.contribution = reversed_contribution
+        event.other.other = left
+        event.other = right
+        self._push(left)
+        self._push(right)
+        return left
+
+    def _split_at_points(self, event, points):
+        for point in sorted(points):
+            if event.is_left and _is_on_edge(point, event):
+                event = self._divide_edge(event, point)
+
+    def _handle_neighbours(self, event1, event2):
+        if (event1 is None) or (event2 is None):
+            return
+        if (event1.point == event2.point) and (event1.other.point == event2.other.point):
+            # Identical edges (e.g. shared by adjacent polygons) are combined.  Otherwise only
+            # one of them would be split by a neighbour.
+            event1.contribution = (event1.contribution[0] + event2.contribution[0],
+                                   event1.contribution[1] + event2.contribution[1])
+            event1.other.contribution = event1.contribution
+            event1.origins = event1.other.origins = event1.origins + event2.origins
+            self._status.remove(event2)
+            event2.contribution = event2.other.contribution = None
+            return
+        # endpoints located on the other edge (touching or overlapping edges)
+        points1 = [point for point in (event2.point, event2.other.point)
+                   if _is_on_edge(point, event1)]
+        points2 = [point for point in (event1.point, event1.other.point)
+                   if _is_on_edge(point, event2)]
+        if points1 or points2:
+            self._split_at_points(event1, points1)
+            self._split_at_points(event2, points2)
+        elif (event1.point != event2.point) and (event1.other.point != event2.other.point):
+            # calculate the intersection in a canonical order of the edges
+            edges = sorted(((event1.point, event1.other.point),
+                            (event2.point, event2.other.point)))
+            point = _get_crossing(edges[0][0], edges[0][1], edges[1][0], edges[1][1])
+            if point is not None:
+                point = self._snap_point(point)
+                for event in (event1, event2):
+                    if (point != event.point) and (point != event.other.point):
+                        self._divide_edge(event, point)
+
+    def get_edges(self):
+        """ process all events
+
+        @returns: dictionary of the resulting edges (tuples of the left and right point) and
+            their (combined) contributions
+        """
+        edges = {}
+        while self._queue:
+            event = heapq.heappop(self._queue)[-1]
+            if event.is_left:
+                below, above = self._status.insert(event)
+                self._handle_neighbours(event, above)
+                self._handle_neighbours(below, event)
+            elif event.contribution is not None:
+                left_event = event.other
+                below, above = self._status.remove(left_event)
+                self._handle_neighbours(below, above)
+                if left_event.point < event.point:
+                    key = (left_event.point, event.point)
+                    contribution = left_event.contribution
+                else:
+                    # rounding errors: the split point is located beyond the other endpoint
+                    key = (event.point, left_event.point)
+                    contribution = (-left_event.contribution[0], -left_event.contribution[1])
+                previous = edges.get(key, (0, 0))
+                edges[key] = (previous[0] + contribution[0], previous[1] + contribution[1])
+                for origin in left_event.origins:
+                    self.split_points[origin].update(key)
+        return edges
+
+
+def _get_result_edges(edges, is_inside):
+    """ calculate the winding numbers next to the given edges
+
+    The edges are expected to be free of crossings and overlaps (see "_EdgeSplitter").
+    @param is_inside: function checking if a pair of winding numbers belongs to the result
+    @returns: list of directed edges (start and end point) with the result on their left side
+    """
+    events = []
+    for (left, right), contribution in edges.items():
+        if contribution != (0, 0):
+            events.extend(_create_edge(left, right, contribution))
+    events.sort(key=lambda event: (event.point, event.is_left))
+    status = _SweepLineStatus()
+    result = []
+    for (point, is_left), group in itertools.groupby(
+            events, key=lambda event: (event.point, event.is_left)):
+        if is_left:
+            # the fields of an edge depend on the edge below
+            group = sorted(group, key=functools.cmp_to_key(_compare_events))
+        for event in group:
+            _process_result_event(status, event, is_inside, result)
+    return result
+
+
+def _process_result_event(status, event, is_inside, result):
+    if event.is_left:
+        below = status.insert(event)[0]
+        if below is not None:
+            event.below = below.get_above()
+    else:
+        left_event = event.other
+        status.remove(left_event)
+        was_inside = is_inside(left_event.below)
+        if is_inside(left_event.get_above()) != was_inside:
+            if was_inside:
+                result.append((event.point, left_event.point))
+            else:
+                result.append((left_event.point, event.point))
+
+
+def _connect_edges(edges):
+    """ combine directed edges to closed contours """
+    outgoing = {}
+    for start, end in edges:
+        outgoing.setdefault(start, []).append(end)
+    contours = []
+    for start in list(outgoing):
+        while outgoing.get(start):
+            contour = [start]
+            point = outgoing[start].pop()
+            while point != start:
+                contour.append(point)
+                following = outgoing.get(point)
+                if not following:
+                    _log.debug("Polygon boolean operation: skipping an open contour")
+                    contour = None
+                    break
+                point = following.pop()
+            if contour and (len(contour) > 2):
+                contours.append(contour)
+    return contours
+
+
+def get_split_edges(edges):
+    """ split edges at their crossings with each other (Bentley-Ottmann)
+
+    Collinear overlapping edges are split at the endpoints of the overlap.  Points closer than
+    "epsilon" are merged.  Thus the resulting points of different edges are identical, if they
+    are located at the same position.
+    @param edges: sequence of edges (tuples of start and end point, each a tuple (x, y))
+    @returns: list of polylines (lists of (x, y) tuples from the start to the end) - one for
+        each edge.  Edges shorter than "epsilon" are reduced to a single point.
+    """
+    splitter = _EdgeSplitter()
+    snapped_edges = [splitter.add_edge((float(start[0]), float(start[1])),
+                                       (float(end[0]), float(end[1])), (1, 0), origin=index)
+                     for index, (start, end) in enumerate(edges)]
+    splitter.get_edges()
+    result = []
+    for index, (start, end) in enumerate(snapped_edges):
+        if start == end:
+            result.append([start])
+            continue
+        direction = (end[0] - start[0], end[1] - start[1])
+        points = splitter.split_points[index]
+        points.discard(start)
+        points.discard(end)
+        result.append([start] + sorted(points, key=lambda point: (
+            (point[0] - start[0]) * direction[0] + (point[1] - start[1]) * direction[1]))
+            + [end])
+    return result
+
+
+def get_polygon_boolean(subject, clip, operation, fill_rule=FillRule.NONZERO):
+    """ combine two sets of contours
+
+    Overlapping contours within one set are merged (according to the fill rule).
+    @param subject: list of contours (sequences of (x, y) coordinates, e.g. numpy arrays)
+    @param clip: list of contours
+    @param operation: a BooleanOperation
+    @param fill_rule: a FillRule - the positive rule ignores clockwise loops within the contours
+    @returns: list of closed contours (lists of (x, y) tuples) - outer contours are
+        counter-clockwise, holes are clockwise
+    """
+    splitter = _EdgeSplitter()
+    for contours, unit in ((subject, (1, 0)), (clip, (0, 1))):
+        for contour in contours:
+            points = [(float(point[0]), float(point[1])) for point in contour]
+            if len(points) < 3:
+                continue
+            for start, end in zip(points, points[1:] + points[:1]):
+                if start != end:
+                    # the winding number increases from the right to the left side of an edge
+                    splitter.add_edge(start, end, unit)
+    is_filled = _FILL_RULE_FUNCTIONS[fill_rule]
+    is_operation_inside = _INSIDE_FUNCTIONS[operation]
+
+    def is_inside(winding):
+        return is_operation_inside(is_filled(winding[0]), is_filled(winding[1]))
+
+    edges = _get_result_edges(splitter.get_edges(), is_inside)
+    return _connect_edges(edges)
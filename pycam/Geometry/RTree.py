@@ -0,0 +1,95 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+
+from pycam.Geometry import epsilon
+
+
+# the maximum number of entries within a node of the tree
+DEFAULT_NODE_CAPACITY = 16
+
+
+class _Node:
+
+    __slots__ = ("box", "children", "is_leaf")
+
+    def __init__(self, children, is_leaf):
+        self.children = children
+        self.is_leaf = is_leaf
+        boxes = [child[0] for child in children] if is_leaf else [child.box for child in children]
+        self.box = (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                    max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+
+def _is_overlapping(box1, box2):
+    return ((box1[0] <= box2[2] + epsilon) and (box2[0] <= box1[2] + epsilon)
+            and (box1[1] <= box2[3] + epsilon) and (box2[1] <= box1[3] + epsilon))
+
+
+def _get_packed_nodes(entries, get_box, is_leaf, node_capacity):
+    """ group the given entries into nodes ("Sort-Tile-Recursive" packing)
+
+    The entries are sorted into vertical slices (by the x coordinate of their center).  Each
+    slice is sorted by the y coordinate and split into nodes.
+    """
+    node_count = math.ceil(len(entries) / node_capacity)
+    slice_size = node_capacity * math.ceil(math.sqrt(node_count))
+    entries = sorted(entries, key=lambda entry: get_box(entry)[0] + get_box(entry)[2])
+    nodes = []
+    for slice_start in range(0, len(entries), slice_size):
+        entries_slice = sorted(entries[slice_start:slice_start + slice_size],
+                               key=lambda entry: get_box(entry)[1] + get_box(entry)[3])
+        for node_start in range(0, len(entries_slice), node_capacity):
+            nodes.append(_Node(entries_slice[node_start:node_start + node_capacity], is_leaf))
+    return nodes
+
+
+class RTree:
+    """ static R-tree of two-dimensional bounding boxes
+
+    The tree is built once for all items.  It allows to find the items overlapping a given box
+    without testing all items.
+    """
+
+    def __init__(self, items, node_capacity=DEFAULT_NODE_CAPACITY):
+        """ create the tree
+
+        @param items: sequence of tuples (box, item) with box being (minx, miny, maxx, maxy)
+        """
+        self.root = None
+        items = list(items)
+        if items:
+            nodes = _get_packed_nodes(items, lambda entry: entry[0], True, node_capacity)
+            while len(nodes) > 1:
+                nodes = _get_packed_nodes(nodes, lambda node: node.box, False, node_capacity)
+            self.root = nodes[0]
+
+    def get_overlapping(self, box):
+        """ return all items with a box overlapping the given box (or touching it) """
+        result = []
+        if (self.root is None) or not _is_overlapping(self.root.box, box):
+            return result
+        queue = [self.root]
+        while queue:
+            node = queue.pop()
+            if node.is_leaf:
+                result.extend(item for item_box, item in node.children
+                              if _is_overlapping(item_box, box))
+            else:
+                queue.extend(child for child in node.children if _is_overlapping(child.box, box))
+        return result
@@ -19,12 +19,14 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import collections
 import math
 import re
 import os
 
 from pycam.errors import AbortOperationException, LoadFileError
 from pycam.Geometry.Triangle import Triangle
+from pycam.Geometry.PointGrid import PointGrid, get_grid_cell_size
 from pycam.Geometry.PointUtils import pdist
 from pycam.Geometry.Line import Line
 import pycam.Geometry.Model
@@ -52,8 +54,8 @@ class DXFParser:
     Reference: http://images.autodesk.com/adsk/files/autocad_2012_pdf_dxf-reference_enu.pdf
     """
 
-    # see http://www.autodesk.com/techpubs/autocad/acad2000/dxf/group_code_value_types_dxf_01.htm
-    MAX_CHARS_PER_LINE = 2049
+    # the input is read in blocks of this size (in bytes)
+    READ_BLOCK_SIZE = 2 ** 20
 
     KEYS = {
         "MARKER": 0,
@@ -90,6 +92,16 @@ class DXFParser:
         "CURVE_TYPE": 75,
     }
 
+    # the types of values (all other values are upper case strings)
+    # see http://www.autodesk.com/techpubs/autocad/acad2000/dxf/group_code_value_types_dxf_01.htm
+    FLOAT_KEYS = frozenset(map(KEYS.get, (
+        "P1_X", "P1_Y", "P1_Z", "P2_X", "P2_Y", "P2_Z", "RADIUS", "ANGLE_START", "ANGLE_END",
+        "TEXT_HEIGHT", "TEXT_WIDTH_FINAL", "TEXT_ROTATION", "TEXT_SKEW_ANGLE", "VERTEX_BULGE")))
+    INT_KEYS = frozenset(map(KEYS.get, (
+        "COLOR", "TEXT_MIRROR_FLAGS", "TEXT_ALIGN_HORIZONTAL", "TEXT_ALIGN_VERTICAL",
+        "MTEXT_ALIGNMENT", "CURVE_TYPE", "ENTITY_FLAGS")))
+    TEXT_KEYS = frozenset(map(KEYS.get, ("DEFAULT", "TEXT_MORE")))
+
     IGNORE_KEYS = ("DICTIONARY", "VPORT", "LTYPE", "STYLE", "APPID", "DIMSTYLE", "BLOCK_RECORD",
                    "BLOCK", "ENDBLK", "ACDBDICTIONARYWDFLT", "POINT", "ACDBPLACEHOLDER", "LAYOUT",
                    "MLINESTYLE", "DICTIONARYVAR", "CLASS", "HATCH", "VIEW", "VIEWPORT")
@@ -100,6 +112,7 @@ class DXFParser:
         self.lines = []
         self.triangles = []
         self._input_stack = []
+        self._key_values = self._iter_key_values()
         self._color_as_height = color_as_height
         if callback:
             # no "percent" updates - just pulse ...
@@ -120,51 +133,64 @@ class DXFParser:
         return {"lines": self.lines, "triangles": self.triangles}
 
     def optimize_line_order(self):
+        # Chain the lines to groups.  A group is continued with the first remaining line (in
+        # the original order) starting at its end or ending at its start.
+        lines_by_start = {}
+        lines_by_end = {}
+        for index, line in enumerate(self.lines):
+            lines_by_start.setdefault(line.p1, collections.deque()).append(index)
+            lines_by_end.setdefault(line.p2, collections.deque()).append(index)
+        is_remaining = [True] * len(self.lines)
+
+        def get_first_remaining(line_map, point):
+            candidates = line_map.get(point)
+            if not candidates:
+                return None
+            while candidates and not is_remaining[candidates[0]]:
+                candidates.popleft()
+            return candidates[0] if candidates else None
+
         groups = []
-        current_group = []
-        groups.append(current_group)
-        remaining_lines = self.lines[:]
-        while remaining_lines:
+        for index, line in enumerate(self.lines):
+            if not is_remaining[index]:
+                continue
             if self.callback and self.callback():
                 return
-            if not current_group:
-                current_group.append(remaining_lines.pop(0))
-            else:
-                first_line = current_group[0]
-                last_line = current_group[-1]
-                for line in remaining_lines:
-                    if last_line.p2 == line.p1:
-                        current_group.append(line)
-                        remaining_lines.remove(line)
-                        break
-                    if first_line.p1 == line.p2:
-                        current_group.insert(0, line)
-                        remaining_lines.remove(line)
-                        break
+            is_remaining[index] = False
+            current_group = collections.deque([line])
+            while True:
+                following = get_first_remaining(lines_by_start, current_group[-1].p2)
+                preceding = get_first_remaining(lines_by_end, current_group[0].p1)
+                if (following is not None) and ((preceding is None) or (following <= preceding)):
+                    current_group.append(self.lines[following])
+                    is_remaining[following] = False
+                elif preceding is not None:
+                    current_group.appendleft(self.lines[preceding])
+                    is_remaining[preceding] = False
                 else:
-                    current_group = []
-                    groups.append(current_group)
-
-        def get_distance_between_groups(group1, group2):
-            forward = pdist(group1[-1].p2, group2[0].p1)
-            backward = pdist(group2[-1].p2, group1[0].p1)
-            return min(forward, backward)
-
-        remaining_groups = groups[:]
+                    break
+            groups.append(list(current_group))
+        if not groups:
+            return
+        # Order the groups: continue with the closest group (the first one in case of equal
+        # distances).  The group may be connected to the end or to the start of the current one.
+        starts = [group[0].p1 for group in groups]
+        ends = [group[-1].p2 for group in groups]
+        cell_size = get_grid_cell_size(starts + ends)
+        start_grid = PointGrid(cell_size, enumerate(starts), get_distance=pdist)
+        end_grid = PointGrid(cell_size, enumerate(ends), get_distance=pdist)
+        current = 0
         ordered_groups = []
-        while remaining_groups:
-            if not ordered_groups:
-                ordered_groups.append(remaining_groups.pop(0))
-            else:
-                current_group = ordered_groups[-1]
-                closest_distance = None
-                for cmp_group in remaining_groups:
-                    cmp_distance = get_distance_between_groups(current_group, cmp_group)
-                    if (closest_distance is None) or (cmp_distance < closest_distance):
-                        closest_distance = cmp_distance
-                        closest_group = cmp_group
-                ordered_groups.append(closest_group)
-                remaining_groups.remove(closest_group)
+        while True:
+            start_grid.remove(current)
+            end_grid.remove(current)
+            ordered_groups.append(groups[current])
+            if len(start_grid) == 0:
+                break
+            forward = start_grid.get_nearest(ends[current])
+            backward = end_grid.get_nearest(starts[current])
+            current = min((pdist(ends[current], starts[forward]), forward),
+                          (pdist(ends[backward], starts[current]), backward))[1]
         result = []
         for group in ordered_groups:
             result.extend(group)
@@ -176,47 +202,75 @@ class DXFParser:
     def _read_key_value(self):
         if self._input_stack:
             return self._input_stack.pop()
-        try:
-            line1 = self.inputstream.readline(self.MAX_CHARS_PER_LINE).strip()
-            line2 = self.inputstream.readline(self.MAX_CHARS_PER_LINE).strip()
-        except IOError:
-            return None, None
-        if not line1 and not line2:
-            return None, None
-        try:
-            line1 = int(line1)
-        except ValueError:
-            log.warn("DXFImporter: Invalid key in line %d (int expected): %s",
-                     self.line_number, line1)
-            return None, None
-        if line1 in [self.KEYS[key]
-                     for key in ("P1_X", "P1_Y", "P1_Z", "P2_X", "P2_Y", "P2_Z", "RADIUS",
-                                 "ANGLE_START", "ANGLE_END", "TEXT_HEIGHT", "TEXT_WIDTH_FINAL",
-                                 "TEXT_ROTATION", "TEXT_SKEW_ANGLE", "VERTEX_BULGE")]:
-            try:
-                line2 = float(line2)
-            except ValueError:
-                log.warn("DXFImporter: Invalid input in line %d (float expected): %s",
-                         self.line_number, line2)
-                line1 = None
-                line2 = None
-        elif line1 in [self.KEYS[key]
-                       for key in ("COLOR", "TEXT_MIRROR_FLAGS", "TEXT_ALIGN_HORIZONTAL",
-                                   "TEXT_ALIGN_VERTICAL", "MTEXT_ALIGNMENT", "CURVE_TYPE",
-                                   "ENTITY_FLAGS")]:
+        return next(self._key_values, (None, None))
+
+    def _iter_lines(self):
+        """ read the input in large blocks and return lists of lines (with an even length) """
+        rest = b""
+        odd_line = []
+        while True:
             try:
-                line2 = int(line2)
-            except ValueError:
-                log.warn("DXFImporter: Invalid input in line %d (int expected): %s",
-                         self.line_number, line2)
-                line1 = None
-                line2 = None
-        elif line1 in [self.KEYS[key] for key in ("DEFAULT", "TEXT_MORE")]:
-            line2 = _unescape_control_characters(self._carefully_decode(line2))
-        else:
-            line2 = self._carefully_decode(line2).upper()
-        self.line_number += 2
-        return line1, line2
+                block = self.inputstream.read(self.READ_BLOCK_SIZE)
+            except IOError:
+                block = b""
+            if block:
+                lines = (rest + block).split(b"\n")
+                # the last line may be incomplete
+                rest = lines.pop()
+            else:
+                lines = [rest] if rest else []
+            lines = odd_line + lines
+            if len(lines) % 2 == 1:
+                if block:
+                    odd_line = [lines.pop()]
+                else:
+                    lines.append(b"")
+            else:
+                odd_line = []
+            yield lines
+            if not block:
+                break
+
+    def _iter_key_values(self):
+        """ split the input into typed pairs of key and value
+
+        An invalid pair is returned as (None, None).  The input ends with two empty lines.
+        """
+        float_keys, int_keys, text_keys = self.FLOAT_KEYS, self.INT_KEYS, self.TEXT_KEYS
+        for lines in self._iter_lines():
+            lines = [line.strip() for line in lines]
+            for line1, line2 in zip(lines[0::2], lines[1::2]):
+                if not line1 and not line2:
+                    return
+                try:
+                    line1 = int(line1)
+                except ValueError:
+                    log.warn("DXFImporter: Invalid key in line %d (int expected): %s",
+                             self.line_number, line1)
+                    yield None, None
+                    continue
+                if line1 in float_keys:
+                    try:
+                        line2 = float(line2)
+                    except ValueError:
+                        log.warn("DXFImporter: Invalid input in line %d (float expected): %s",
+                                 self.line_number, line2)
+                        line1 = None
+                        line2 = None
+                elif line1 in int_keys:
+                    try:
+                        line2 = int(line2)
+                    except ValueError:
+                        log.warn("DXFImporter: Invalid input in line %d (int expected): %s",
+                                 self.line_number, line2)
+                        line1 = None
+                        line2 = None
+                elif line1 in text_keys:
+                    line2 = _unescape_control_characters(self._carefully_decode(line2))
+                else:
+                    line2 = self._carefully_decode(line2).upper()
+                self.line_number += 2
+                yield line1, line2
 
     def _carefully_decode(self, text):
         try:
@@ -26,7 +26,7 @@ from pycam.Geometry import ceil, epsilon, sqrt
 from pycam.Geometry.Line import Line
 from pycam.Geometry.Plane import Plane
 from pycam.Geometry.PointUtils import padd, pcross, pdot, pmul, pnorm, pnormalized, psub
-from pycam.PathGenerators import get_free_paths_triangles
+from pycam.PathGenerators import get_free_paths_triangles, get_progress_token
 from pycam.Utils import ProgressCounter
 from pycam.Utils.threading import run_in_parallel
 import pycam.Utils.log
@@ -215,7 +215,8 @@ class ContourFollow:
         # only the first model is used for the contour-follow algorithm
         # TODO: should we combine all models?
         num_of_triangles = len(models[0].triangles(minx=minx, miny=miny, maxx=maxx, maxy=maxy))
-        progress_counter = ProgressCounter(2 * num_of_layers * num_of_triangles, draw_callback)
+        progress = get_progress_token(draw_callback)
+        progress_counter = ProgressCounter(2 * num_of_layers * num_of_triangles, progress.update)
 
         current_layer = 0
 
@@ -224,14 +225,13 @@ class ContourFollow:
         # collision handling function
         for z in z_steps:
             # update the progress bar and check, if we should cancel the process
-            if draw_callback:
-                if draw_callback(text=("ContourFollow: processing layer %d/%d"
-                                       % (current_layer + 1, num_of_layers))):
-                    # cancel immediately
-                    break
+            if progress.set_text("ContourFollow: processing layer %d/%d"
+                                 % (current_layer + 1, num_of_layers)):
+                # cancel immediately
+                break
             self.pa.new_direction(0)
             self.generate_toolpath_slice(cutter, models[0], minx, maxx, miny, maxy, z,
-                                         draw_callback, progress_counter, num_of_triangles)
+                                         progress, progress_counter, num_of_triangles)
             self.pa.end_direction()
             self.pa.finish()
             current_layer += 1
@@ -239,6 +239,7 @@ class ContourFollow:
 
     def generate_toolpath_slice(self, cutter, model, minx, maxx, miny, maxy, z, draw_callback=None,
                                 progress_counter=None, num_of_triangles=None):
+        progress = get_progress_token(draw_callback)
         shifted_lines = self.get_potential_contour_lines(cutter, model, minx, maxx, miny, maxy, z,
                                                          progress_counter=progress_counter)
         if num_of_triangles is None:
@@ -257,8 +258,7 @@ class ContourFollow:
                 for p in points:
                     self.pa.append(p)
                 last_position = points[-1]
-                if draw_callback:
-                    draw_callback(tool_position=last_position, toolpath=self.pa.paths)
+                progress.update_position(last_position, toolpath=self.pa.paths)
             # update the progress counter
             if progress_counter is not None:
                 if progress_counter.increment():
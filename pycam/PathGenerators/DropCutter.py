@@ -19,7 +19,7 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import pycam.Geometry.Model
-from pycam.PathGenerators import get_max_height_dynamic
+from pycam.PathGenerators import get_max_height_dynamic, get_progress_token
 from pycam.Toolpath.Steps import MoveStraight, MoveSafety
 from pycam.Utils import ProgressCounter
 from pycam.Utils.threading import run_in_parallel
@@ -43,8 +43,24 @@ class DropCutter:
 
     def generate_toolpath(self, cutter, models, motion_grid, minz=None, maxz=None,
                           draw_callback=None):
+        progress = get_progress_token(draw_callback)
         path = []
-        quit_requested = False
+        for line_moves in self.get_toolpath_lines(cutter, models, motion_grid, minz=minz,
+                                                  maxz=maxz, draw_callback=progress):
+            path.extend(line_moves)
+            # The progress token returns True, if cancel was requested.
+            if progress.update(toolpath=path):
+                break
+        return path
+
+    def get_toolpath_lines(self, cutter, models, motion_grid, minz=None, maxz=None,
+                           draw_callback=None):
+        """ generate the moves of the toolpath - one list of moves for each grid line
+
+        The lines are calculated on demand.  Thus the toolpath can be processed (e.g. exported)
+        line by line without keeping all of it in memory.
+        """
+        progress = get_progress_token(draw_callback)
         model = pycam.Geometry.Model.get_combined_model(models)
 
         # Transfer the grid (a generator) into a list of lists and count the
@@ -56,7 +72,7 @@ class DropCutter:
                 lines.append(line)
 
         num_of_lines = len(lines)
-        progress_counter = ProgressCounter(len(lines), draw_callback)
+        progress_counter = ProgressCounter(len(lines), progress.update)
         current_line = 0
 
         args = []
@@ -66,26 +82,27 @@ class DropCutter:
             args.append((xy_coords, minz, maxz, model, cutter))
         for points in run_in_parallel(_process_one_grid_line, args,
                                       callback=progress_counter.update):
-            if draw_callback and draw_callback(
+            if progress.update(
                     text="DropCutter: processing line %d/%d" % (current_line + 1, num_of_lines)):
                 # cancel requested
-                quit_requested = True
-                break
+                return
+            quit_requested = False
+            line_moves = []
             for point in points:
                 if point is None:
                     # exceeded maxz - the cutter has to skip this point
-                    path.append(MoveSafety())
+                    line_moves.append(MoveSafety())
                 else:
-                    path.append(MoveStraight(point))
-                # The progress counter may return True, if cancel was requested.
-                if draw_callback and draw_callback(tool_position=point, toolpath=path):
+                    line_moves.append(MoveStraight(point))
+                # The progress token returns True, if cancel was requested.
+                if (point is not None) and progress.update_position(point):
                     quit_requested = True
                     break
             # add a move to safety height after each line of moves
-            path.append(MoveSafety())
+            line_moves.append(MoveSafety())
             progress_counter.increment()
             # update progress
             current_line += 1
+            yield line_moves
             if quit_requested:
-                break
-        return path
+                return
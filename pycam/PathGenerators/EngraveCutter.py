@@ -18,6 +18,7 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+from pycam.PathGenerators import get_progress_token
 import pycam.Utils.log
 
 log = pycam.Utils.log.get_logger()
@@ -27,12 +28,12 @@ class EngraveCutter:
 
     def generate_toolpath(self, cutter, models, motion_grid, minz=None, maxz=None,
                           draw_callback=None):
+        progress = get_progress_token(draw_callback)
         quit_requested = False
 
         model = pycam.Geometry.Model.get_combined_model(models)
 
-        if draw_callback:
-            draw_callback(text="Engrave: optimizing polygon order")
+        progress.set_text("Engrave: optimizing polygon order")
 
         # resolve the generator
         motion_grid = list(motion_grid)
@@ -44,14 +45,14 @@ class EngraveCutter:
         push_moves = []
         for push_layer in push_layers:
             # update the progress bar and check, if we should cancel the process
-            if draw_callback and draw_callback(
-                    text="Engrave: processing layer %d/%d" % (current_layer + 1, num_of_layers)):
+            if progress.set_text(
+                    "Engrave: processing layer %d/%d" % (current_layer + 1, num_of_layers)):
                 # cancel immediately
                 quit_requested = True
                 break
             # no callback: otherwise the status text gets lost
             push_moves.extend(push_generator.generate_toolpath(cutter, [model], [push_layer]))
-            if draw_callback and draw_callback():
+            if progress.update():
                 # cancel requested
                 quit_requested = True
                 break
@@ -62,9 +63,7 @@ class EngraveCutter:
 
         drop_generator = pycam.PathGenerators.DropCutter.DropCutter()
         drop_layers = motion_grid[-1:]
-        if draw_callback:
-            draw_callback(
-                text="Engrave: processing layer %d/%d" % (current_layer + 1, num_of_layers))
+        progress.set_text("Engrave: processing layer %d/%d" % (current_layer + 1, num_of_layers))
         drop_moves = drop_generator.generate_toolpath(cutter, [model], drop_layers, minz=minz,
-                                                      maxz=maxz, draw_callback=draw_callback)
+                                                      maxz=maxz, draw_callback=progress)
         return push_moves + drop_moves
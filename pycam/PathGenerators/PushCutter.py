@@ -18,7 +18,7 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-from pycam.PathGenerators import get_free_paths_triangles
+from pycam.PathGenerators import get_free_paths_triangles, get_progress_token
 import pycam.PathProcessors.ContourCutter
 from pycam.Utils.threading import run_in_parallel
 from pycam.Utils import ProgressCounter
@@ -45,6 +45,7 @@ class PushCutter:
 
     def generate_toolpath(self, cutter, models, motion_grid, minz=None, maxz=None,
                           draw_callback=None):
+        progress = get_progress_token(draw_callback)
         # Transfer the grid (a generator) into a list of lists and count the items.
         grid = []
         num_of_grid_positions = 0
@@ -58,7 +59,7 @@ class PushCutter:
 
         num_of_layers = len(grid)
 
-        progress_counter = ProgressCounter(num_of_grid_positions, draw_callback)
+        progress_counter = ProgressCounter(num_of_grid_positions, progress.update)
 
         current_layer = 0
         if self.waterlines:
@@ -67,14 +68,14 @@ class PushCutter:
             path = []
         for layer_grid in grid:
             # update the progress bar and check, if we should cancel the process
-            if draw_callback and draw_callback(text=("PushCutter: processing layer %d/%d"
-                                                     % (current_layer + 1, num_of_layers))):
+            if progress.set_text("PushCutter: processing layer %d/%d"
+                                 % (current_layer + 1, num_of_layers)):
                 # cancel immediately
                 break
 
             if self.waterlines:
                 self.pa.new_direction(0)
-            result = self.generate_toolpath_slice(cutter, models, layer_grid, draw_callback,
+            result = self.generate_toolpath_slice(cutter, models, layer_grid, progress,
                                                   progress_counter)
             if self.waterlines:
                 self.pa.end_direction()
@@ -114,6 +115,7 @@ class PushCutter:
 
     def generate_toolpath_slice(self, cutter, models, layer_grid, draw_callback=None,
                                 progress_counter=None):
+        progress = get_progress_token(draw_callback)
         path = []
         # the ContourCutter pathprocessor does not work with combined models
         if self.waterlines:
@@ -136,12 +138,10 @@ class PushCutter:
                         path.append(MoveStraight(points[2 * index + 1]))
                         path.append(MoveSafety())
                 if self.waterlines:
-                    if draw_callback:
-                        draw_callback(tool_position=points[-1])
+                    progress.update_position(points[-1])
                     self.pa.end_scanline()
                 else:
-                    if draw_callback:
-                        draw_callback(tool_position=points[-1], toolpath=path)
+                    progress.update_position(points[-1], toolpath=path)
             # update the progress counter
             if progress_counter and progress_counter.increment():
                 # quit requested
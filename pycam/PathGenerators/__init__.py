@@ -23,6 +23,7 @@ import time
 from pycam.Geometry import epsilon, INFINITE
 from pycam.Geometry.PointUtils import pdist, pnorm, pnormalized, psub
 from pycam.Utils.events import get_event_handler
+from pycam.Utils.progress import get_progress_channel
 
 
 class Hit:
@@ -214,17 +215,25 @@ def get_max_height_dynamic(model, cutter, positions, minz, maxz):
 
 
 class UpdateToolView:
-    """ visualize the position of the tool and the partial toolpath during toolpath generation """
+    """ visualize the position of the tool and the partial toolpath during toolpath generation
+
+    Within a worker thread (see "pycam.Utils.progress.ProgressChannel") the state is passed to
+    the channel of the thread instead.  The GUI thread takes care for the visualization.
+    """
 
     def __init__(self, callback, max_fps=1):
         self.callback = callback
         self.core = get_event_handler()
+        self.channel = get_progress_channel()
         self.last_update_time = time.time()
         self.max_fps = max_fps
         self.last_tool_position = None
         self.current_tool_position = None
 
     def update(self, text=None, percent=None, tool_position=None, toolpath=None):
+        if self.channel is not None:
+            self.channel.update(tool_position=tool_position, toolpath=toolpath)
+            return self.callback(text=text, percent=percent)
         if toolpath is not None:
             self.core.set("toolpath_in_progress", toolpath)
         # always store the most recently reported tool_position for the next visualization
@@ -246,3 +255,80 @@ class UpdateToolView:
                 self.core.emit_event("visual-item-updated")
         # break the loop if someone clicked the "cancel" button
         return self.callback(text=text, percent=percent)
+
+
+class ProgressToken:
+    """ progress reports and cancellation requests of a path generator
+
+    Path generators may report every calculated position.  These reports are stored cheaply and
+    passed to the callback (e.g. "UpdateToolView.update") at most "max_fps" times per second.
+    The clock is read only for every "check_count"th position report.
+    A cancellation request (returned by the callback or issued via "cancel") is kept in the
+    "cancelled" flag.  All reporting methods return this flag.
+    """
+
+    def __init__(self, callback=None, max_fps=1, check_count=100):
+        self.callback = callback
+        self.cancelled = False
+        self._interval = 1.0 / max_fps
+        self._check_count = check_count
+        self._countdown = 0
+        self._next_report_time = 0
+        self._text = None
+        self._percent = None
+        self._tool_position = None
+        self._toolpath = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def set_text(self, text):
+        """ report the start of a new stage of the calculation immediately """
+        self._text = text
+        return self._report()
+
+    def update(self, text=None, percent=None, toolpath=None):
+        """ report the progress of the calculation (with a limited frequency) """
+        if text is not None:
+            self._text = text
+        if percent is not None:
+            self._percent = percent
+        if toolpath is not None:
+            self._toolpath = toolpath
+        if (self.callback is None) or (time.time() < self._next_report_time):
+            return self.cancelled
+        return self._report()
+
+    def update_position(self, tool_position, toolpath=None):
+        """ report the current position of the tool (cheap enough for every calculated point) """
+        self._tool_position = tool_position
+        if toolpath is not None:
+            self._toolpath = toolpath
+        self._countdown -= 1
+        if self._countdown > 0:
+            return self.cancelled
+        self._countdown = self._check_count
+        return self.update()
+
+    def _report(self):
+        self._next_report_time = time.time() + self._interval
+        if self.callback and self.callback(text=self._text, percent=self._percent,
+                                           tool_position=self._tool_position,
+                                           toolpath=self._toolpath):
+            self.cancelled = True
+        self._text = None
+        self._percent = None
+        self._tool_position = None
+        self._toolpath = None
+        return self.cancelled
+
+
+def get_progress_token(draw_callback):
+    """ return a ProgressToken for the "draw_callback" argument of a path generator
+
+    Callables (with the signature of "UpdateToolView.update") are wrapped for compatibility.
+    """
+    if isinstance(draw_callback, ProgressToken):
+        return draw_callback
+    else:
+        return ProgressToken(draw_callback)
@@ -61,6 +61,26 @@ class GCodePlungeFeedrate(pycam.Plugins.PluginBase):
         self.core.get("unregister_parameter")("toolpath_profile", "plunge_feedrate")
 
 
+class GCodeArcFitting(pycam.Plugins.PluginBase):
+
+    DEPENDS = ["ExportSettings"]
+    CATEGORIES = ["GCode"]
+
+    def setup(self):
+        # a tolerance of zero disables the arc fitting
+        self.control = pycam.Gui.ControlsGTK.InputNumber(
+            digits=3, lower=0,
+            change_handler=lambda *args: self.core.emit_event("export-settings-control-changed"))
+        self.core.get("register_parameter")("toolpath_profile", "arc_fitting", self.control)
+        self.core.register_ui("gcode_general_parameters", "Arc fitting tolerance",
+                              self.control.get_widget(), weight=30)
+        return True
+
+    def teardown(self):
+        self.core.unregister_ui("gcode_general_parameters", self.control.get_widget())
+        self.core.get("unregister_parameter")("toolpath_profile", "arc_fitting")
+
+
 # TODO: move to settings for ToolpathOutputDialects
 class GCodeFilenameExtension(pycam.Plugins.PluginBase):
 
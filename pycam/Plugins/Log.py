@@ -21,6 +21,7 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 import datetime
 import os
 import re
+import threading
 
 import pycam.Plugins
 import pycam.Utils
@@ -79,6 +80,10 @@ class Log(pycam.Plugins.PluginBase):
             # TODO: disconnect the log handler
 
     def add_log_message(self, title, message, record=None):
+        if threading.current_thread() is not threading.main_thread():
+            # GTK may only be used by the main thread (e.g. not by a toolpath generator)
+            self._gobject.idle_add(self.add_log_message, title, message, record)
+            return
         timestamp = datetime.datetime.fromtimestamp(record.created).strftime("%H:%M")
         # avoid the ugly character for a linefeed
         message = " ".join(message.splitlines())
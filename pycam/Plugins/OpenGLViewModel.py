@@ -17,8 +17,15 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import collections
+
+try:
+    from OpenGL.arrays import vbo
+except ImportError:
+    # OpenGL-related plugins are not available in this case
+    vbo = None
+
 from pycam.errors import InvalidDataError
-from pycam.Geometry.PointUtils import padd, pdot, pmul, pnormalized
 import pycam.Plugins
 
 
@@ -121,23 +128,31 @@ class OpenGLViewModelTriangle(pycam.Plugins.PluginBase):
 
     DEPENDS = ["OpenGLViewModel"]
     CATEGORIES = ["Model", "Visualization", "OpenGL"]
+    # number of models with cached vertex buffers
+    MAX_CACHED_MODELS = 8
 
     def setup(self):
         self.core.register_chain("draw_models", self.draw_triangle_model, 10)
+        self._mesh_cache = collections.OrderedDict()
         return True
 
     def teardown(self):
         self.core.unregister_chain("draw_models", self.draw_triangle_model)
+        self._mesh_cache.clear()
 
-    def draw_triangle_model(self, models):
-        def calc_normal(main, normals):
-            suitable = (0, 0, 0, 'v')
-            for normal, weight in normals:
-                dot = pdot(main, normal)
-                if dot > 0:
-                    suitable = padd(suitable, pmul(normal, weight * dot))
-            return pnormalized(suitable)
+    def _get_mesh_buffers(self, model):
+        """ return the vertex buffers of a triangle model (cached by the uuid of the model) """
+        key = model.uuid
+        if key in self._mesh_cache:
+            self._mesh_cache.move_to_end(key)
+        else:
+            vertices, normals = model.get_mesh_arrays()
+            self._mesh_cache[key] = (vbo.VBO(vertices), vbo.VBO(normals), len(vertices))
+            while len(self._mesh_cache) > self.MAX_CACHED_MODELS:
+                self._mesh_cache.popitem(last=False)
+        return self._mesh_cache[key]
 
+    def draw_triangle_model(self, models):
         if not models:
             return
         GL = self._GL
@@ -145,21 +160,21 @@ class OpenGLViewModelTriangle(pycam.Plugins.PluginBase):
         for index, model in enumerate(models):
             if not hasattr(model, "triangles"):
                 continue
-            vertices = {}
-            for t in model.triangles():
-                for p in (t.p1, t.p2, t.p3):
-                    if p not in vertices:
-                        vertices[p] = []
-                    vertices[p].append((pnormalized(t.normal), t.get_area()))
-            GL.glBegin(GL.GL_TRIANGLES)
-            for t in model.triangles():
-                # The triangle's points are in clockwise order, but GL expects
-                # counter-clockwise sorting.
-                for p in (t.p1, t.p3, t.p2):
-                    normal = calc_normal(pnormalized(t.normal), vertices[p])
-                    GL.glNormal3f(normal[0], normal[1], normal[2])
-                    GL.glVertex3f(p[0], p[1], p[2])
-            GL.glEnd()
+            vertices, normals, count = self._get_mesh_buffers(model)
+            if count > 0:
+                GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+                GL.glEnableClientState(GL.GL_NORMAL_ARRAY)
+                try:
+                    vertices.bind()
+                    GL.glVertexPointer(3, GL.GL_FLOAT, 0, vertices)
+                    vertices.unbind()
+                    normals.bind()
+                    GL.glNormalPointer(GL.GL_FLOAT, 0, normals)
+                    normals.unbind()
+                    GL.glDrawArrays(GL.GL_TRIANGLES, 0, count)
+                finally:
+                    GL.glDisableClientState(GL.GL_NORMAL_ARRAY)
+                    GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
             removal_list.append(index)
         # remove all models that we processed
         removal_list.reverse()
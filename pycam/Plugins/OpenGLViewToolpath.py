@@ -19,7 +19,13 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 
 import pycam.Plugins
 import pycam.Gui.OpenGLTools
-from pycam.Toolpath import MOVES_LIST, MOVE_STRAIGHT_RAPID
+from pycam.Toolpath import MOVES_LIST, MOVE_ARC, MOVE_STRAIGHT_RAPID, get_arc_positions
+
+
+# toolpaths with more moves are drawn with a level of detail depending on the view
+LEVEL_OF_DETAIL_MIN_MOVES = 200000
+# the size of the merged cells of a level of detail (in pixels)
+LEVEL_OF_DETAIL_PIXEL_TOLERANCE = 1.0
 
 
 class OpenGLViewToolpath(pycam.Plugins.PluginBase):
@@ -79,43 +85,68 @@ class OpenGLViewToolpath(pycam.Plugins.PluginBase):
                 settings_filters.extend(selected_export_settings.get_toolpath_filters())
             for toolpath_dict in self.core.get("toolpaths").get_visible():
                 toolpath = toolpath_dict.get_toolpath()
-                if toolpath:
-                    # TODO: enable the VBO code for speedup!
-                    # moves = toolpath.get_moves_for_opengl(self.core.get("gcode_safety_height"))
-                    # self._draw_toolpath_moves2(moves)
-                    moves = toolpath.get_basic_moves(filters=settings_filters)
-                    self._draw_toolpath_moves(moves)
+                if not toolpath:
+                    continue
+                show_directions = self.core.get("show_directions")
+                if len(toolpath.get_basic_moves(filters=settings_filters)) \
+                        < LEVEL_OF_DETAIL_MIN_MOVES:
+                    self._draw_toolpath_buffers(toolpath.get_opengl_buffers(
+                        filters=settings_filters, show_directions=show_directions))
+                else:
+                    self._draw_toolpath_level_of_detail(
+                        toolpath.get_level_of_detail(filters=settings_filters), show_directions)
         elif toolpath_in_progress is not None:
             if self.core.get("show_simulation") or self.core.get("show_toolpath_progress"):
                 self._draw_toolpath_moves(toolpath_in_progress)
 
-    def _draw_toolpath_moves2(self, paths):
+    def _draw_toolpath_level_of_detail(self, level_of_detail, show_directions):
+        """ draw the visible tiles of a huge toolpath with a detail level suitable for the view
+
+        The number of drawn vertices depends on the size of the view instead of the toolpath.
+        """
+        GL = self._GL
+        # the camera is positioned via the projection matrix
+        GL.glMatrixMode(GL.GL_MODELVIEW)
+        GL.glLoadIdentity()
+        viewport = GL.glGetIntegerv(GL.GL_VIEWPORT)
+        buffers = []
+        for tile, level in level_of_detail.select_levels(
+                GL.glGetDoublev(GL.GL_PROJECTION_MATRIX), GL.glGetDoublev(GL.GL_MODELVIEW_MATRIX),
+                (viewport[2], viewport[3]), pixel_tolerance=LEVEL_OF_DETAIL_PIXEL_TOLERANCE):
+            buffers.extend(level_of_detail.get_buffers(tile, level,
+                                                       show_directions=show_directions))
+        self._draw_toolpath_buffers(buffers)
+
+    def _draw_toolpath_buffers(self, buffers):
         GL = self._GL
         GL.glDisable(GL.GL_LIGHTING)
         color_rapid = self.core.get("color_toolpath_return")
         color_cut = self.core.get("color_toolpath_cut")
-        show_directions = self.core.get("show_directions")
         GL.glMatrixMode(GL.GL_MODELVIEW)
         GL.glLoadIdentity()
-        coords = paths[0]
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
         try:
-            coords.bind()
-            GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
-            GL.glVertexPointerf(coords)
-            for path in paths[1]:
-                if path[2]:
-                    GL.glColor4f(color_rapid["red"], color_rapid["green"], color_rapid["blue"],
-                                 color_rapid["alpha"])
-                else:
-                    GL.glColor4f(color_cut["red"], color_cut["green"], color_cut["blue"],
-                                 color_cut["alpha"])
-                if show_directions:
-                    GL.glDisable(GL.GL_CULL_FACE)
-                    GL.glDrawElements(GL.GL_TRIANGLES, len(path[1]), GL.GL_UNSIGNED_INT, path[1])
-                    GL.glEnable(GL.GL_CULL_FACE)
-                GL.glDrawElements(GL.GL_LINE_STRIP, len(path[0]), GL.GL_UNSIGNED_INT, path[0])
+            for buf in buffers:
+                color = color_rapid if buf.is_rapid else color_cut
+                GL.glColor4f(color["red"], color["green"], color["blue"], color["alpha"])
+                buf.vertices.bind()
+                try:
+                    GL.glVertexPointer(3, GL.GL_FLOAT, 0, buf.vertices)
+                    if buf.indices is None:
+                        GL.glDrawArrays(GL.GL_LINES, 0, buf.count)
+                    else:
+                        GL.glDisable(GL.GL_CULL_FACE)
+                        buf.indices.bind()
+                        try:
+                            GL.glDrawElements(GL.GL_TRIANGLES, buf.count, GL.GL_UNSIGNED_INT,
+                                              buf.indices)
+                        finally:
+                            buf.indices.unbind()
+                        GL.glEnable(GL.GL_CULL_FACE)
+                finally:
+                    buf.vertices.unbind()
         finally:
-            coords.unbind()
+            GL.glDisableClientState(GL.GL_VERTEX_ARRAY)
 
     # Simulate still depends on this pathway
     def _draw_toolpath_moves(self, moves):
@@ -148,6 +179,11 @@ class OpenGLViewToolpath(pycam.Plugins.PluginBase):
                 if last_position is not None:
                     GL.glVertex3f(*last_position)
                 last_rapid = is_rapid
+            if (step.action == MOVE_ARC) and (step.center is not None) \
+                    and (last_position is not None):
+                # approximate the arc by straight lines
+                for position in get_arc_positions(last_position, step)[:-1]:
+                    GL.glVertex3f(*position)
             GL.glVertex3f(*step.position)
             if show_directions and (last_position is not None):
                 transitions.append((last_position, step.position))
@@ -236,6 +236,24 @@ class PathParamRadiusCompensation(pycam.Plugins.PluginBase):
         self.core.get("unregister_parameter")("process", "radius_compensation")
 
 
+class PathParamOptimizeRapidMoves(pycam.Plugins.PluginBase):
+
+    DEPENDS = ["Processes"]
+    CATEGORIES = ["Process", "Parameter"]
+
+    def setup(self):
+        self.control = pycam.Gui.ControlsGTK.InputCheckBox(
+            change_handler=lambda widget=None: self.core.emit_event("process-control-changed"))
+        self.core.get("register_parameter")("process", "optimize_rapid_moves", self.control)
+        self.core.register_ui("process_path_parameters", "Optimize rapid moves",
+                              self.control.get_widget(), weight=85)
+        return True
+
+    def teardown(self):
+        self.core.unregister_ui("process_path_parameters", self.control.get_widget())
+        self.core.get("unregister_parameter")("process", "optimize_rapid_moves")
+
+
 class PathParamTraceModel(pycam.Plugins.PluginBase):
 
     DEPENDS = ["Processes", "Models"]
@@ -25,14 +25,15 @@ import pycam.Toolpath.MotionGrid
 class ProcessStrategySlicing(pycam.Plugins.PluginBase):
 
     DEPENDS = ["ParameterGroupManager", "PathParamOverlap", "PathParamStepDown",
-               "PathParamMaterialAllowance", "PathParamPattern"]
+               "PathParamMaterialAllowance", "PathParamPattern", "PathParamOptimizeRapidMoves"]
     CATEGORIES = ["Process"]
 
     def setup(self):
         parameters = {"overlap": 0.1,
                       "step_down": 1.0,
                       "material_allowance": 0,
-                      "path_pattern": None}
+                      "path_pattern": None,
+                      "optimize_rapid_moves": False}
         self.core.get("register_parameter_set")("process", "slice", "Slice removal", None,
                                                 parameters=parameters, weight=10)
         return True
@@ -44,14 +45,15 @@ class ProcessStrategySlicing(pycam.Plugins.PluginBase):
 class ProcessStrategyContour(pycam.Plugins.PluginBase):
 
     DEPENDS = ["Processes", "PathParamStepDown", "PathParamMaterialAllowance",
-               "PathParamMillingStyle"]
+               "PathParamMillingStyle", "PathParamOptimizeRapidMoves"]
     CATEGORIES = ["Process"]
 
     def setup(self):
         parameters = {"step_down": 1.0,
                       "material_allowance": 0,
                       "overlap": 0.8,
-                      "milling_style": pycam.Toolpath.MotionGrid.MillingStyle.IGNORE}
+                      "milling_style": pycam.Toolpath.MotionGrid.MillingStyle.IGNORE,
+                      "optimize_rapid_moves": False}
         self.core.get("register_parameter_set")("process", "contour", "Waterline", None,
                                                 parameters=parameters, weight=20)
         return True
@@ -81,7 +83,8 @@ class ProcessStrategySurfacing(pycam.Plugins.PluginBase):
 class ProcessStrategyEngraving(pycam.Plugins.PluginBase):
 
     DEPENDS = ["ParameterGroupManager", "PathParamStepDown", "PathParamMillingStyle",
-               "PathParamRadiusCompensation", "PathParamTraceModel", "PathParamPocketingType"]
+               "PathParamRadiusCompensation", "PathParamTraceModel", "PathParamPocketingType",
+               "PathParamOptimizeRapidMoves"]
     CATEGORIES = ["Process"]
 
     def setup(self):
@@ -89,7 +92,8 @@ class ProcessStrategyEngraving(pycam.Plugins.PluginBase):
                       "milling_style": pycam.Toolpath.MotionGrid.MillingStyle.IGNORE,
                       "radius_compensation": False,
                       "trace_models": [],
-                      "pocketing_type": pycam.Toolpath.MotionGrid.PocketingType.NONE}
+                      "pocketing_type": pycam.Toolpath.MotionGrid.PocketingType.NONE,
+                      "optimize_rapid_moves": False}
         self.core.get("register_parameter_set")("process", "engrave", "Engraving", None,
                                                 parameters=parameters, weight=80)
         return True
@@ -17,16 +17,37 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import collections
+import concurrent.futures
 import time
 
 from pycam.errors import PycamBaseException
 from pycam.Flow.history import merge_history_and_block_events
 import pycam.Plugins
 import pycam.Utils
-from pycam.Utils.progress import ProgressContext
+from pycam.Utils.progress import ProgressChannel, set_progress_channel
 import pycam.workspace.data_models
 
 
+# number of toolpaths being calculated at the same time
+MAX_CONCURRENT_TASKS = 2
+
+GenerationJob = collections.namedtuple(
+    "GenerationJob", ("task", "toolpath", "tool", "channel", "start_time", "future"))
+
+
+def _generate_toolpath(toolpath, channel):
+    """ calculate a toolpath in a worker thread
+
+    Progress reports are passed to the channel instead of the GUI.
+    """
+    set_progress_channel(channel)
+    try:
+        return toolpath.get_toolpath()
+    finally:
+        set_progress_channel(None)
+
+
 class Tasks(pycam.Plugins.ListPluginBase):
 
     UI_FILE = "tasks.ui"
@@ -35,6 +56,10 @@ class Tasks(pycam.Plugins.ListPluginBase):
     COLLECTION_ITEM_TYPE = pycam.workspace.data_models.Task
 
     def setup(self):
+        self._executor = None
+        self._generation_jobs = []
+        self._generation_count = 0
+        self._generation_progress = None
         if self.gui:
             self._gtk_handlers = []
             task_frame = self.gui.get_object("TaskBox")
@@ -124,6 +149,13 @@ class Tasks(pycam.Plugins.ListPluginBase):
         return True
 
     def teardown(self):
+        for job in self._generation_jobs:
+            job.channel.cancel()
+            # remove pending jobs from the queue ("cancel_futures" requires Python 3.9)
+            job.future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
         self.clear_state_items()
         if self.gui and self._gtk:
             self.core.unregister_ui("main", self.gui.get_object("TaskBox"))
@@ -227,17 +259,44 @@ class Tasks(pycam.Plugins.ListPluginBase):
         self.select(new_task)
 
     def generate_toolpaths(self, tasks):
-        with ProgressContext("Generate Toolpaths") as progress:
-            progress.set_multiple(len(tasks), "Toolpath")
-            for task in tasks:
-                if not self.generate_toolpath(task, callback=progress.update):
-                    # break out of the loop, if cancel was requested
-                    break
-                progress.update_multiple()
-        # This explicit event is necessary as the initial event hits the toolpath visualiation
-        # plugin while the path is being calculated (i.e.: it is not displayed without
-        # "show_progress").
-        self.core.emit_event("toolpath-list-changed")
+        """ queue the generation of toolpaths for the given tasks
+
+        The toolpaths are calculated by worker threads (up to MAX_CONCURRENT_TASKS at the same
+        time).  The GUI thread polls their progress and visualizes the partial toolpath of the
+        oldest running task.  Generated toolpaths are added to the collection on completion.
+        """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_TASKS, thread_name_prefix="toolpath")
+        max_fps = self.core.get("tool_progress_max_fps", 1)
+        queued_count = 0
+        for task in tasks:
+            if any(job.task is task for job in self._generation_jobs):
+                self.log.info("Skipping task '%s': its toolpath is already being generated",
+                              task.get_application_value("name"))
+                continue
+            # the toolpath is added to the collection after its calculation
+            new_toolpath = pycam.workspace.data_models.Toolpath(
+                None, {"source": {"type": "task", "item": task.get_id()}},
+                add_to_collection=False)
+            channel = ProgressChannel(max_fps=max_fps)
+            self._generation_jobs.append(GenerationJob(
+                task, new_toolpath, task.get_value("tool").get_tool_geometry(), channel,
+                time.time(), self._executor.submit(_generate_toolpath, new_toolpath, channel)))
+            queued_count += 1
+        if queued_count == 0:
+            return
+        self._generation_count += queued_count
+        if self._generation_progress is None:
+            self._generation_progress = self.core.get("progress")
+            self._generation_progress.update(text="Generate Toolpaths", percent=0)
+            interval_ms = int(1000 / max_fps)
+            self._gobject.timeout_add(interval_ms, self._poll_generation_jobs)
+        # the number of toolpaths may have grown in the meantime
+        finished_count = self._generation_count - len(self._generation_jobs)
+        self._generation_progress.set_multiple(self._generation_count, "Toolpath")
+        for _ in range(finished_count):
+            self._generation_progress.update_multiple()
 
     def _generate_selected_toolpaths(self, widget=None):
         tasks = self.get_selected()
@@ -246,35 +305,66 @@ class Tasks(pycam.Plugins.ListPluginBase):
     def _generate_all_toolpaths(self, widget=None):
         self.generate_toolpaths(self.get_all())
 
-    def generate_toolpath(self, task, callback=None):
-        start_time = time.time()
-        if callback:
-            callback(text="Preparing toolpath generation")
-        self.core.set("current_tool", task.get_value("tool").get_tool_geometry())
-        # run the toolpath generation
-        if callback:
-            callback(text="Calculating the toolpath")
-        new_toolpath = pycam.workspace.data_models.Toolpath(
-            None, {"source": {"type": "task", "item": task.get_id()}})
+    def _poll_generation_jobs(self):
+        """ collect finished toolpaths and visualize the progress of the running jobs
+
+        This method is called periodically in the GUI thread (via "timeout_add").  It returns
+        False (i.e. stop calling) after the last job is finished.
+        """
+        progress = self._generation_progress
+        remaining_jobs = []
+        for job in self._generation_jobs:
+            if job.future.done():
+                self._finish_generation_job(job)
+                progress.update_multiple()
+            else:
+                remaining_jobs.append(job)
+        self._generation_jobs = remaining_jobs
+        if remaining_jobs:
+            # visualize the oldest running job
+            job = next((job for job in remaining_jobs if job.future.running()), remaining_jobs[0])
+            changed, text, percent, tool_position, toolpath = job.channel.get_state()
+            if self.core.get("current_tool") is not job.tool:
+                self.core.set("current_tool", job.tool)
+            if tool_position is not None:
+                job.tool.moveto(tool_position)
+            self.core.set("toolpath_in_progress", toolpath)
+            if changed:
+                self.core.emit_event("visual-item-updated")
+            if progress.update(text=text, percent=percent):
+                # the "cancel" button was clicked
+                for job in remaining_jobs:
+                    job.future.cancel()
+                    job.channel.cancel()
+            return True
+        else:
+            self.core.set("current_tool", None)
+            self.core.set("toolpath_in_progress", None)
+            progress.finish()
+            self._generation_progress = None
+            self._generation_count = 0
+            # This explicit event is necessary as the toolpaths were added to the collection
+            # while the toolpath visualization was replaced with the progress visualization.
+            self.core.emit_event("toolpath-list-changed")
+            return False
+
+    def _finish_generation_job(self, job):
+        if job.future.cancelled():
+            return
         try:
-            # generate the toolpath (filling the cache) and check if it is empty
-            if new_toolpath.get_toolpath() is None:
-                self.log.warning("An empty toolpath was generated.")
+            # "result" raises the exception of the worker thread (if it failed)
+            toolpath = job.future.result()
         except PycamBaseException as exc:
-            # an error occurred - "toolpath" contains the error message
             self.log.error("Failed to generate toolpath: %s", exc)
-            # we were not successful (similar to a "cancel" request)
-            return False
+            return
         except Exception:
             # catch all non-system-exiting exceptions
             self.log.error(pycam.Utils.get_exception_report())
-            return False
-        finally:
-            self.core.set("current_tool", None)
-            self.core.set("toolpath_in_progress", None)
-        self.log.info("Toolpath generation time: %f", time.time() - start_time)
-        # return "False" if the action was cancelled
-        if callback:
-            return not callback()
-        else:
-            return True
+            return
+        if job.channel.is_cancelled():
+            # the job was cancelled while running - its toolpath is incomplete
+            return
+        if toolpath is None:
+            self.log.warning("An empty toolpath was generated.")
+        job.toolpath.get_collection().append(job.toolpath)
+        self.log.info("Toolpath generation time: %f", time.time() - job.start_time)
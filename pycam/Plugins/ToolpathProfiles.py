@@ -31,14 +31,15 @@ def _get_profile_filters(core, parameters):
 
 class ToolpathProfileMilling(pycam.Plugins.PluginBase):
 
-    DEPENDS = ["Toolpaths", "GCodeSafetyHeight", "GCodePlungeFeedrate", "GCodeFilenameExtension",
-               "GCodeStepWidth", "GCodeCornerStyle"]
+    DEPENDS = ["Toolpaths", "GCodeSafetyHeight", "GCodePlungeFeedrate", "GCodeArcFitting",
+               "GCodeFilenameExtension", "GCodeStepWidth", "GCodeCornerStyle"]
     CATEGORIES = ["Toolpath"]
 
     def setup(self):
         parameters = {
             "safety_height": 25,
             "plunge_feedrate": 100,
+            "arc_fitting": 0.0,
             "filename_extension": "",
             ("step_width", "x"): 0.0001,
             ("step_width", "y"): 0.0001,
@@ -61,11 +62,13 @@ class ToolpathProfileMilling(pycam.Plugins.PluginBase):
 
 class ToolpathProfileLaser(pycam.Plugins.PluginBase):
 
-    DEPENDS = ["Toolpaths", "GCodeFilenameExtension", "GCodeStepWidth", "GCodeCornerStyle"]
+    DEPENDS = ["Toolpaths", "GCodeArcFitting", "GCodeFilenameExtension", "GCodeStepWidth",
+               "GCodeCornerStyle"]
     CATEGORIES = ["Toolpath"]
 
     def setup(self):
         parameters = {
+            "arc_fitting": 0.0,
             "filename_extension": "",
             ("step_width", "x"): 0.0001,
             ("step_width", "y"): 0.0001,
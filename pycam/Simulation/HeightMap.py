@@ -0,0 +1,329 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pycam.Cutters.CylindricalCutter import CylindricalCutter
+from pycam.Cutters.SphericalCutter import SphericalCutter
+from pycam.Cutters.ToroidalCutter import ToroidalCutter
+from pycam.errors import InitializationError
+from pycam.Geometry import epsilon
+from pycam.Toolpath import MOVE_ARC, get_arc_positions
+import pycam.Utils.log
+
+
+_log = pycam.Utils.log.get_logger()
+
+
+# maximum number of (segment, grid point) pairs per batch (small batches are cache friendly)
+MAX_BATCH_SIZE = 2 ** 14
+# number of iterations for the golden section search of the lowest tool position above a point
+SEARCH_ITERATIONS = 20
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+
+
+class _SweptPoints:
+    """ the relation between a set of segments (moves of the tool's tip) and grid points
+
+    The squared horizontal distance between a grid point and the tool axis at the relative
+    position "t" (0..1) along the segment is "a * t^2 + b * t + c".
+    """
+
+    def __init__(self, start_z, delta_z, a, b, c, low, high):
+        self.start_z = start_z
+        self.delta_z = delta_z
+        self.a = a
+        self.b = b
+        self.c = c
+        # the interval along the segment, where the grid point is below the cutter
+        self.low = low
+        self.high = high
+
+
+def _get_flat_heights(cutter, points):
+    # the lowest position within the interval is at one of its ends
+    return points.start_z + numpy.minimum(points.low * points.delta_z,
+                                          points.high * points.delta_z)
+
+
+def _get_spherical_heights(cutter, points):
+    """ intersect the vertical line through the grid points with the swept sphere (a capsule) """
+    radius = cutter.radius
+    # tolerate rounding errors for grid points at the edge of the cutter
+    tolerance = (radius + epsilon) ** 2 - radius ** 2
+    center_z = points.start_z + radius
+    # the spheres at both ends of the segment (if they cover the grid point)
+    heights = numpy.inf
+    for distance_sq, end_z in ((points.c, center_z),
+                               (points.a + points.b + points.c, center_z + points.delta_z)):
+        remaining_sq = radius ** 2 - distance_sq
+        heights = numpy.minimum(heights, numpy.where(
+            remaining_sq >= -tolerance, end_z - numpy.sqrt(numpy.maximum(remaining_sq, 0)),
+            numpy.inf))
+    # the cylinder between both spheres: solve the distance equation for the height "u"
+    # (relative to the center of the start sphere)
+    is_moving = points.a > 1e-12
+    safe_a = numpy.where(is_moving, points.a, 1)
+    length_sq = points.a + points.delta_z ** 2
+    k = -points.b / 2
+    discriminant = ((k * points.delta_z) ** 2
+                    - safe_a * (points.c * length_sq - k ** 2 - radius ** 2 * length_sq))
+    u = (k * points.delta_z - numpy.sqrt(numpy.maximum(discriminant, 0))) / safe_a
+    # the position of the nearest point on the axis of the cylinder
+    t = (k + u * points.delta_z) / numpy.where(length_sq > 0, length_sq, 1)
+    valid = (is_moving & (discriminant >= -tolerance * safe_a * length_sq)
+             & (t >= 0) & (t <= 1))
+    return numpy.where(valid, numpy.minimum(heights, center_z + u), heights)
+
+
+def _get_toroidal_heights(cutter, points):
+    """ golden section search of the lowest position of the torus above the grid points
+
+    The height of the torus' surface (above its tip) is a convex non-decreasing function of
+    the distance from its axis.  This distance is a convex function of the position along the
+    segment.  Thus the height of the tool's surface above a grid point is a convex function of
+    the position along the segment.
+    """
+    major = cutter.majorradius
+    minor = cutter.minorradius
+    radius_sq = cutter.radius ** 2
+
+    def get_height(t):
+        distances = numpy.sqrt(numpy.clip((points.a * t + points.b) * t + points.c, 0,
+                                          radius_sq))
+        outer = numpy.maximum(distances - major, 0)
+        return (points.start_z + t * points.delta_z + minor
+                - numpy.sqrt(numpy.maximum(minor ** 2 - outer ** 2, 0)))
+
+    low = points.low
+    high = points.high
+    heights = numpy.minimum(get_height(low), get_height(high))
+    x1 = high - GOLDEN_RATIO * (high - low)
+    x2 = low + GOLDEN_RATIO * (high - low)
+    f1 = get_height(x1)
+    f2 = get_height(x2)
+    for _ in range(SEARCH_ITERATIONS):
+        go_left = f1 < f2
+        high = numpy.where(go_left, x2, high)
+        low = numpy.where(go_left, low, x1)
+        new_x = numpy.where(go_left, high - GOLDEN_RATIO * (high - low),
+                            low + GOLDEN_RATIO * (high - low))
+        new_f = get_height(new_x)
+        x2, f2, x1, f1 = (numpy.where(go_left, x1, new_x), numpy.where(go_left, f1, new_f),
+                          numpy.where(go_left, new_x, x2), numpy.where(go_left, new_f, f2))
+    return numpy.minimum(heights, numpy.minimum(f1, f2))
+
+
+def _get_height_function(cutter):
+    for cutter_class, func in ((ToroidalCutter, _get_toroidal_heights),
+                               (SphericalCutter, _get_spherical_heights),
+                               (CylindricalCutter, _get_flat_heights)):
+        if isinstance(cutter, cutter_class):
+            return func
+    raise ValueError("Unsupported cutter for the stock simulation: {}".format(cutter))
+
+
+def iterate_grid_points(grid_x, grid_y, lower, upper, batch_size=MAX_BATCH_SIZE):
+    """ enumerate the points of a regular grid within the bounding boxes of items
+
+    @param grid_x: equidistant coordinates of the grid columns
+    @param lower: array of lower corners of the bounding boxes (at least two columns: x/y)
+    @returns: generator of arrays (item indices, row indices and column indices) - the number
+        of grid points within each batch is limited
+    """
+    ranges = []
+    for axis, grid in ((0, grid_x), (1, grid_y)):
+        if len(grid) > 1:
+            step = grid[1] - grid[0]
+        else:
+            step = 1
+        first = numpy.clip(numpy.ceil((lower[:, axis] - grid[0]) / step), 0, len(grid))
+        last = numpy.clip(numpy.floor((upper[:, axis] - grid[0]) / step) + 1, 0, len(grid))
+        first = first.astype(numpy.int64)
+        ranges.append((first, numpy.maximum(last.astype(numpy.int64) - first, 0)))
+    (first_x, count_x), (first_y, count_y) = ranges
+    cell_counts = count_x * count_y
+    totals = numpy.cumsum(cell_counts)
+    batch_start = 0
+    while batch_start < len(cell_counts):
+        offset = totals[batch_start - 1] if batch_start > 0 else 0
+        batch_end = max(batch_start + 1, int(numpy.searchsorted(totals, offset + batch_size,
+                                                                side="right")))
+        counts = cell_counts[batch_start:batch_end]
+        total = int(totals[batch_end - 1] - offset)
+        if total > 0:
+            item = numpy.repeat(numpy.arange(batch_start, batch_end), counts)
+            local = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+            row, column = numpy.divmod(local, count_x[item])
+            yield item, row + first_y[item], column + first_x[item]
+        batch_start = batch_end
+
+
+class HeightMap:
+    """ a stock model based on a regular grid of heights (Z-map)
+
+    The material above each grid point is removed, if the cutter passes it.  The material
+    between the bottom of the stock and the height of a grid point remains.
+    """
+
+    def __init__(self, box, resolution):
+        if numpy is None:
+            raise InitializationError("The stock simulation requires the 'numpy' module")
+        self.box = box
+        self.resolution = resolution
+        self.x = box.minx + resolution * numpy.arange(
+            int(math.floor((box.maxx - box.minx) / resolution)) + 1)
+        self.y = box.miny + resolution * numpy.arange(
+            int(math.floor((box.maxy - box.miny) / resolution)) + 1)
+        self.heights = numpy.full((len(self.y), len(self.x)), float(box.maxz))
+
+    def reset(self):
+        self.heights.fill(self.box.maxz)
+
+    def get_removed_volume(self):
+        return float((self.box.maxz - self.heights).sum()) * self.resolution ** 2
+
+    def cut_segments(self, cutter, starts, ends):
+        """ remove the material swept by the cutter moving along straight segments """
+        flat_heights = self.heights.reshape(-1)
+        for _, cells, heights in self.get_swept_heights(cutter, starts, ends):
+            numpy.minimum.at(flat_heights, cells, heights)
+
+    def get_swept_heights(self, cutter, starts, ends):
+        """ calculate the lowest position of the cutter above the grid points passed by segments
+
+        The lowest position of the cutter's surface above each grid point is calculated per
+        segment: exactly for flat and spherical cutters and via a golden section search for
+        toroidal cutters.  The segments (sequences of start and end positions) are processed in
+        batches of grid points.
+        @returns: generator of arrays (segment indices, indices of flattened grid points and
+            heights limited by the bottom of the stock)
+        """
+        starts = numpy.asarray(starts, dtype=float).reshape(-1, 3)
+        ends = numpy.asarray(ends, dtype=float).reshape(-1, 3)
+        # skip segments above the stock
+        relevant = numpy.flatnonzero(numpy.minimum(starts[:, 2], ends[:, 2]) < self.box.maxz)
+        starts = starts[relevant]
+        ends = ends[relevant]
+        radius = cutter.radius
+        lower = numpy.minimum(starts, ends) - radius
+        upper = numpy.maximum(starts, ends) + radius
+        delta = ends - starts
+        for segment, row, column in iterate_grid_points(self.x, self.y, lower, upper):
+            result = self._get_batch_heights(cutter, starts, delta, segment, row, column)
+            if result is not None:
+                segment, cells, heights = result
+                yield relevant[segment], cells, heights
+
+    def _get_batch_heights(self, cutter, starts, delta, segment, row, column):
+        offset_x = self.x[column] - starts[segment, 0]
+        offset_y = self.y[row] - starts[segment, 1]
+        delta_x = delta[segment, 0]
+        delta_y = delta[segment, 1]
+        # squared distance between the point and the tool axis: a * t^2 + b * t + c
+        a = delta_x ** 2 + delta_y ** 2
+        b = -2 * (offset_x * delta_x + offset_y * delta_y)
+        c = offset_x ** 2 + offset_y ** 2
+        # tolerate rounding errors for grid points at the edge of the cutter
+        radius_sq = (cutter.radius + epsilon) ** 2
+        # skip the grid points, that are not passed by the cutter
+        is_moving = a > 1e-12
+        discriminant = b ** 2 - 4 * a * (c - radius_sq)
+        valid = numpy.where(is_moving, discriminant >= 0, c <= radius_sq)
+        if not valid.any():
+            return None
+        segment, row, column = segment[valid], row[valid], column[valid]
+        a, b, c = a[valid], b[valid], c[valid]
+        is_moving, discriminant = is_moving[valid], discriminant[valid]
+        # the interval along the segment, where the point is within the radius of the cutter
+        safe_a = numpy.where(is_moving, a, 1)
+        root = numpy.sqrt(numpy.maximum(discriminant, 0))
+        low = numpy.where(is_moving, numpy.maximum((-b - root) / (2 * safe_a), 0), 0)
+        high = numpy.where(is_moving, numpy.minimum((-b + root) / (2 * safe_a), 1), 1)
+        valid = low <= high
+        if not valid.any():
+            return None
+        segment = segment[valid]
+        points = _SweptPoints(starts[segment, 2], delta[segment, 2], a[valid], b[valid], c[valid],
+                              low[valid], high[valid])
+        heights = _get_height_function(cutter)(cutter, points)
+        # the bottom of the stock remains
+        numpy.maximum(heights, self.box.minz, out=heights)
+        cells = row[valid] * len(self.x) + column[valid]
+        return segment, cells, heights
+
+
+class StockSimulation:
+    """ remove material from a height map along the moves of a toolpath
+
+    The simulation can be updated incrementally for an increasing simulation time.  Only the
+    moves following the previously processed ones are simulated.  A reduced simulation time
+    resets the stock.
+    """
+
+    def __init__(self, toolpath, cutter, box, resolution):
+        self.toolpath = toolpath
+        self.cutter = cutter
+        self.height_map = HeightMap(box, resolution)
+        self._reset()
+
+    def _reset(self):
+        self.height_map.reset()
+        # the last processed move may be incomplete - thus it is processed again later
+        self._finished_count = 0
+        self._finished_position = None
+        self._last_time = None
+
+    def update(self, max_time=None):
+        """ process the moves of the toolpath until the given time (in minutes) """
+        current_time = math.inf if max_time is None else max_time
+        if (self._last_time is not None) and (current_time < self._last_time):
+            # the simulation time was reduced
+            self._reset()
+        self._last_time = current_time
+        moves = self.toolpath.get_moves(max_time=max_time, start_index=self._finished_count)
+        starts = []
+        ends = []
+        position = self._finished_position
+        for offset, step in enumerate(moves):
+            if offset == len(moves) - 1:
+                self._finished_count += offset
+                self._finished_position = position
+            if position is None:
+                position = step.position
+                continue
+            if (step.action == MOVE_ARC) and (step.center is not None):
+                points = get_arc_positions(position, step)
+            else:
+                points = [step.position]
+            for point in points:
+                starts.append(position)
+                ends.append(point)
+                position = point
+        if starts:
+            self.height_map.cut_segments(self.cutter, starts, ends)
+        return self.height_map
+
+
+def simulate_toolpath(toolpath, cutter, box, resolution):
+    """ calculate the remaining stock after processing a complete toolpath """
+    return StockSimulation(toolpath, cutter, box, resolution).update()
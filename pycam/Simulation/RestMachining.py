@@ -0,0 +1,95 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pycam.errors import InitializationError
+from pycam.Simulation.HeightMap import HeightMap
+from pycam.Simulation.Verification import get_model_heights, get_model_triangles, \
+        get_move_segments
+import pycam.Utils.log
+
+
+_log = pycam.Utils.log.get_logger()
+
+
+class ResidualMaterial:
+    """ the material remaining above the models after machining a set of toolpaths
+
+    The stock (defined by the box) is simulated on a regular grid.
+    """
+
+    def __init__(self, toolpaths, models, box, resolution):
+        """
+        @param toolpaths: list of tuples (toolpath, cutter)
+        """
+        if numpy is None:
+            raise InitializationError("Rest machining requires the 'numpy' module")
+        self.box = box
+        self.resolution = resolution
+        height_map = HeightMap(box, resolution)
+        for toolpath, cutter in toolpaths:
+            starts, ends, _ = get_move_segments(toolpath.path, box.maxz)
+            height_map.cut_segments(cutter, starts, ends)
+        self.residual = height_map.heights - get_model_heights(
+            get_model_triangles(models), height_map.x, height_map.y, box.minz)
+
+    def get_machining_mask(self, threshold, radius):
+        """ determine the grid points, where a tool touches residual material
+
+        @param threshold: residual material up to this height is ignored
+        @param radius: radius of the tool
+        @returns: boolean array of the grid points
+        """
+        material = self.residual > threshold
+        mask = material.copy()
+        rows, columns = mask.shape
+        # dilate the residual material by the radius of the tool (and the grid size)
+        steps = int(math.ceil(radius / self.resolution)) + 1
+        max_distance_sq = (radius / self.resolution + 1) ** 2
+        for shift_y in range(-steps, steps + 1):
+            for shift_x in range(-steps, steps + 1):
+                if ((shift_x == 0 and shift_y == 0)
+                        or (shift_x ** 2 + shift_y ** 2 > max_distance_sq)):
+                    continue
+                target = mask[max(shift_y, 0):rows + min(shift_y, 0),
+                              max(shift_x, 0):columns + min(shift_x, 0)]
+                target |= material[max(-shift_y, 0):rows + min(-shift_y, 0),
+                                   max(-shift_x, 0):columns + min(-shift_x, 0)]
+        _log.info("Rest machining: %d%% of the area contains residual material",
+                  100 * mask.sum() // max(mask.size, 1))
+        return mask
+
+    def get_position_filter(self, threshold, radius):
+        """ return a function deciding, whether the tool needs to visit a position
+
+        See "get_machining_mask" for the parameters.
+        """
+        mask = self.get_machining_mask(threshold, radius)
+        rows, columns = mask.shape
+
+        def is_relevant_position(position):
+            column = int(round((position[0] - self.box.minx) / self.resolution))
+            row = int(round((position[1] - self.box.miny) / self.resolution))
+            return bool(mask[min(max(row, 0), rows - 1), min(max(column, 0), columns - 1)])
+
+        return is_relevant_position
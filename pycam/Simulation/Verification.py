@@ -0,0 +1,216 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pycam.errors import InitializationError
+from pycam.Geometry import Box3D, Point3D
+from pycam.Simulation.HeightMap import HeightMap, iterate_grid_points
+from pycam.Toolpath import MOVE_ARC, MOVE_SAFETY, MOVES_LIST, get_arc_positions
+from pycam.Utils.threading import run_in_parallel
+import pycam.Utils.log
+
+
+_log = pycam.Utils.log.get_logger()
+
+
+# number of grid points along both axes of a tile
+TILE_SIZE = 256
+# upper limits of the residual stock classes
+RESIDUAL_LIMITS = (0.01, 0.1, 0.5, 1, 2, 5)
+
+
+class VerificationResult:
+    """ the comparison of the simulated stock and the model
+
+    @value max_gouge_depth: the maximum depth of the stock below the surface of the model
+    @value gouge_moves: sorted indices of the steps of the toolpath cutting into the model
+    @value residual_histogram: list of tuples (upper limit, number of grid points) for the
+        height of the remaining material above the model (the last limit is infinite)
+    """
+
+    def __init__(self, max_gouge_depth, gouge_moves, residual_histogram, resolution):
+        self.max_gouge_depth = max_gouge_depth
+        self.gouge_moves = gouge_moves
+        self.residual_histogram = residual_histogram
+        self.resolution = resolution
+
+    def get_report(self, max_listed_moves=20):
+        lines = ["Maximum gouge depth: {:f}".format(self.max_gouge_depth)]
+        if self.gouge_moves:
+            listed = ", ".join(str(index) for index in self.gouge_moves[:max_listed_moves])
+            if len(self.gouge_moves) > max_listed_moves:
+                listed += ", ..."
+            lines.append("Moves cutting into the model ({:d}): {}"
+                         .format(len(self.gouge_moves), listed))
+        total = sum(count for limit, count in self.residual_histogram)
+        lines.append("Residual stock (resolution: {:f}):".format(self.resolution))
+        lower = 0
+        for limit, count in self.residual_histogram:
+            lines.append("  {:>8} .. {:<8} {:6.2f}%".format(lower, limit,
+                                                            100 * count / max(total, 1)))
+            lower = limit
+        return "\n".join(lines)
+
+
+def get_model_triangles(models):
+    """ collect the triangles of models in an array (shape: count x 3 x 3) """
+    return numpy.array([(triangle.p1, triangle.p2, triangle.p3)
+                        for model in models for triangle in model.triangles()],
+                       dtype=float).reshape(-1, 3, 3)
+
+
+def get_model_heights(triangles, grid_x, grid_y, default):
+    """ rasterize the top surface of triangles on a regular grid
+
+    @param triangles: array of triangles (shape: count x 3 x 3)
+    @param default: the height of grid points without triangles above them
+    """
+    heights = numpy.full((len(grid_y), len(grid_x)), -numpy.inf)
+    if len(triangles) > 0:
+        first = triangles[:, 0, :]
+        edge1 = triangles[:, 1, :] - first
+        edge2 = triangles[:, 2, :] - first
+        # twice the signed area of the projected triangle
+        area = edge1[:, 0] * edge2[:, 1] - edge2[:, 0] * edge1[:, 1]
+        # vertical triangles are covered by their neighbours
+        visible = numpy.flatnonzero(abs(area) > 1e-12)
+        flat_heights = heights.reshape(-1)
+        for item, row, column in iterate_grid_points(grid_x, grid_y,
+                                                     triangles[visible].min(axis=1),
+                                                     triangles[visible].max(axis=1)):
+            item = visible[item]
+            offset_x = grid_x[column] - first[item, 0]
+            offset_y = grid_y[row] - first[item, 1]
+            # barycentric coordinates of the grid point
+            u = (offset_x * edge2[item, 1] - edge2[item, 0] * offset_y) / area[item]
+            v = (edge1[item, 0] * offset_y - offset_x * edge1[item, 1]) / area[item]
+            inside = (u >= -1e-9) & (v >= -1e-9) & (u + v <= 1 + 1e-9)
+            item, u, v = item[inside], u[inside], v[inside]
+            numpy.maximum.at(flat_heights, (row * len(grid_x) + column)[inside],
+                             first[item, 2] + u * edge1[item, 2] + v * edge2[item, 2])
+    heights[numpy.isinf(heights)] = default
+    return heights
+
+
+def get_move_segments(moves, safety_height):
+    """ split the moves of a toolpath into straight segments
+
+    After a safety move the tool plunges vertically from the safety height to the next position.
+    Arcs are approximated.
+    @returns: arrays of start and end positions and the index of the related move
+    """
+    starts = []
+    ends = []
+    move_indices = []
+    position = None
+    for index, step in enumerate(moves):
+        if step.action == MOVE_SAFETY:
+            position = None
+        elif step.action in MOVES_LIST:
+            if position is None:
+                position = (step.position[0], step.position[1], safety_height)
+            if (step.action == MOVE_ARC) and (step.center is not None):
+                points = get_arc_positions(position, step)
+            else:
+                points = [step.position]
+            for point in points:
+                starts.append(position)
+                ends.append(point)
+                move_indices.append(index)
+                position = point
+    return (numpy.array(starts, dtype=float).reshape(-1, 3),
+            numpy.array(ends, dtype=float).reshape(-1, 3), numpy.array(move_indices, dtype=int))
+
+
+def _verify_tile(args):
+    """ simulate the stock of a tile and compare it with the model
+
+    We need to use a global function here - otherwise it does not work with the multiprocessing
+    Pool.
+    """
+    box, resolution, cutter, starts, ends, move_indices, triangles, gouge_tolerance = args
+    height_map = HeightMap(box, resolution)
+    height_map.cut_segments(cutter, starts, ends)
+    model_heights = get_model_heights(triangles, height_map.x, height_map.y, box.minz)
+    gouges = model_heights - height_map.heights
+    gouge_moves = set()
+    if gouges.max() > gouge_tolerance:
+        # find the segments reaching below the surface of the model
+        limits = (model_heights - gouge_tolerance).reshape(-1)
+        for segments, cells, heights in height_map.get_swept_heights(cutter, starts, ends):
+            gouge_moves.update(move_indices[segments[heights < limits[cells]]].tolist())
+    residuals = numpy.maximum(-gouges, 0)
+    histogram = numpy.histogram(residuals, bins=(0, ) + RESIDUAL_LIMITS + (numpy.inf, ))[0]
+    return float(max(gouges.max(), 0)), gouge_moves, histogram
+
+
+def verify_toolpath(toolpath, cutter, models, box, resolution, gouge_tolerance=0.001):
+    """ simulate the material removal of a toolpath and compare the result with the models
+
+    The stock (defined by the box) and the top surface of the models are rasterized on a
+    regular grid.  The grid is split into tiles, that are processed in parallel.
+    @returns: a VerificationResult instance
+    """
+    if numpy is None:
+        raise InitializationError("The toolpath verification requires the 'numpy' module")
+    starts, ends, move_indices = get_move_segments(toolpath.path, box.maxz)
+    triangles = get_model_triangles(models)
+    count_x = int(math.floor((box.maxx - box.minx) / resolution)) + 1
+    count_y = int(math.floor((box.maxy - box.miny) / resolution)) + 1
+    margin = cutter.radius + resolution
+    tiles = []
+    for first_x in range(0, count_x, TILE_SIZE):
+        for first_y in range(0, count_y, TILE_SIZE):
+            last_x = min(first_x + TILE_SIZE, count_x) - 1
+            last_y = min(first_y + TILE_SIZE, count_y) - 1
+            # the upper limits are shifted by half a step (against rounding errors)
+            tile_box = Box3D(Point3D(box.minx + first_x * resolution,
+                                     box.miny + first_y * resolution, box.minz),
+                             Point3D(box.minx + (last_x + 0.5) * resolution,
+                                     box.miny + (last_y + 0.5) * resolution, box.maxz))
+            # the segments and triangles touching the tile
+            segments = numpy.flatnonzero(
+                (numpy.minimum(starts[:, 0], ends[:, 0]) <= tile_box.maxx + margin)
+                & (numpy.maximum(starts[:, 0], ends[:, 0]) >= tile_box.minx - margin)
+                & (numpy.minimum(starts[:, 1], ends[:, 1]) <= tile_box.maxy + margin)
+                & (numpy.maximum(starts[:, 1], ends[:, 1]) >= tile_box.miny - margin))
+            tile_triangles = triangles[
+                (triangles[:, :, 0].min(axis=1) <= tile_box.maxx)
+                & (triangles[:, :, 0].max(axis=1) >= tile_box.minx)
+                & (triangles[:, :, 1].min(axis=1) <= tile_box.maxy)
+                & (triangles[:, :, 1].max(axis=1) >= tile_box.miny)]
+            tiles.append((tile_box, resolution, cutter, starts[segments], ends[segments],
+                          move_indices[segments], tile_triangles, gouge_tolerance))
+    max_gouge_depth = 0
+    gouge_moves = set()
+    histogram = numpy.zeros(len(RESIDUAL_LIMITS) + 1, dtype=int)
+    for tile_gouge_depth, tile_gouge_moves, tile_histogram in run_in_parallel(_verify_tile,
+                                                                              tiles):
+        max_gouge_depth = max(max_gouge_depth, tile_gouge_depth)
+        gouge_moves.update(tile_gouge_moves)
+        histogram += tile_histogram
+    if max_gouge_depth <= gouge_tolerance:
+        max_gouge_depth = 0
+    residual_histogram = list(zip(RESIDUAL_LIMITS + (math.inf, ), histogram.tolist()))
+    return VerificationResult(max_gouge_depth, sorted(gouge_moves), residual_histogram,
+                              resolution)
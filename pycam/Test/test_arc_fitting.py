@@ -0,0 +1,93 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import math
+
+from pycam.Exporters.GCode.LinuxCNC import LinuxCNC
+from pycam.Toolpath import MOVE_ARC, MOVE_STRAIGHT, ArcPlane, get_arc_positions
+from pycam.Toolpath.Filters import ArcFitting
+import pycam.Toolpath.Steps as ToolpathSteps
+import pycam.Test
+
+
+def _get_circle_moves(center, radius, start_angle, end_angle, count, plane_axes=(0, 1, 2)):
+    moves = []
+    for index in range(count + 1):
+        angle = start_angle + (end_angle - start_angle) * index / count
+        position = [None] * 3
+        position[plane_axes[0]] = center[plane_axes[0]] + radius * math.cos(angle)
+        position[plane_axes[1]] = center[plane_axes[1]] + radius * math.sin(angle)
+        position[plane_axes[2]] = center[plane_axes[2]]
+        moves.append(ToolpathSteps.MoveStraight(tuple(position)))
+    return moves
+
+
+class TestArcFitting(pycam.Test.PycamTestCase):
+
+    def test_counter_clockwise_arc(self):
+        moves = _get_circle_moves((1, 2, 3), 5, 0, math.pi, 36)
+        result = moves | ArcFitting(0.01)
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0], moves[0])
+        arc = result[1]
+        self.assertEqual(arc.action, MOVE_ARC)
+        self.assertFalse(arc.clockwise)
+        self.assertEqual(arc.plane, ArcPlane.XY)
+        self.assert_vector_equal(arc.center, (1, 2, 3))
+        self.assert_vector_equal(arc.position, moves[-1].position)
+        # the interpolated arc follows the original circle
+        for position in get_arc_positions(moves[0].position, arc):
+            self.assertAlmostEqual(math.hypot(position[0] - 1, position[1] - 2), 5)
+
+    def test_clockwise_arc_in_xz_plane(self):
+        moves = _get_circle_moves((0, 4, 0), 2, math.pi, 0, 20, plane_axes=(2, 0, 1))
+        result = moves | ArcFitting(0.01)
+        self.assertEqual([step.action for step in result], [MOVE_STRAIGHT, MOVE_ARC])
+        self.assertTrue(result[1].clockwise)
+        self.assertEqual(result[1].plane, ArcPlane.XZ)
+
+    def test_keep_non_arcs(self):
+        # straight lines and zig-zag lines are not converted
+        straight = [ToolpathSteps.MoveStraight((x, 0, 0)) for x in range(10)]
+        self.assertEqual(straight | ArcFitting(0.01), straight)
+        zigzag = [ToolpathSteps.MoveStraight((x, x % 2, 0)) for x in range(10)]
+        self.assertEqual(zigzag | ArcFitting(0.01), zigzag)
+        # a tolerance smaller than the deviation of a coarse polygon prevents arcs
+        coarse = _get_circle_moves((0, 0, 0), 10, 0, math.pi / 2, 4)
+        self.assertEqual(coarse | ArcFitting(0.1), coarse)
+
+    def test_machine_settings_split_arcs(self):
+        moves = _get_circle_moves((0, 0, 0), 5, 0, math.pi, 36)
+        moves.insert(18, ToolpathSteps.MachineSetting("feedrate", 200))
+        result = moves | ArcFitting(0.01)
+        self.assertEqual([step.action for step in result if step.action == MOVE_ARC],
+                         [MOVE_ARC, MOVE_ARC])
+
+    def test_gcode_output(self):
+        moves = _get_circle_moves((0, 0, 0), 5, 0, math.pi / 2, 18)
+        moves.extend(_get_circle_moves((-5, 5, 0), 5, 0, -math.pi / 2, 18)[1:])
+        output = io.StringIO()
+        generator = LinuxCNC(output)
+        generator.add_moves(moves, [ArcFitting(0.01)])
+        generator.finish()
+        lines = [line for line in output.getvalue().splitlines()
+                 if line.startswith(("G1", "G2", "G3", "G17"))]
+        self.assertEqual(lines, ["G1 X5.000000 Y0.000000 Z0.000000",
+                                 "G17\t; XY plane",
+                                 "G3 X0.000000 Y5.000000 I-5.000000 J0.000000",
+                                 "G2 X-5.000000 Y0.000000 I-5.000000 J0.000000"])
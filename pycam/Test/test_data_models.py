@@ -0,0 +1,68 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import threading
+
+from pycam.errors import MissingAttributeError
+import pycam.Test
+from pycam.workspace.data_models import BaseDataContainer, _set_parser_context
+
+
+class _ParserContextItem(BaseDataContainer):
+
+    def __init__(self):
+        super().__init__({})
+        self.entered = threading.Event()
+        self._barrier = threading.Barrier(2)
+
+    @_set_parser_context("first")
+    def leave_early(self):
+        self.entered.set()
+        self._barrier.wait()
+        return True
+
+    @_set_parser_context("second")
+    def leave_late(self):
+        self._barrier.wait()
+        # the first thread left its context in the meantime
+        self._barrier.wait()
+        return self.get_value("missing")
+
+    def finish(self):
+        self._barrier.wait()
+
+
+class TestParserContext(pycam.Test.PycamTestCase):
+
+    def test_concurrent_contexts(self):
+        item = _ParserContextItem()
+        errors = []
+
+        def leave_late():
+            # enter the context after the other thread
+            item.entered.wait()
+            try:
+                item.leave_late()
+            except MissingAttributeError as exc:
+                errors.append(exc.message)
+
+        thread = threading.Thread(target=leave_late)
+        thread.start()
+        self.assertTrue(item.leave_early())
+        item.finish()
+        thread.join()
+        self.assertEqual(errors, ["second -> missing attribute 'missing'"])
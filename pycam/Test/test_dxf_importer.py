@@ -17,9 +17,10 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import io
 import os
 
-from pycam.Importers.DXFImporter import import_model
+from pycam.Importers.DXFImporter import DXFParser, import_model
 import pycam.Test
 
 
@@ -28,6 +29,21 @@ ASSETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
 DXF_TEST_FILES = {"bezier_lines.dxf"}
 
 
+def _get_dxf_lines(lines):
+    """ return the content of a DXF file containing the given LINE entities """
+    entities = []
+    for (x1, y1), (x2, y2) in lines:
+        entities.append("0\nLINE\n8\n0\n10\n{}\n20\n{}\n30\n0\n11\n{}\n21\n{}\n31\n0\n"
+                        .format(x1, y1, x2, y2))
+    return "0\nSECTION\n2\nENTITIES\n{}0\nENDSEC\n0\nEOF\n".format("".join(entities))
+
+
+class SmallBlockDXFParser(DXFParser):
+    """ split the input into many small blocks (cutting lines and pairs of lines) """
+
+    READ_BLOCK_SIZE = 7
+
+
 class TestDXFImporter(pycam.Test.PycamTestCase):
     """ Checks ability to open some sample .dxf files correctly """
 
@@ -36,3 +52,21 @@ class TestDXFImporter(pycam.Test.PycamTestCase):
             full_filename = os.path.join(ASSETS_PATH, test_filename)
             model = import_model(full_filename)
             assert model
+
+    def test_line_order(self):
+        # two chains (one of them reversed in parts) and a single line
+        lines = [((10, 0), (11, 0)), ((1, 0), (2, 0)), ((20, 0), (21, 0)), ((0, 0), (1, 0)),
+                 ((12, 0), (13, 0)), ((2, 0), (3, 0)), ((11, 0), (12, 0))]
+        parser = DXFParser(io.BytesIO(_get_dxf_lines(lines).encode()))
+        # The chain starting with the first line comes first.  Both other groups have the same
+        # distance - the first one (in the original order) wins.
+        self.assertEqual([(line.p1[0], line.p2[0]) for line in parser.lines],
+                         [(10, 11), (11, 12), (12, 13), (0, 1), (1, 2), (2, 3), (20, 21)])
+
+    def test_read_in_blocks(self):
+        lines = [((0, 0), (1.5, 0)), ((1.5, 0), (1.5, -2.25)), ((7, 7), (8, 9))]
+        content = _get_dxf_lines(lines).replace("\n", "\r\n").encode()
+        for parser_class in (DXFParser, SmallBlockDXFParser):
+            parser = parser_class(io.BytesIO(content))
+            self.assertEqual([(line.p1[:2], line.p2[:2]) for line in parser.lines], lines)
+            self.assertEqual(parser.line_number, content.count(b"\n"))
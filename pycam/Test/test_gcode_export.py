@@ -0,0 +1,131 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import random
+
+import pycam.Exporters.GCode
+from pycam.Exporters.GCode.LinuxCNC import LinuxCNC
+from pycam.Toolpath import ToolpathPathMode
+import pycam.Toolpath.Filters as tp_filters
+import pycam.Toolpath.Steps as ToolpathSteps
+import pycam.Test
+import pycam.Utils.threading
+
+
+class SerialLinuxCNC(LinuxCNC):
+    """ the plain implementation: every move is written separately via "add_move" """
+
+    add_straight_moves = pycam.Exporters.GCode.BaseGenerator.add_straight_moves
+
+
+def _get_random_moves(count, seed=23):
+    rand = random.Random(seed)
+    moves = [ToolpathSteps.MachineSetting("feedrate", 300), ToolpathSteps.Comment("start")]
+    position = (0, 0, 0)
+    for _ in range(count):
+        choice = rand.random()
+        if choice < 0.02:
+            moves.append(ToolpathSteps.MachineSetting("feedrate", rand.choice((50, 200.5))))
+        elif choice < 0.03:
+            moves.append(ToolpathSteps.MoveArc((position[0] + 2, position[1], position[2]),
+                                               center=(position[0] + 1, position[1],
+                                                       position[2])))
+            position = moves[-1].position
+        else:
+            # change only some of the axes (or none at all)
+            position = tuple(value if rand.random() < 0.3 else rand.uniform(-100, 100)
+                             for value in position)
+            if rand.random() < 0.1:
+                moves.append(ToolpathSteps.MoveStraightRapid(position))
+            else:
+                moves.append(ToolpathSteps.MoveStraight(position))
+    return moves
+
+
+def _get_export_filters():
+    return [tp_filters.SelectTool(2), tp_filters.MachineSetting("feedrate", 300),
+            tp_filters.SpindleSpeed(1000), tp_filters.TriggerSpindle(delay=3),
+            tp_filters.SafetyHeight(150), tp_filters.PlungeFeedrate(50),
+            tp_filters.StepWidth({"x": 0.001, "y": 0.001, "z": 0.001}),
+            tp_filters.CornerStyle(ToolpathPathMode.CORNER_STYLE_OPTIMIZE_SPEED, 0, 0),
+            tp_filters.ArcFitting(0.01)]
+
+
+def _export(generator_class, moves, filters=None, parallel=False):
+    output = io.StringIO()
+    generator = generator_class(output, comment="test")
+    generator.add_moves(moves, filters, parallel=parallel)
+    generator.finish()
+    return output.getvalue().encode()
+
+
+class TestGCodeExport(pycam.Test.PycamTestCase):
+
+    def test_buffered_output_is_identical(self):
+        moves = _get_random_moves(5000)
+        expected = _export(SerialLinuxCNC, moves)
+        self.assertEqual(_export(LinuxCNC, moves), expected)
+        # use a tiny buffer in order to split runs of moves
+        original_size = pycam.Exporters.GCode.MOVES_BUFFER_SIZE
+        try:
+            pycam.Exporters.GCode.MOVES_BUFFER_SIZE = 7
+            self.assertEqual(_export(LinuxCNC, moves), expected)
+        finally:
+            pycam.Exporters.GCode.MOVES_BUFFER_SIZE = original_size
+
+    def test_streaming_filters(self):
+        moves = _get_random_moves(2000)
+        for index in range(0, len(moves), 50):
+            moves.insert(index, ToolpathSteps.MoveSafety())
+        expected = tp_filters.get_filtered_moves(moves, _get_export_filters())
+        self.assertEqual(list(tp_filters.get_filtered_moves_stream(iter(moves),
+                                                                   _get_export_filters())),
+                         expected)
+        # the generator accepts an iterator of moves
+        self.assertEqual(_export(LinuxCNC, iter(moves), _get_export_filters()),
+                         _export(SerialLinuxCNC, moves, _get_export_filters()))
+
+    def test_parallel_output_is_identical(self):
+        moves = _get_random_moves(3000)
+        expected = _export(SerialLinuxCNC, moves, _get_export_filters())
+        # use worker processes even on a single CPU
+        pycam.Utils.threading.init_threading(number_of_processes=2)
+        original_size = pycam.Exporters.GCode.MOVES_BUFFER_SIZE
+        original_run_in_parallel = pycam.Exporters.GCode.run_in_parallel
+        try:
+            self.assertEqual(_export(LinuxCNC, moves, _get_export_filters(), parallel=True),
+                             expected)
+            # split the moves into many small chunks
+            pycam.Exporters.GCode.MOVES_BUFFER_SIZE = 7
+            batch_sizes = []
+
+            def run_in_parallel(func, chunks):
+                # the remote workers require a sequence of chunks
+                batch_sizes.append(len(chunks))
+                return original_run_in_parallel(func, chunks)
+
+            pycam.Exporters.GCode.run_in_parallel = run_in_parallel
+            self.assertEqual(_export(LinuxCNC, iter(moves), _get_export_filters(),
+                                     parallel=True),
+                             expected)
+            self.assertGreater(len(batch_sizes), 1)
+            self.assertLessEqual(max(batch_sizes), pycam.Exporters.GCode.PARALLEL_CHUNKS_PER_BATCH)
+        finally:
+            pycam.Exporters.GCode.MOVES_BUFFER_SIZE = original_size
+            pycam.Exporters.GCode.run_in_parallel = original_run_in_parallel
+            pycam.Utils.threading.cleanup()
@@ -0,0 +1,111 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pycam.Geometry.Model import Model
+from pycam.Geometry.Plane import Plane
+from pycam.Geometry.PointUtils import padd, pdot, pmul, pnormalized
+from pycam.Geometry.Triangle import Triangle
+from pycam.Importers.STLImporter import import_model
+import pycam.Test
+
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                           "samples")
+
+
+def _get_reference_normals(model):
+    """ calculate the smooth normals of all corners of a model one by one """
+    vertices = {}
+    for t in model.triangles():
+        for p in (t.p1, t.p2, t.p3):
+            vertices.setdefault(p, []).append((pnormalized(t.normal), t.get_area()))
+    result = []
+    for t in model.triangles():
+        main = pnormalized(t.normal)
+        for p in (t.p1, t.p3, t.p2):
+            suitable = (0, 0, 0)
+            for normal, weight in vertices[p]:
+                dot = pdot(main, normal)
+                if dot > 0:
+                    suitable = padd(suitable, pmul(normal, weight * dot))
+            result.append(pnormalized(suitable)[:3])
+    return result
+
+
+@unittest.skipIf(numpy is None, "the mesh arrays require numpy")
+class TestModelMeshArrays(pycam.Test.PycamTestCase):
+
+    def test_cube_has_sharp_edges(self):
+        model = import_model(os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets",
+                                          "cube_ascii.stl"))
+        vertices, normals = model.get_mesh_arrays()
+        self.assertEqual(vertices.shape, (36, 3))
+        face_normals = numpy.repeat([pnormalized(t.normal)[:3] for t in model.triangles()], 3,
+                                    axis=0)
+        self.assertTrue(numpy.allclose(normals, face_normals, atol=1e-6))
+
+    def test_sharp_spike(self):
+        # the faces of a narrow pyramid meet at angles of more than 90 degrees at the apex
+        apex = (0, 0, 10)
+        base = [(1, 1, 0), (-1, 1, 0), (-1, -1, 0), (1, -1, 0)]
+        model = Model()
+        for index, p1 in enumerate(base):
+            p2 = base[(index + 1) % len(base)]
+            model.append(Triangle(p1, p2, apex))
+        model.append(Triangle(base[0], base[2], base[1]))
+        model.append(Triangle(base[0], base[3], base[2]))
+        vertices, normals = model.get_mesh_arrays()
+        self.assertTrue(numpy.allclose(normals, _get_reference_normals(model), atol=1e-6))
+
+    def test_same_as_reference(self):
+        model = import_model(os.path.join(SAMPLES_DIR, "Sphere0.stl"))
+        vertices, normals = model.get_mesh_arrays()
+        expected_vertices = [p for t in model.triangles() for p in (t.p1, t.p3, t.p2)]
+        self.assertTrue(numpy.allclose(vertices, expected_vertices, atol=1e-5))
+        self.assertTrue(numpy.allclose(normals, _get_reference_normals(model), atol=1e-5))
+
+
+@unittest.skipIf(numpy is None, "slicing multiple levels at once requires numpy")
+class TestWaterlineContours(pycam.Test.PycamTestCase):
+
+    def test_same_as_single_levels(self):
+        model = import_model(os.path.join(SAMPLES_DIR, "SampleScene2.stl"))
+        levels = [model.minz + (model.maxz - model.minz) * index / 10 for index in range(11)]
+        # the result does not depend on the order of the levels
+        levels.reverse()
+        contours = model.get_waterline_contours(levels)
+        self.assertEqual(len(contours), len(levels))
+        for level, contour in zip(levels, contours):
+            plane = Plane((0, 0, level), (0, 0, 1, 'v'))
+            expected = model._get_waterline_contour_by_triangles(plane)
+            self.assertEqual(contour.minz, expected.minz)
+            # the number of points may differ slightly: collinear points are removed
+            areas = sorted((polygon.is_closed, round(polygon.get_area(), 6))
+                           for polygon in contour.get_polygons())
+            self.assertEqual(areas, sorted((polygon.is_closed, round(polygon.get_area(), 6))
+                                           for polygon in expected.get_polygons()))
+            # a single horizontal level is sliced in the same way
+            self.assertEqual(sorted((polygon.is_closed, round(polygon.get_area(), 6))
+                                    for polygon in model.get_waterline_contour(plane)), areas)
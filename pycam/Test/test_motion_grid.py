@@ -18,11 +18,16 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import unittest
+import unittest.mock
 
 from pycam.Geometry import Box3D, Point3D
+from pycam.Geometry.Line import Line
+from pycam.Geometry.Polygon import Polygon
+import pycam.Toolpath.MotionGrid
 from pycam.Toolpath.MotionGrid import (
-    GridDirection, MillingStyle, StartPosition, get_fixed_grid, get_fixed_grid_layer,
-    get_fixed_grid_line, get_spiral_layer, get_spiral_layer_lines)
+    GridDirection, MillingStyle, PocketingType, StartPosition, get_fixed_grid,
+    get_fixed_grid_layer, get_fixed_grid_line, get_pocketing_polygons_simple, get_spiral_layer,
+    get_spiral_layer_lines)
 
 
 def _resolve_nested(level_count, source):
@@ -34,6 +39,14 @@ def _resolve_nested(level_count, source):
         return list(source)
 
 
+def _get_square(x, y, size):
+    polygon = Polygon()
+    corners = ((x, y, 0), (x + size, y, 0), (x + size, y + size, 0), (x, y + size, 0))
+    for index, corner in enumerate(corners):
+        polygon.append(Line(corner, corners[(index + 1) % len(corners)]))
+    return polygon
+
+
 class TestMotionGrid(unittest.TestCase):
 
     def assert_almost_equal_line(self, line1, line2):
@@ -169,3 +182,17 @@ class TestMotionGrid(unittest.TestCase):
             milling_style=MillingStyle.IGNORE, start_position=StartPosition.Z)
         resolved_fixed_grid = [list(layer) for layer in fixed_grid]
         print(resolved_fixed_grid)
+
+    def test_pocketing_polygons_simple(self):
+        squares = [_get_square(0, 0, 10), _get_square(20, 0, 6)]
+        pocket = get_pocketing_polygons_simple(squares, 1, PocketingType.HOLES)
+        # the pockets follow their base polygon (from outside to inside)
+        self.assertEqual([polygon.get_area() for polygon in pocket],
+                         [100, 64, 36, 16, 4, 36, 16, 4])
+        # the pockets are taken from the cache (without calculating offset polygons)
+        with unittest.mock.patch.object(pycam.Toolpath.MotionGrid, "_get_offset_polygons",
+                                        side_effect=AssertionError):
+            cached_pocket = get_pocketing_polygons_simple([_get_square(20, 0, 6)] + squares, 1,
+                                                          PocketingType.HOLES)
+        self.assertEqual([polygon.get_points() for polygon in cached_pocket],
+                         [polygon.get_points() for polygon in pocket[5:] + pocket])
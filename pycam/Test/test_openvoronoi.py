@@ -0,0 +1,142 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import importlib
+import sys
+import types
+import unittest.mock
+
+from pycam.Geometry.Line import Line
+from pycam.Geometry.Polygon import Polygon
+import pycam.Test
+
+
+_StubPoint = collections.namedtuple("_StubPoint", ("x", "y"))
+
+
+class _StubDiagram:
+    """ record the sites of a diagram (instead of calculating it) """
+
+    def __init__(self, radius, bin_size):
+        self.vertices = []
+        self.lines = []
+
+    def addVertexSite(self, point):
+        self.vertices.append(point)
+        return len(self.vertices) - 1
+
+    def addLineSite(self, start, end):
+        self.lines.append((start, end))
+
+    def check(self):
+        return True
+
+    def getGraph(self):
+        return self
+
+
+class _StubOffset:
+    """ return the chains of line sites of the diagram as loops of straight segments """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def offset(self, distance):
+        vertices = self.graph.vertices
+        loops = []
+        previous_end = None
+        for start, end in self.graph.lines:
+            if start != previous_end:
+                loops.append([(vertices[start], -1)])
+            loops[-1].append((vertices[end], -1))
+            previous_end = end
+        return loops
+
+
+def _import_with_stub():
+    """ import the OpenVoronoi module with a stub replacing the (optional) openvoronoi library """
+    stub = types.ModuleType("openvoronoi")
+    stub.Point = _StubPoint
+    stub.VoronoiDiagram = _StubDiagram
+    stub.Offset = _StubOffset
+    with unittest.mock.patch.dict(sys.modules, {"openvoronoi": stub}):
+        sys.modules.pop("pycam.Toolpath.OpenVoronoi", None)
+        module = importlib.import_module("pycam.Toolpath.OpenVoronoi")
+        # other tests should not use the stub
+        sys.modules.pop("pycam.Toolpath.OpenVoronoi")
+    return module
+
+
+def _get_polygon(points, closed=True):
+    polygon = Polygon()
+    pairs = zip(points, points[1:] + points[:1]) if closed else zip(points, points[1:])
+    for start, end in pairs:
+        polygon.append(Line(start, end))
+    return polygon
+
+
+def _get_square(x, y, size):
+    return _get_polygon([(x, y, 0), (x + size, y, 0), (x + size, y + size, 0),
+                         (x, y + size, 0)])
+
+
+class TestOpenVoronoiInput(pycam.Test.PycamTestCase):
+
+    def setUp(self):
+        self.module = _import_with_stub()
+
+    def test_point_welding(self):
+        index = self.module._PointIndex(tolerance=0.01)
+        self.assertEqual(index.get_index((1, 1, 0)), 0)
+        # close points (also across the border of a grid cell) are welded
+        self.assertEqual(index.get_index((1.005, 0.995, 0)), 0)
+        self.assertEqual(index.get_index((0.9999, 1, 0)), 0)
+        # points beyond the tolerance stay separate
+        self.assertEqual(index.get_index((1.02, 1, 0)), 1)
+        self.assertEqual(index.get_index((1, 0.985, 0)), 2)
+        self.assertEqual(index.points, [(1, 1, 0), (1.02, 1, 0), (1, 0.985, 0)])
+
+    def test_line_set(self):
+        square = _get_square(0, 0, 10)
+        # the start of this open polygon is welded to a corner of the square
+        open_polygon = _get_polygon([(10, 10.0005, 0), (20, 20, 0), (20, 20.0005, 0),
+                                     (30, 20, 0)], closed=False)
+        point_set, line_set = self.module._polygons_to_line_set([square, open_polygon],
+                                                                tolerance=0.001)
+        self.assertEqual(len(point_set), 6)
+        # the collapsed segment (within the tolerance) of the open polygon is skipped
+        self.assertEqual(line_set, [(0, 1), (1, 2), (2, 3), (3, 0), (2, 4), (4, 5)])
+
+    def test_independent_groups(self):
+        squares = [_get_square(0, 0, 10), _get_square(100, 0, 10), _get_square(11, 0, 10),
+                   _get_square(50, 50, 10), _get_square(22, 0, 10)]
+        # the enlarged boxes of neighbouring squares overlap (transitively)
+        groups = self.module._get_independent_groups(squares, 0.6)
+        self.assertEqual(groups, [[squares[0], squares[2], squares[4]], [squares[1]],
+                                  [squares[3]]])
+        # a small offset keeps all squares separate (in the order of their first polygon)
+        groups = self.module._get_independent_groups(squares, -0.4)
+        self.assertEqual(groups, [[square] for square in squares])
+
+    def test_pocket_model(self):
+        squares = [_get_square(100, 0, 10), _get_square(0, 0, 10), _get_square(4, 4, 2)]
+        result = self.module.pocket_model(squares, 1)
+        # the stub returns the input polygons of each group (in the order of the groups)
+        self.assertEqual([round(abs(polygon.get_area()), 6) for polygon in result],
+                         [100, 100, 4])
+        self.assertEqual(round(result[0].minx, 6), 100)
@@ -1,4 +1,10 @@
-from pycam.Geometry.Polygon import Polygon
+import math
+import random
+
+from pycam.Geometry.Model import ContourModel
+from pycam.Geometry.Polygon import Polygon, PolygonSorter
+from pycam.Geometry.PolygonBoolean import get_split_edges
+from pycam.Geometry.RTree import RTree
 from pycam.Geometry.Line import Line
 
 
@@ -106,3 +112,203 @@ def test_get_offset_polygons_truncated_square_inside_small_offset():
         print(str(p))
     assert(len(output_p) == 1)
     assert_polygons_are_identical(output_p[0], expected_inside_p)
+
+
+def _get_circle_lines(count, noise=0):
+    """ return the lines of a counter-clockwise circle in random order
+
+    The end of each line differs slightly from the start of the next one (similar to the
+    intersections of adjacent triangles with a plane).
+    """
+    points = [(10 * math.cos(2 * math.pi * index / count),
+               10 * math.sin(2 * math.pi * index / count), 0.0) for index in range(count)]
+    lines = [Line(points[index], (points[(index + 1) % count][0] + noise,
+                                  points[(index + 1) % count][1], 0.0))
+             for index in range(count)]
+    random.Random(42).shuffle(lines)
+    return lines
+
+
+def test_contour_model_chains_lines_in_random_order():
+    model = ContourModel()
+    for line in _get_circle_lines(500, noise=1e-12):
+        model.append(line)
+    polygons = model.get_polygons()
+    assert len(polygons) == 1
+    assert polygons[0].is_closed
+    assert len(polygons[0].get_points()) == 500
+
+
+def test_contour_model_chains_reversed_lines():
+    model = ContourModel()
+    for index, line in enumerate(_get_circle_lines(100)):
+        if index % 3 == 0:
+            line = Line(line.p2, line.p1)
+        model.append(line)
+    assert len(model.get_polygons()) > 1
+    model.revise_directions()
+    polygons = model.get_polygons()
+    assert len(polygons) == 1
+    assert polygons[0].is_closed
+    assert polygons[0].is_outer()
+
+
+def _get_square_model(*squares):
+    """ return a model containing counter-clockwise squares (x, y, size) """
+    model = ContourModel()
+    for x, y, size in squares:
+        polygon = Polygon()
+        corners = ((x, y, 0), (x + size, y, 0), (x + size, y + size, 0), (x, y + size, 0))
+        for index, corner in enumerate(corners):
+            polygon.append(Line(corner, corners[(index + 1) % len(corners)]))
+        model.append(polygon)
+    return model
+
+
+def _get_areas(model):
+    return sorted(round(polygon.get_area(), 6) for polygon in model.get_polygons())
+
+
+def test_contour_model_union_with_shared_edges():
+    # a row of adjacent squares (shared edges) and an overlapping square
+    model = _get_square_model((0, 0, 10), (10, 0, 10), (20, 0, 10))
+    union = model.union(_get_square_model((25, 5, 10)))
+    assert _get_areas(union) == [375]
+    assert union.get_polygons()[0].is_outer()
+    # identical polygons
+    assert _get_areas(_get_square_model((0, 0, 10), (0, 0, 10)).union()) == [100]
+
+
+def test_contour_model_difference_and_intersection():
+    outer = _get_square_model((0, 0, 10))
+    inner = _get_square_model((2, 2, 4))
+    difference = outer.difference(inner)
+    assert _get_areas(difference) == [-16, 100]
+    assert [polygon.is_outer() for polygon in difference.get_polygons()
+            if polygon.get_area() < 0] == [False]
+    # squares sharing an edge do not intersect
+    assert _get_areas(outer.intersection(_get_square_model((10, 0, 10)))) == []
+    assert _get_areas(outer.intersection(_get_square_model((5, 5, 10)))) == [25]
+
+
+def test_contour_model_append_unify_overlaps():
+    model = _get_square_model((0, 0, 10))
+    for square in _get_square_model((10, 0, 10), (5, 5, 10), (40, 0, 5)).get_polygons():
+        model.append(square, unify_overlaps=True)
+    assert _get_areas(model) == [25, 250]
+    assert model.maxx == 45
+    # a grid of overlapping squares is merged into a single polygon
+    model = ContourModel()
+    for square in _get_square_model(*((x, y, 15) for x in range(0, 200, 10)
+                                      for y in range(0, 200, 10))).get_polygons():
+        model.append(square, unify_overlaps=True)
+    assert _get_areas(model) == [205 * 205]
+    assert len(model) == 1
+    merged = square_p.union(_get_square_model((10, 0, 10)).get_polygons()[0])
+    assert [round(polygon.get_area(), 6) for polygon in merged] == [200]
+
+
+def _get_polygon(corners):
+    polygon = Polygon()
+    for index, corner in enumerate(corners):
+        polygon.append(Line(corner, corners[(index + 1) % len(corners)]))
+    return polygon
+
+
+def test_get_offset_polygons_splits_at_narrow_neck():
+    # two squares connected by a narrow corridor
+    dumbbell = _get_polygon(((0, 0, 0), (10, 0, 0), (10, 4, 0), (20, 4, 0), (20, 0, 0),
+                             (30, 0, 0), (30, 10, 0), (20, 10, 0), (20, 6, 0), (10, 6, 0),
+                             (10, 10, 0), (0, 10, 0)))
+    output_p = dumbbell.get_offset_polygons(-2)
+    assert sorted(round(polygon.get_area(), 6) for polygon in output_p) == [36, 36]
+    assert all(polygon.is_outer() for polygon in output_p)
+
+
+def test_get_offset_polygons_collapsed_thin_triangle():
+    # the shifted lines of a thin triangle form a flipped triangle
+    triangle = _get_polygon(((0, 0, 0), (10, 0, 0), (5, 0.5, 0)))
+    assert triangle.get_offset_polygons(-1) == []
+    assert [polygon.is_outer() for polygon in triangle.get_offset_polygons(1)] == [True]
+
+
+def test_get_split_edges_with_overlaps():
+    edges = (((0, 0), (10, 0)), ((8, 0), (2, 0)), ((5, -5), (5, 5)), ((5, 5), (5, 5.000001)))
+    assert get_split_edges(edges) == [[(0, 0), (2, 0), (5, 0), (8, 0), (10, 0)],
+                                      [(8, 0), (5, 0), (2, 0)],
+                                      [(5, -5), (5, 0), (5, 5)],
+                                      [(5, 5)]]
+
+
+def test_contains_points_matches_is_point_inside():
+    random.seed(4)
+    star = _get_polygon([(math.cos(index * math.pi / 7) * (10 if index % 2 else 4),
+                          math.sin(index * math.pi / 7) * (10 if index % 2 else 4), 0)
+                         for index in range(14)])
+    points = [(random.uniform(-11, 11), random.uniform(-11, 11), 0) for _ in range(2000)]
+    # points on vertices, on edges and outside of the z range
+    points.extend(star.get_points() + [(0, 4, 0), (0, 0, 1)])
+    results = star.contains_points(points)
+    assert list(results) == [star.is_point_inside(point) for point in points]
+    assert 0 < sum(results) < len(points)
+    assert list(star.get_reversed().contains_points(points)) == list(results)
+
+
+def test_rtree_get_overlapping():
+    boxes = [(x, y, x + 1, y + 1) for x in range(30) for y in range(30)]
+    tree = RTree((box, index) for index, box in enumerate(boxes))
+    assert sorted(tree.get_overlapping((4.5, 6.5, 5.5, 6.6))) == sorted(
+        [boxes.index((4, 6, 5, 7)), boxes.index((5, 6, 6, 7))])
+    assert len(tree.get_overlapping((-1, -1, 100, 100))) == len(boxes)
+    assert tree.get_overlapping((40, 40, 50, 50)) == []
+    assert RTree([]).get_overlapping((0, 0, 1, 1)) == []
+
+
+def test_contour_model_revise_directions_of_nested_polygons():
+    # rows of squares (each containing a hole containing an island) with inverted directions
+    squares = []
+    for x in range(0, 200, 20):
+        for y in range(0, 200, 20):
+            squares.extend(((x, y, 10), (x + 2, y + 2, 6), (x + 4, y + 4, 2)))
+    model = _get_square_model(*squares)
+    for polygon in model.get_polygons():
+        polygon.reverse_direction()
+    model.revise_directions()
+    # only the holes are inner polygons
+    assert all(polygon.is_outer() == (abs(polygon.get_area()) != 36)
+               for polygon in model.get_polygons())
+
+
+def test_polygon_sorter_processes_inner_polygons_first():
+    random.seed(3)
+    # nested squares at random positions (including identical squares)
+    squares = []
+    for _ in range(100):
+        x, y = random.uniform(0, 1000), random.uniform(0, 1000)
+        squares.extend(((x, y, 30), (x + 5, y + 5, 20), (x + 10, y + 10, 5), (x + 10, y + 10, 5)))
+    random.shuffle(squares)
+    polygons = _get_square_model(*squares).get_polygons()
+    result = PolygonSorter(polygons).get_polygons()
+    assert sorted(map(id, result)) == sorted(map(id, polygons))
+    for index, polygon in enumerate(result):
+        for other in result[index + 1:]:
+            assert not polygon.is_polygon_inside(other) or other.is_polygon_inside(polygon)
+
+
+def test_polygon_sorter_processes_inner_holes_first():
+    random.seed(4)
+    # nested holes (negative area) at random positions
+    squares = []
+    for _ in range(50):
+        x, y = random.uniform(0, 1000), random.uniform(0, 1000)
+        squares.extend(((x, y, 30), (x + 5, y + 5, 20), (x + 10, y + 10, 5)))
+    random.shuffle(squares)
+    polygons = _get_square_model(*squares).get_polygons()
+    for polygon in polygons:
+        polygon.reverse_direction()
+    assert all(polygon.get_area() < 0 for polygon in polygons)
+    result = PolygonSorter(polygons).get_polygons()
+    assert sorted(map(id, result)) == sorted(map(id, polygons))
+    for index, polygon in enumerate(result):
+        for other in result[index + 1:]:
+            assert not polygon.is_polygon_inside(other)
@@ -0,0 +1,118 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import threading
+
+from pycam.PathGenerators import ProgressToken, UpdateToolView, get_progress_token
+from pycam.Utils.progress import ProgressChannel, ProgressContext, get_progress_channel, \
+        set_progress_channel
+import pycam.Test
+
+
+def _run_in_thread(func, channel):
+    results = []
+
+    def target():
+        set_progress_channel(channel)
+        try:
+            results.append(func())
+        finally:
+            set_progress_channel(None)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    return results[0]
+
+
+class TestProgressChannel(pycam.Test.PycamTestCase):
+
+    def test_thread_local_channel(self):
+        channel = ProgressChannel()
+        self.assertEqual(_run_in_thread(get_progress_channel, channel), channel)
+        self.assertIsNone(get_progress_channel())
+
+    def test_worker_reports(self):
+        channel = ProgressChannel(max_fps=1)
+        path = [(0, 0, 0)]
+
+        def generate():
+            with ProgressContext("Calculating toolpath") as progress:
+                callback = UpdateToolView(progress.update).update
+                callback(text="first line", percent=10, tool_position=(1, 2, 3), toolpath=path)
+                # the snapshot of the toolpath is not updated with more than "max_fps"
+                path.append((1, 1, 1))
+                return callback(percent=20, tool_position=(4, 5, 6), toolpath=path)
+
+        self.assertFalse(_run_in_thread(generate, channel))
+        changed, text, percent, tool_position, toolpath = channel.get_state()
+        self.assertTrue(changed)
+        self.assertEqual(text, "first line")
+        self.assertEqual(percent, 20)
+        self.assertEqual(tool_position, (4, 5, 6))
+        self.assertEqual(toolpath, [(0, 0, 0)])
+        self.assertFalse(channel.get_state()[0])
+
+    def test_cancel(self):
+        channel = ProgressChannel()
+        channel.cancel()
+
+        def generate():
+            with ProgressContext("Calculating toolpath") as progress:
+                return UpdateToolView(progress.update).update(percent=50)
+
+        self.assertTrue(_run_in_thread(generate, channel))
+
+
+class TestProgressToken(pycam.Test.PycamTestCase):
+
+    def test_throttled_positions(self):
+        reports = []
+
+        def callback(**kwargs):
+            reports.append(kwargs)
+            return False
+
+        token = ProgressToken(callback, max_fps=1e-6, check_count=10)
+        for index in range(1000):
+            self.assertFalse(token.update_position((index, 0, 0)))
+        # only the first report passes the (very long) time limit
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]["tool_position"], (0, 0, 0))
+        # a new stage of the calculation is reported immediately (with the latest position)
+        token.set_text("next layer")
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(reports[1]["text"], "next layer")
+        self.assertEqual(reports[1]["tool_position"], (999, 0, 0))
+
+    def test_cancel(self):
+        token = ProgressToken(lambda **kwargs: True, max_fps=1e6, check_count=3)
+        self.assertTrue(token.update(percent=10))
+        self.assertTrue(token.cancelled)
+        token = ProgressToken()
+        self.assertFalse(token.update_position((0, 0, 0)))
+        token.cancel()
+        self.assertTrue(token.update_position((0, 0, 0)))
+
+    def test_compatibility(self):
+        token = ProgressToken()
+        self.assertIs(get_progress_token(token), token)
+        self.assertIsNone(get_progress_token(None).callback)
+        reports = []
+        token = get_progress_token(lambda **kwargs: reports.append(kwargs))
+        token.set_text("start")
+        self.assertEqual(reports[0]["text"], "start")
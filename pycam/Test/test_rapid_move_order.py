@@ -0,0 +1,118 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import random
+
+from pycam.Cutters.CylindricalCutter import CylindricalCutter
+from pycam.Geometry.PathOrder import get_nearest_neighbour_order, get_optimized_order, \
+        get_route_length
+from pycam.Toolpath import MOVE_SAFETY
+from pycam.Toolpath.Filters import RapidMoveOrder
+import pycam.Toolpath.Steps as ToolpathSteps
+import pycam.Test
+
+
+def _get_segments(toolpath):
+    segments = []
+    current = []
+    for step in toolpath:
+        if step.action == MOVE_SAFETY:
+            if current:
+                segments.append(tuple(current))
+            current = []
+        else:
+            current.append(step)
+    if current:
+        segments.append(tuple(current))
+    return segments
+
+
+def _get_toolpath(segments):
+    toolpath = []
+    for start, end in segments:
+        toolpath.append(ToolpathSteps.MoveStraight(start))
+        toolpath.append(ToolpathSteps.MoveStraight(end))
+        toolpath.append(ToolpathSteps.MoveSafety())
+    return toolpath
+
+
+class TestRapidMoveOrder(pycam.Test.PycamTestCase):
+
+    def test_optimized_order(self):
+        random.seed(42)
+        starts = [(random.uniform(0, 100), random.uniform(0, 100)) for _ in range(300)]
+        ends = [(x + 2, y + 1) for x, y in starts]
+        order = get_optimized_order(starts, ends)
+        self.assertEqual(sorted(order), list(range(len(starts))))
+        # the first item is kept
+        self.assertEqual(order[0], 0)
+        self.assertLess(get_route_length(starts, ends, order),
+                        get_route_length(starts, ends, range(len(starts))) / 4)
+        # an already optimal order is kept
+        line_starts = [(x, 0) for x in range(10)]
+        line_ends = [(x + 0.5, 0) for x in range(10)]
+        self.assertEqual(get_optimized_order(line_starts, line_ends), list(range(10)))
+
+    def test_precedence_constraints(self):
+        random.seed(7)
+        starts = [(random.uniform(0, 100), random.uniform(0, 100)) for _ in range(300)]
+        # every item depends on two other items (with lower indices)
+        predecessors = [random.sample(range(index), min(index, 2)) for index in range(300)]
+        greedy = get_nearest_neighbour_order(starts, starts, predecessors=predecessors)
+        order = get_optimized_order(starts, starts, predecessors=predecessors, time_limit=10)
+        self.assertEqual(sorted(order), list(range(len(starts))))
+        positions = {item: index for index, item in enumerate(order)}
+        for item, item_predecessors in enumerate(predecessors):
+            for predecessor in item_predecessors:
+                self.assertLess(positions[predecessor], positions[item])
+        self.assertLessEqual(get_route_length(starts, starts, order),
+                             get_route_length(starts, starts, greedy))
+        self.assertRaises(ValueError, get_nearest_neighbour_order, starts[:2], starts[:2],
+                          predecessors=[[1], [0]])
+
+    def test_layers_are_kept(self):
+        segments = []
+        for z in (3, 2, 1):
+            for x in (0, 8, 2, 6, 4):
+                segments.append(((x, 0, z), (x, 10, z)))
+        toolpath = _get_toolpath(segments)
+        result = toolpath | RapidMoveOrder(models=(), cutter=None, max_link_distance=0)
+        result_segments = _get_segments(result)
+        self.assertEqual(sorted(result_segments), sorted(_get_segments(toolpath)))
+        self.assertEqual([segment[0].position[2] for segment in result_segments],
+                         [3] * 5 + [2] * 5 + [1] * 5)
+        self.assertEqual([segment[0].position[0] for segment in result_segments[:5]],
+                         [0, 2, 4, 6, 8])
+        self.assertEqual(result.count(ToolpathSteps.MoveSafety()),
+                         toolpath.count(ToolpathSteps.MoveSafety()))
+
+    def test_direct_links(self):
+        segments = [((0, 0, 0), (10, 0, 0)), ((10, 1, 0), (0, 1, 0)),
+                    ((0, 5, 0), (10, 5, 0)), ((10, 5, -1), (0, 5, -1))]
+        toolpath = _get_toolpath(segments)
+        result = toolpath | RapidMoveOrder(models=(), cutter=CylindricalCutter(1),
+                                           max_link_distance=2)
+        # only the first transition is short and at the same height
+        self.assertEqual([step.action for step in result].count(MOVE_SAFETY), 3)
+        self.assertEqual(result[:4], toolpath[:2] + toolpath[3:5])
+
+    def test_machine_settings_are_barriers(self):
+        segments = [((x, 0, 0), (x, 1, 0)) for x in (0, 5, 1, 4)]
+        toolpath = _get_toolpath(segments)
+        toolpath.insert(6, ToolpathSteps.MachineSetting("feedrate", 100))
+        result = toolpath | RapidMoveOrder(models=(), cutter=None, max_link_distance=0)
+        self.assertEqual(result, toolpath)
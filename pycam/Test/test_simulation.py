@@ -0,0 +1,186 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pycam.Cutters.CylindricalCutter import CylindricalCutter
+from pycam.Cutters.SphericalCutter import SphericalCutter
+from pycam.Cutters.ToroidalCutter import ToroidalCutter
+from pycam.Geometry import Box3D, Point3D
+from pycam.Geometry.Model import Model
+from pycam.Geometry.Triangle import Triangle
+from pycam.Simulation.HeightMap import HeightMap, StockSimulation, simulate_toolpath
+from pycam.Simulation.RestMachining import ResidualMaterial
+from pycam.Simulation.Verification import get_model_heights, verify_toolpath
+from pycam.Toolpath import Toolpath
+from pycam.Toolpath.MotionGrid import get_restricted_grid
+import pycam.Toolpath.Steps as ToolpathSteps
+import pycam.Test
+
+
+BOX = Box3D(Point3D(0, 0, -5), Point3D(10, 10, 0))
+
+
+def _get_sampled_heights(height_map, profile, radius, start, end, samples=2000):
+    """ calculate the remaining stock by placing the cutter at many positions along a move
+
+    Grid points close to the edge of the swept area are ignored (returned as NaN).
+    """
+    grid_x, grid_y = numpy.meshgrid(height_map.x, height_map.y)
+    result = numpy.full_like(height_map.heights, BOX.maxz)
+    min_distances = numpy.full_like(height_map.heights, numpy.inf)
+    for t in numpy.linspace(0, 1, samples + 1):
+        position = [s + t * (e - s) for s, e in zip(start, end)]
+        distances = numpy.hypot(grid_x - position[0], grid_y - position[1])
+        covered = distances <= radius
+        tool_heights = position[2] + profile(numpy.minimum(distances, radius))
+        result = numpy.where(covered, numpy.minimum(result, tool_heights), result)
+        min_distances = numpy.minimum(min_distances, distances)
+    result[abs(min_distances - radius) < 0.01] = numpy.nan
+    return numpy.maximum(result, BOX.minz)
+
+
+@unittest.skipIf(numpy is None, "the stock simulation requires numpy")
+class TestHeightMap(pycam.Test.PycamTestCase):
+
+    def test_cutter_shapes(self):
+        profiles = (
+            (CylindricalCutter(1.5), lambda d: 0 * d),
+            (SphericalCutter(1.5), lambda d: 1.5 - numpy.sqrt(1.5 ** 2 - d ** 2)),
+            (ToroidalCutter(1.5, 0.5),
+             lambda d: 0.5 - numpy.sqrt(0.25 - numpy.maximum(d - 1, 0) ** 2)))
+        moves = (((2.1, 3.3, -1), (8.2, 7.1, -3)), ((5, 5, -0.5), (5, 5, -2)),
+                 ((8.3, 1.2, -6), (1.7, 4.4, -0.5)))
+        for cutter, profile in profiles:
+            for start, end in moves:
+                height_map = HeightMap(BOX, 0.2)
+                height_map.cut_segments(cutter, [start], [end])
+                expected = _get_sampled_heights(height_map, profile, cutter.radius, start, end)
+                self.assertLess(numpy.nanmax(abs(height_map.heights - expected)), 0.005,
+                                msg="{} / {}".format(cutter, (start, end)))
+
+    def test_removed_volume(self):
+        height_map = HeightMap(BOX, 0.02)
+        # a slot with a depth of 1 mm: length 6 mm and rounded ends
+        height_map.cut_segments(CylindricalCutter(1), [(2, 5, -1)], [(8, 5, -1)])
+        self.assertAlmostEqual(height_map.get_removed_volume(), 6 * 2 + math.pi, delta=0.2)
+        self.assertEqual(height_map.heights.min(), -1)
+
+    def test_incremental_update(self):
+        path = [ToolpathSteps.MachineSetting("feedrate", 100),
+                ToolpathSteps.MoveStraightRapid((1, 1, 2)),
+                ToolpathSteps.MoveStraight((1, 1, -1)),
+                ToolpathSteps.MoveStraight((9, 2, -2)),
+                ToolpathSteps.MoveStraight((9, 8, -2)),
+                ToolpathSteps.MoveStraight((2, 8, -0.5))]
+        toolpath = Toolpath(toolpath_path=path)
+        cutter = SphericalCutter(1)
+        expected = simulate_toolpath(toolpath, cutter, BOX, 0.1).heights
+        simulation = StockSimulation(toolpath, cutter, BOX, 0.1)
+        total_time = toolpath.get_machine_time()
+        for index in range(1, 21):
+            simulation.update(total_time * index / 20)
+        self.assertTrue(numpy.allclose(simulation.height_map.heights, expected))
+        # a reduced time resets the stock
+        simulation.update(total_time / 10)
+        self.assertTrue((simulation.height_map.heights >= expected).all())
+        self.assertFalse(numpy.allclose(simulation.height_map.heights, expected))
+        # the result is the same as for a new simulation - even with the same number of moves
+        for fraction in (0.6, 0.9, 0.55, 0.5):
+            simulation.update(total_time * fraction)
+            expected_partial = StockSimulation(toolpath, cutter, BOX, 0.1).update(
+                total_time * fraction).heights
+            self.assertTrue(numpy.allclose(simulation.height_map.heights, expected_partial))
+
+
+@unittest.skipIf(numpy is None, "the toolpath verification requires numpy")
+class TestVerification(pycam.Test.PycamTestCase):
+
+    def _get_ramp_model(self):
+        """ a ramp rising from z=-4 (x=0) to z=-1 (x=10) """
+        model = Model()
+        corners = (Point3D(0, 0, -4), Point3D(10, 0, -1), Point3D(10, 10, -1),
+                   Point3D(0, 10, -4))
+        model.append(Triangle(corners[0], corners[1], corners[2]))
+        model.append(Triangle(corners[0], corners[2], corners[3]))
+        return model
+
+    def test_model_heights(self):
+        model = self._get_ramp_model()
+        triangles = numpy.array([(t.p1, t.p2, t.p3) for t in model.triangles()])
+        grid = numpy.linspace(0, 10, 11)
+        heights = get_model_heights(triangles, grid, grid, BOX.minz)
+        self.assertTrue(numpy.allclose(heights, -4 + 0.3 * grid[numpy.newaxis, :]))
+        # grid points outside of the model
+        heights = get_model_heights(triangles, grid + 20, grid, BOX.minz)
+        self.assertTrue((heights == BOX.minz).all())
+
+    def test_gouge_detection(self):
+        model = self._get_ramp_model()
+        cutter = CylindricalCutter(1)
+        path = [ToolpathSteps.MachineSetting("feedrate", 100),
+                ToolpathSteps.MoveStraight((1, 5, -0.5)),
+                ToolpathSteps.MoveStraight((9, 5, -0.5)),
+                ToolpathSteps.MoveSafety(),
+                ToolpathSteps.MoveStraight((9, 2, -0.5))]
+        result = verify_toolpath(Toolpath(toolpath_path=path), cutter, [model], BOX, 0.1)
+        self.assertEqual(result.max_gouge_depth, 0)
+        self.assertEqual(result.gouge_moves, [])
+        self.assertEqual(sum(count for limit, count in result.residual_histogram), 101 * 101)
+        # the flat cutter ends 0.6 mm below the ramp (at x=9)
+        path.insert(3, ToolpathSteps.MoveStraight((8, 8, -1.9)))
+        result = verify_toolpath(Toolpath(toolpath_path=path), cutter, [model], BOX, 0.1)
+        self.assertAlmostEqual(result.max_gouge_depth, 0.6, places=6)
+        self.assertEqual(result.gouge_moves, [3])
+
+
+@unittest.skipIf(numpy is None, "rest machining requires numpy")
+class TestRestMachining(pycam.Test.PycamTestCase):
+
+    def test_residual_material(self):
+        # a flat model at z=-2
+        model = Model()
+        corners = (Point3D(0, 0, -2), Point3D(10, 0, -2), Point3D(10, 10, -2),
+                   Point3D(0, 10, -2))
+        model.append(Triangle(corners[0], corners[1], corners[2]))
+        model.append(Triangle(corners[0], corners[2], corners[3]))
+        # the left half of the stock is removed by the previous toolpath
+        path = []
+        for y in range(11):
+            path.append(ToolpathSteps.MoveStraight((0, y, -2)))
+            path.append(ToolpathSteps.MoveStraight((5, y, -2)))
+        residual = ResidualMaterial([(Toolpath(toolpath_path=path), CylindricalCutter(1))],
+                                    [model], BOX, 0.1)
+        self.assertAlmostEqual(residual.residual.min(), 0)
+        self.assertAlmostEqual(residual.residual.max(), 2)
+        is_relevant = residual.get_position_filter(0.05, 0.5)
+        self.assertFalse(is_relevant((3, 5, -5)))
+        self.assertTrue(is_relevant((5.8, 5, -5)))
+        self.assertTrue(is_relevant((8, 5, -5)))
+        # positions outside of the stock are mapped to its border
+        self.assertTrue(is_relevant((12, 5, -5)))
+        # the lines of a motion grid are split
+        grid = [[[(x, y, -5) for x in range(11)] for y in (2, 5)]]
+        restricted = [list(layer) for layer in get_restricted_grid(grid, is_relevant)]
+        self.assertEqual(restricted, [[[(x, 2, -5) for x in range(6, 11)],
+                                       [(x, 5, -5) for x in range(6, 11)]]])
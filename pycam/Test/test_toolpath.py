@@ -0,0 +1,291 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import io
+import os
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pycam.errors import InvalidDataError, LoadFileError
+from pycam.Toolpath import ArcPlane, Toolpath, ToolpathLevelOfDetail, ToolpathPathMode, \
+        get_direction_cone_arrays, get_move_segment_arrays
+from pycam.Toolpath.BinaryFormat import read_toolpath, write_toolpath
+import pycam.Toolpath.Filters as tp_filters
+from pycam.Toolpath.Filters import TimeLimit
+import pycam.Toolpath.Steps as ToolpathSteps
+import pycam.Test
+import pycam.workspace.data_models
+
+
+class TestToolpathTimeIndex(pycam.Test.PycamTestCase):
+
+    def setUp(self):
+        self.toolpath = Toolpath(toolpath_path=[
+            ToolpathSteps.MachineSetting("feedrate", 100),
+            ToolpathSteps.MoveStraight((0, 0, 0)),
+            ToolpathSteps.MoveStraight((10, 0, 0)),
+            ToolpathSteps.MoveStraight((10, 0, 0)),
+            ToolpathSteps.MachineSetting("feedrate", 200),
+            ToolpathSteps.MoveStraight((10, 20, 0)),
+            ToolpathSteps.MoveSafety(),
+            ToolpathSteps.MoveArc((0, 20, 0), center=(5, 20, 0), clockwise=True),
+            ToolpathSteps.MoveStraightRapid((0, 0, 5))])
+
+    def test_same_as_time_limit_filter(self):
+        total_time = self.toolpath.get_machine_time()
+        for index in range(1, 42):
+            max_time = total_time * index / 40
+            expected = self.toolpath.get_basic_moves() | TimeLimit(max_time)
+            result = self.toolpath.get_moves(max_time=max_time)
+            self.assertEqual(len(result), len(expected))
+            for step, expected_step in zip(result, expected):
+                self.assertEqual(step.action, expected_step.action)
+                self.assert_vector_equal(step.position, expected_step.position)
+
+    def test_start_index(self):
+        total_time = self.toolpath.get_machine_time()
+        all_moves = self.toolpath.get_moves(max_time=total_time)
+        self.assertEqual(len(self.toolpath.get_moves(start_index=0)), len(all_moves))
+        for max_time in (0.05, 0.15, total_time):
+            expected = self.toolpath.get_moves(max_time=max_time)
+            for start_index in range(len(expected) + 2):
+                result = self.toolpath.get_moves(max_time=max_time, start_index=start_index)
+                self.assertEqual(list(result), list(expected)[start_index:])
+
+    def test_moves_view(self):
+        moves = self.toolpath.get_moves(max_time=0.15)
+        expected = list(moves)
+        self.assertEqual(len(expected), 4)
+        # the last move is incomplete
+        self.assertEqual(moves[-1], expected[-1])
+        self.assertNotEqual(moves[-1], self.toolpath.get_moves(start_index=0)[3])
+        self.assertEqual([moves[index] for index in range(-4, 4)], expected + expected)
+        self.assertEqual(moves[1:3], expected[1:3])
+        self.assertEqual(moves[::-1], expected[::-1])
+        self.assertRaises(IndexError, lambda: moves[4])
+        self.assertRaises(IndexError, lambda: moves[-5])
+        self.assertFalse(self.toolpath.get_moves(max_time=0.15, start_index=10))
+
+    def test_cache_is_reset(self):
+        self.assertEqual(len(self.toolpath.get_moves(max_time=0.15)), 4)
+        self.toolpath.path = self.toolpath.path[:2]
+        self.assertEqual(len(self.toolpath.get_moves(max_time=0.15)), 1)
+
+
+@unittest.skipIf(numpy is None, "the visualization arrays require numpy")
+class TestToolpathOpenGLArrays(pycam.Test.PycamTestCase):
+
+    def test_move_segments(self):
+        moves = [ToolpathSteps.MachineSetting("feedrate", 100),
+                 ToolpathSteps.MoveStraight((0, 0, 0)),
+                 ToolpathSteps.MoveStraight((10, 0, 0)),
+                 ToolpathSteps.MoveSafety(),
+                 ToolpathSteps.MoveStraightRapid((10, 0, 5)),
+                 ToolpathSteps.MoveArc((0, 0, 5), center=(5, 0, 5), clockwise=True)]
+        starts, ends, is_rapid = get_move_segment_arrays(moves)
+        # the arc is approximated by 18 segments (10 degrees each)
+        self.assertEqual(len(starts), 20)
+        self.assertEqual(is_rapid.tolist(), [False, True] + 18 * [False])
+        self.assertTrue(numpy.array_equal(starts[1:], ends[:-1]))
+        self.assertEqual(ends[-1].tolist(), [0, 0, 5])
+        self.assertTrue(numpy.allclose(numpy.hypot(ends[1:, 0] - 5, ends[1:, 1]), 5))
+
+    def test_direction_cones(self):
+        starts = [(0, 0, 0), (1, 1, 1), (0, 0, 0), (0, 0, 0)]
+        ends = [(10, 0, 0), (1, 1, 1), (0, 0, -20), (3, 4, 0)]
+        vertices, indices = get_direction_cone_arrays(starts, ends, precision=8)
+        # the zero-length segment is skipped
+        self.assertEqual(vertices.shape, (3 * 9, 3))
+        self.assertEqual(indices.shape, (3 * 8 * 3, ))
+        self.assertEqual(indices.max(), len(vertices) - 1)
+        cones = vertices.reshape(3, 9, 3)
+        for cone, index in zip(cones, (0, 2, 3)):
+            start, end = numpy.array(starts[index], float), numpy.array(ends[index], float)
+            length = numpy.linalg.norm(end - start)
+            direction = (end - start) / length
+            # the apex is located slightly beyond the middle of the segment
+            self.assertTrue(numpy.allclose(cone[0], start + 0.55 * (end - start), atol=1e-5))
+            bottom = start + 0.45 * (end - start)
+            for point in cone[1:]:
+                self.assertAlmostEqual(float(numpy.dot(point - bottom, direction)), 0, places=4)
+                self.assertAlmostEqual(float(numpy.linalg.norm(point - bottom)),
+                                       length * 0.1 / 3, places=4)
+        # all triangles contain the apex of their cone
+        self.assertTrue(all(triangle[0] % 9 == 0 for triangle in indices.reshape(-1, 3)))
+
+
+def _get_orthogonal_projection(minx, maxx, miny, maxy):
+    """ an OpenGL projection matrix (column-major) looking down onto the given area """
+    matrix = numpy.identity(4)
+    matrix[0, 0] = 2 / (maxx - minx)
+    matrix[1, 1] = 2 / (maxy - miny)
+    matrix[2, 2] = -2 / 100
+    matrix[3, 0] = -(maxx + minx) / (maxx - minx)
+    matrix[3, 1] = -(maxy + miny) / (maxy - miny)
+    return matrix.reshape(-1)
+
+
+@unittest.skipIf(numpy is None, "the visualization arrays require numpy")
+class TestToolpathLevelOfDetail(pycam.Test.PycamTestCase):
+
+    def setUp(self):
+        # a dense zigzag raster (100 x 100 mm)
+        grid_x, grid_y = numpy.meshgrid(numpy.linspace(0, 100, 400), numpy.linspace(0, 100, 400))
+        grid_x[1::2] = grid_x[1::2, ::-1]
+        points = numpy.stack((grid_x, grid_y, numpy.sin(grid_x / 5)), axis=-1)
+        points = points.reshape(-1, 3).astype(numpy.float32)
+        self.starts, self.ends = points[:-1], points[1:]
+        self.is_rapid = numpy.zeros(len(self.starts), dtype=bool)
+        self.is_rapid[::1000] = True
+        self.level_of_detail = ToolpathLevelOfDetail(self.starts, self.ends, self.is_rapid)
+
+    def _get_cells(self, points, level):
+        lod = self.level_of_detail
+        cells = numpy.floor((points - lod.low) / lod.cell_sizes[level]).astype(int)
+        return cells[:, 0] + 10 ** 5 * cells[:, 1] + 10 ** 10 * cells[:, 2]
+
+    def test_levels(self):
+        lod = self.level_of_detail
+        self.assertEqual(lod.get_edge_count(None), len(self.starts))
+        counts = [lod.get_edge_count(level) for level in range(lod.LEVEL_COUNT)]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        # the coarsest level contains only a fraction of the segments
+        self.assertLess(counts[-1], len(self.starts) / 50)
+        for level in (0, lod.LEVEL_COUNT - 1):
+            starts, ends, is_rapid, offsets = lod._levels[level]
+            self.assertEqual(offsets[-1], len(starts))
+            # every vertex is the center of a cell containing an original vertex
+            self.assertTrue(numpy.isin(
+                self._get_cells(numpy.concatenate((starts, ends)), level),
+                self._get_cells(numpy.concatenate((self.starts, self.ends)), level)).all())
+            self.assertTrue(is_rapid.any())
+
+    def test_select_levels(self):
+        lod = self.level_of_detail
+        identity = numpy.identity(4).reshape(-1)
+        # overview: all tiles with a coarse level (cells slightly smaller than a pixel)
+        selected = lod.select_levels(_get_orthogonal_projection(0, 100, 0, 100), identity,
+                                     (500, 500))
+        self.assertEqual(len(selected), lod.TILE_COUNT ** 2)
+        self.assertEqual({level for tile, level in selected}, {3})
+        self.assertLess(lod.cell_sizes[3], 100 / 500)
+        self.assertGreater(lod.cell_sizes[4], 100 / 500)
+        # zoomed in: only the visible tiles are drawn in full resolution
+        selected = lod.select_levels(_get_orthogonal_projection(1, 5, 1, 5), identity,
+                                     (500, 500))
+        self.assertEqual(selected, [(0, None)])
+        # outside of the toolpath
+        self.assertEqual(lod.select_levels(_get_orthogonal_projection(200, 300, 0, 100),
+                                           identity, (500, 500)), [])
+
+
+class TestToolpathBinaryFormat(pycam.Test.PycamTestCase):
+
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp(suffix=".pctp")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def _store_and_load(self, toolpath):
+        with open(self.filename, "wb") as stream:
+            write_toolpath(toolpath, stream)
+        return read_toolpath(self.filename)
+
+    def test_round_trip(self):
+        path = [ToolpathSteps.MachineSetting("feedrate", 200.5),
+                ToolpathSteps.Comment("start"),
+                ToolpathSteps.MoveStraightRapid((0, 0, 5)),
+                ToolpathSteps.MoveStraight((0.25, -1, 2)),
+                ToolpathSteps.MoveArc((2, 0, 1), center=(1, 0, 1), clockwise=True,
+                                      plane=ArcPlane.XZ),
+                ToolpathSteps.MoveArc((3, 0, 1)),
+                ToolpathSteps.MoveSafety(),
+                ToolpathSteps.MachineSetting("corner_style",
+                                             (ToolpathPathMode.CORNER_STYLE_EXACT_STOP, 0, 0))]
+        filters = [tp_filters.SelectTool(3), tp_filters.MachineSetting("feedrate", 100),
+                   tp_filters.StepWidth({"x": 0.1, "y": 0.1, "z": 0.2}),
+                   tp_filters.CornerStyle(ToolpathPathMode.CORNER_STYLE_OPTIMIZE_SPEED, 0.1, 0)]
+        tool = {"shape": "ball_nose", "diameter": 2, "feed": 300}
+        loaded = self._store_and_load(Toolpath(toolpath_path=path, toolpath_filters=filters,
+                                               tool=tool))
+        self.assertEqual(len(loaded.path), len(path))
+        self.assertEqual(tuple(loaded.path), tuple(path))
+        self.assertEqual(loaded.path[-4:], tuple(path[-4:]))
+        self.assertEqual(loaded.path[-1], path[-1])
+        self.assertEqual([tp_filter.settings for tp_filter in loaded.filters],
+                         [tp_filter.settings for tp_filter in filters])
+        self.assertEqual([type(tp_filter) for tp_filter in loaded.filters],
+                         [type(tp_filter) for tp_filter in filters])
+        self.assertEqual(loaded.tool, tool)
+        self.assertEqual(loaded.get_basic_moves(),
+                         Toolpath(toolpath_path=path, toolpath_filters=filters).get_basic_moves())
+
+    def test_invalid_file(self):
+        with open(self.filename, "wb") as stream:
+            stream.write(b"G1 X0 Y0 Z0\n" * 10)
+        self.assertRaises(LoadFileError, read_toolpath, self.filename)
+
+    def _get_toolpath_from_file(self):
+        return pycam.workspace.data_models.Toolpath(
+            None, {"source": {"type": "toolpath_file", "location": self.filename}},
+            add_to_collection=False)
+
+    def test_source(self):
+        path = [ToolpathSteps.MachineSetting("feedrate", 100),
+                ToolpathSteps.MoveStraight((0, 0, 0)),
+                ToolpathSteps.MoveStraight((10, 0, 0))]
+        tool = {"shape": "flat_bottom", "diameter": 3, "feed": 300}
+        with open(self.filename, "wb") as stream:
+            write_toolpath(Toolpath(toolpath_path=path, tool=tool), stream)
+        toolpath = self._get_toolpath_from_file().get_toolpath()
+        self.assertEqual(tuple(toolpath.path), tuple(path))
+        self.assertEqual(toolpath.tool.get_value("diameter"), 3)
+        # a changed file is loaded again (instead of using the cached toolpath)
+        path.append(ToolpathSteps.MoveStraight((10, 10, 0)))
+        with open(self.filename, "wb") as stream:
+            write_toolpath(Toolpath(toolpath_path=path), stream)
+        toolpath = self._get_toolpath_from_file().get_toolpath()
+        self.assertEqual(tuple(toolpath.path), tuple(path))
+        self.assertIsNone(toolpath.tool)
+
+    def test_export(self):
+        path = [ToolpathSteps.MoveStraightRapid((0, 0, 5)),
+                ToolpathSteps.MoveArc((2, 0, 5), center=(1, 0, 5), clockwise=True)]
+        filters = [tp_filters.MachineSetting("feedrate", 100)]
+        source = pycam.workspace.data_models.Toolpath(
+            None, {"source": {"type": "object",
+                              "data": Toolpath(toolpath_path=path, toolpath_filters=filters)}},
+            add_to_collection=False)
+        formatter = pycam.workspace.data_models.Formatter({"type": "toolpath"})
+        self.assertTrue(formatter.write_data([source], open(self.filename, "w")))
+        loaded = read_toolpath(self.filename)
+        self.assertEqual(tuple(loaded.path), tuple(path))
+        self.assertEqual([tp_filter.settings for tp_filter in loaded.filters],
+                         [tp_filter.settings for tp_filter in filters])
+        # only a single toolpath can be stored
+        with open(self.filename, "w") as target:
+            self.assertRaises(InvalidDataError, formatter.write_data, [source, source], target)
+        # the binary data cannot be written to a target without a binary buffer
+        self.assertRaises(InvalidDataError, formatter.write_data, [source], io.StringIO())
+        formatter.validate()
@@ -0,0 +1,286 @@
+"""
+This file is part of PyCAM.
+
+PyCAM is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+PyCAM is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import array
+import collections.abc
+from enum import Enum
+import importlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+from pycam import VERSION
+from pycam.errors import InvalidDataError, LoadFileError
+from pycam.Toolpath import MOVE_STRAIGHT, MOVE_STRAIGHT_RAPID, MOVE_ARC, MOVE_SAFETY, \
+        MACHINE_SETTING, COMMENT, ArcPlane, Toolpath
+import pycam.Toolpath.Filters
+from pycam.Toolpath.Steps import ArcClass, CommentClass, MachineSettingClass, MoveClass
+import pycam.Utils.log
+
+
+_log = pycam.Utils.log.get_logger()
+
+
+FILE_EXTENSION = "pctp"
+FORMAT_VERSION = 1
+MAGIC = b"PYCAMTP\x00"
+# magic, format version, length of the json header
+PREAMBLE = struct.Struct("<8sIQ")
+# all columns start at a multiple of this size
+ALIGNMENT = 8
+# the arc plane is stored as an index within this list
+ARC_PLANES = list(ArcPlane)
+NO_EXTRA = -1
+
+# The file format consists of a short preamble, a json header and the columns of the steps.
+# The header describes the tool, the toolpath filters, the columns (offset, type code and length)
+# and the steps with non-numerical data (machine settings and comments).  Every step of the
+# toolpath has an entry in each of the following columns:
+#   * actions: the type of the step
+#   * positions: three coordinates (NaN for steps without a position)
+#   * extras: index of the related item in the "arc" columns (for arcs) or in the list of
+#     records (machine settings and comments) - otherwise -1
+# The "arc_centers" (three coordinates - NaN for arcs without a center) and "arc_flags" (clockwise
+# flag and index of the arc plane) columns contain one entry per arc.
+COLUMNS = (("actions", "B"), ("positions", "d"), ("extras", "q"), ("arc_centers", "d"),
+           ("arc_flags", "B"))
+
+
+def _encode_value(value):
+    """ convert a value (e.g. a setting of a filter) into a json-compatible structure """
+    if (value is None) or isinstance(value, (bool, int, float, str)):
+        return value
+    elif isinstance(value, Enum):
+        enum_class = type(value)
+        return {"enum": "{}.{}".format(enum_class.__module__, enum_class.__qualname__),
+                "value": value.value}
+    elif isinstance(value, tuple):
+        return {"tuple": [_encode_value(item) for item in value]}
+    elif isinstance(value, list):
+        return [_encode_value(item) for item in value]
+    elif isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {"dict": {key: _encode_value(item) for key, item in value.items()}}
+    else:
+        raise InvalidDataError("Unsupported value for a toolpath file: {}".format(value))
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    elif not isinstance(value, dict):
+        return value
+    elif "tuple" in value:
+        return tuple(_decode_value(item) for item in value["tuple"])
+    elif "dict" in value:
+        return {key: _decode_value(item) for key, item in value["dict"].items()}
+    elif "enum" in value:
+        module_name, class_name = value["enum"].rsplit(".", 1)
+        # only accept enums defined by pycam
+        if module_name.split(".")[0] != "pycam":
+            raise LoadFileError("Invalid enum in toolpath file: {}".format(value["enum"]))
+        try:
+            enum_class = getattr(importlib.import_module(module_name), class_name)
+            return enum_class(value["value"])
+        except (AttributeError, ImportError, ValueError) as exc:
+            raise LoadFileError("Invalid enum in toolpath file ({}): {}"
+                                .format(value["enum"], exc))
+    else:
+        raise LoadFileError("Invalid value in toolpath file: {}".format(value))
+
+
+def _encode_filter(tp_filter):
+    try:
+        settings = _encode_value(dict(tp_filter.settings))
+    except InvalidDataError as exc:
+        raise InvalidDataError("Failed to store the toolpath filter '{}': {}"
+                               .format(type(tp_filter).__name__, exc))
+    return {"name": type(tp_filter).__name__, "settings": settings}
+
+
+def _decode_filter(data):
+    filter_class = getattr(pycam.Toolpath.Filters, data["name"], None)
+    if not (isinstance(filter_class, type)
+            and issubclass(filter_class, pycam.Toolpath.Filters.BaseFilter)):
+        raise LoadFileError("Unknown toolpath filter in toolpath file: {}".format(data["name"]))
+    return filter_class(**_decode_value(data["settings"]))
+
+
+def _get_padding(offset):
+    return -offset % ALIGNMENT
+
+
+def write_toolpath(toolpath, stream):
+    """ store a toolpath (moves, filters and tool) in a binary stream
+
+    The tool is stored as a dictionary (e.g. the data of a "pycam.workspace.data_models.Tool").
+    """
+    columns = {name: array.array(type_code) for name, type_code in COLUMNS}
+    records = []
+    no_position = (math.nan, math.nan, math.nan)
+    for step in toolpath.path:
+        extra = NO_EXTRA
+        if step.action in (MOVE_STRAIGHT, MOVE_STRAIGHT_RAPID, MOVE_ARC):
+            position = step.position
+        else:
+            position = no_position
+        if step.action == MOVE_ARC:
+            extra = len(columns["arc_flags"])
+            columns["arc_centers"].extend(no_position if step.center is None else step.center)
+            columns["arc_flags"].append(int(bool(step.clockwise))
+                                        | (ARC_PLANES.index(step.plane) << 1))
+        elif step.action == MACHINE_SETTING:
+            extra = len(records)
+            records.append({"key": step.key, "value": _encode_value(step.value)})
+        elif step.action == COMMENT:
+            extra = len(records)
+            records.append({"text": step.text})
+        elif step.action not in (MOVE_STRAIGHT, MOVE_STRAIGHT_RAPID, MOVE_SAFETY):
+            raise InvalidDataError("Unsupported toolpath step: {}".format(step))
+        columns["actions"].append(step.action)
+        columns["positions"].extend(position)
+        columns["extras"].append(extra)
+    tool = toolpath.tool
+    if hasattr(tool, "get_dict"):
+        tool = tool.get_dict()
+    header = {"created_by": "pycam", "pycam_version": VERSION, "byteorder": sys.byteorder,
+              "count": len(columns["actions"]), "tool": _encode_value(tool),
+              "filters": [_encode_filter(tp_filter) for tp_filter in toolpath.filters],
+              "records": records, "columns": {}}
+    # the offsets of the columns are relative to the end of the header
+    offset = 0
+    for name, type_code in COLUMNS:
+        header["columns"][name] = {"offset": offset, "type": type_code,
+                                   "length": len(columns[name])}
+        size = len(columns[name]) * columns[name].itemsize
+        offset += size + _get_padding(size)
+    header_data = json.dumps(header).encode("utf-8")
+    header_data += b" " * _get_padding(PREAMBLE.size + len(header_data))
+    stream.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_data)))
+    stream.write(header_data)
+    for name, _ in COLUMNS:
+        column_data = columns[name].tobytes()
+        stream.write(column_data)
+        stream.write(b"\x00" * _get_padding(len(column_data)))
+
+
+class MappedToolpathSteps(collections.abc.Sequence):
+    """ read-only sequence of the steps stored in a memory-mapped toolpath file
+
+    The steps are created on demand.  Thus opening a huge toolpath is cheap.
+    """
+
+    def __init__(self, filename, columns, records, file_stat):
+        self._filename = filename
+        self._columns = columns
+        self._records = records
+        self._file_stat = file_stat
+
+    def __len__(self):
+        return len(self._columns["actions"])
+
+    def __hash__(self):
+        return hash((self._filename, self._file_stat))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._get_step(item) for item in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("toolpath step index out of range")
+        return self._get_step(index)
+
+    def __iter__(self):
+        get_step = self._get_step
+        for index in range(len(self)):
+            yield get_step(index)
+
+    def _get_step(self, index):
+        action = self._columns["actions"][index]
+        if action in (MOVE_STRAIGHT, MOVE_STRAIGHT_RAPID):
+            return MoveClass(action, tuple(self._columns["positions"][3 * index:3 * index + 3]))
+        elif action == MOVE_SAFETY:
+            return MoveClass(action, None)
+        extra = self._columns["extras"][index]
+        if action == MOVE_ARC:
+            center = tuple(self._columns["arc_centers"][3 * extra:3 * extra + 3])
+            if math.isnan(center[0]):
+                center = None
+            flags = self._columns["arc_flags"][extra]
+            return ArcClass(action, tuple(self._columns["positions"][3 * index:3 * index + 3]),
+                            center, bool(flags & 1), ARC_PLANES[flags >> 1])
+        elif action == MACHINE_SETTING:
+            record = self._records[extra]
+            return MachineSettingClass(action, record["key"], record["value"])
+        else:
+            return CommentClass(action, self._records[extra]["text"])
+
+
+def read_toolpath(filename):
+    """ load a toolpath from a file
+
+    The steps are read from a memory map of the file (see "MappedToolpathSteps").  The tool of
+    the returned toolpath is a dictionary (or None).
+    """
+    try:
+        with open(filename, "rb") as source:
+            file_stat = os.fstat(source.fileno())
+            if file_stat.st_size < PREAMBLE.size:
+                raise LoadFileError("Invalid toolpath file ({}): file is too short"
+                                    .format(filename))
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError as exc:
+        raise LoadFileError("Failed to read toolpath file ({}): {}".format(filename, exc))
+    magic, version, header_length = PREAMBLE.unpack_from(mapped)
+    if magic != MAGIC:
+        raise LoadFileError("Invalid toolpath file ({}): unknown format".format(filename))
+    if version > FORMAT_VERSION:
+        raise LoadFileError("Unsupported version of toolpath file ({}): {} (expected: {})"
+                            .format(filename, version, FORMAT_VERSION))
+    data_start = PREAMBLE.size + header_length
+    try:
+        header = json.loads(mapped[PREAMBLE.size:data_start].decode("utf-8"))
+    except ValueError as exc:
+        raise LoadFileError("Invalid header of toolpath file ({}): {}".format(filename, exc))
+    view = memoryview(mapped)
+    columns = {}
+    for name, type_code in COLUMNS:
+        column = header["columns"][name]
+        size = column["length"] * struct.calcsize(type_code)
+        start = data_start + column["offset"]
+        if start + size > len(mapped):
+            raise LoadFileError("Invalid toolpath file ({}): file is truncated".format(filename))
+        columns[name] = view[start:start + size].cast(type_code)
+        if header["byteorder"] != sys.byteorder:
+            # a memory map is not possible - convert a copy of the data
+            swapped = array.array(type_code, columns[name])
+            swapped.byteswap()
+            columns[name] = swapped
+    records = []
+    for record in header["records"]:
+        if "key" in record:
+            record = {"key": record["key"], "value": _decode_value(record["value"])}
+        records.append(record)
+    steps = MappedToolpathSteps(os.path.abspath(filename), columns, records,
+                                (file_stat.st_size, file_stat.st_mtime))
+    _log.info("Loaded toolpath with %d steps from %s", len(steps), filename)
+    return Toolpath(toolpath_path=steps,
+                    toolpath_filters=[_decode_filter(item) for item in header["filters"]],
+                    tool=_decode_value(header["tool"]))
@@ -20,11 +20,15 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 
 import collections
 import decimal
+import math
 
 from pycam.Geometry import epsilon
 from pycam.Geometry.Line import Line
+from pycam.Geometry.PathOrder import get_optimized_order
 from pycam.Geometry.PointUtils import padd, psub, pmul, pdist, pnear, ptransform_by_matrix
-from pycam.Toolpath import MOVE_SAFETY, MOVES_LIST, MACHINE_SETTING
+from pycam.PathGenerators import get_free_paths_triangles
+from pycam.Toolpath import (MOVE_ARC, MOVE_SAFETY, MOVE_STRAIGHT, MOVES_LIST, MACHINE_SETTING,
+                            ARC_PLANE_AXES, ArcPlane, get_arc_position, get_move_length)
 import pycam.Toolpath.Steps as ToolpathSteps
 import pycam.Utils.log
 
@@ -72,6 +76,19 @@ def get_filtered_moves(moves, filters):
     return moves
 
 
+def get_filtered_moves_stream(moves, filters):
+    """ apply the filters to an iterable of steps and return an iterator of the resulting steps
+
+    Steps are processed one after another as long as all filters support streaming.
+    """
+    filters = list(filters)
+    filters.sort()
+    moves = iter(moves)
+    for one_filter in filters:
+        moves = one_filter.filter_stream(moves)
+    return moves
+
+
 class BaseFilter:
 
     PARAMS = []
@@ -127,16 +144,36 @@ class BaseFilter:
         raise NotImplementedError(("The filter class %s failed to implement the 'filter_toolpath' "
                                    "method") % str(type(self)))
 
+    def filter_stream(self, toolpath):
+        """ iterate the filtered steps of a toolpath given as an iterable of steps
+
+        This default implementation needs to collect the complete toolpath.
+        """
+        return iter(self.filter_toolpath(list(toolpath)))
 
-class SafetyHeight(BaseFilter):
+
+class BaseStreamFilter(BaseFilter):
+    """ base class for filters processing one step after another
+
+    Sub-classes implement the generator method "filter_stream".
+    """
+
+    def filter_toolpath(self, toolpath):
+        return list(self.filter_stream(toolpath))
+
+    def filter_stream(self, toolpath):
+        raise NotImplementedError(("The filter class %s failed to implement the 'filter_stream' "
+                                   "method") % str(type(self)))
+
+
+class SafetyHeight(BaseStreamFilter):
 
     PARAMS = ("safety_height", )
     WEIGHT = 80
 
-    def filter_toolpath(self, toolpath):
+    def filter_stream(self, toolpath):
         last_pos = None
         max_height = None
-        new_path = []
         safety_pending = False
         get_safe = lambda pos: tuple((pos[0], pos[1], self.settings["safety_height"]))
         for step in toolpath:
@@ -149,7 +186,7 @@ class SafetyHeight(BaseFilter):
                 if not last_pos:
                     # there was a safety move (or no move at all) before
                     # -> move sideways
-                    new_path.append(ToolpathSteps.MoveStraightRapid(get_safe(new_pos)))
+                    yield ToolpathSteps.MoveStraightRapid(get_safe(new_pos))
                 elif safety_pending:
                     safety_pending = False
                     if pnear(last_pos, new_pos, axes=(0, 1)):
@@ -157,39 +194,42 @@ class SafetyHeight(BaseFilter):
                         pass
                     else:
                         # go up, sideways and down
-                        new_path.append(ToolpathSteps.MoveStraightRapid(get_safe(last_pos)))
-                        new_path.append(ToolpathSteps.MoveStraightRapid(get_safe(new_pos)))
+                        yield ToolpathSteps.MoveStraightRapid(get_safe(last_pos))
+                        yield ToolpathSteps.MoveStraightRapid(get_safe(new_pos))
                 else:
                     # we are in the middle of usual moves -> keep going
                     pass
-                new_path.append(step)
+                yield step
                 last_pos = new_pos
             else:
                 # unknown move -> keep it
-                new_path.append(step)
+                yield step
         # process pending safety moves
         if safety_pending and last_pos:
-            new_path.append(ToolpathSteps.MoveStraightRapid(get_safe(last_pos)))
-        if max_height > self.settings["safety_height"]:
+            yield ToolpathSteps.MoveStraightRapid(get_safe(last_pos))
+        if (max_height is not None) and (max_height > self.settings["safety_height"]):
             _log.warn("Toolpath exceeds safety height: %f => %f",
                       max_height, self.settings["safety_height"])
-        return new_path
 
 
-class MachineSetting(BaseFilter):
+class MachineSetting(BaseStreamFilter):
 
     PARAMS = ("key", "value")
     WEIGHT = 20
 
-    def filter_toolpath(self, toolpath):
-        result = []
-        # move all previous machine settings
-        while toolpath and toolpath[0].action == MACHINE_SETTING:
-            result.append(toolpath.pop(0))
-        # add the new setting
-        for key, value in self._get_settings():
-            result.append(ToolpathSteps.MachineSetting(key, value))
-        return result + toolpath
+    def filter_stream(self, toolpath):
+        added = False
+        for step in toolpath:
+            # add the new setting after all previous machine settings
+            if not added and (step.action != MACHINE_SETTING):
+                yield from self._get_setting_steps()
+                added = True
+            yield step
+        if not added:
+            yield from self._get_setting_steps()
+
+    def _get_setting_steps(self):
+        return [ToolpathSteps.MachineSetting(key, value) for key, value in self._get_settings()]
 
     def _get_settings(self):
         return [(self.settings["key"], self.settings["value"])]
@@ -214,107 +254,104 @@ class CornerStyle(MachineSetting):
                                  self.settings["naive_tolerance"])
 
 
-class SelectTool(BaseFilter):
+class SelectTool(BaseStreamFilter):
 
     PARAMS = ("tool_id", )
     WEIGHT = 35
 
-    def filter_toolpath(self, toolpath):
-        index = 0
-        # skip all non-moves
-        while (index < len(toolpath)) and (toolpath[index][0] not in MOVES_LIST):
-            index += 1
-        toolpath.insert(index, ToolpathSteps.MachineSetting("select_tool",
-                                                            self.settings["tool_id"]))
-        return toolpath
+    def filter_stream(self, toolpath):
+        selection = ToolpathSteps.MachineSetting("select_tool", self.settings["tool_id"])
+        added = False
+        for step in toolpath:
+            # add the tool selection before the first move
+            if not added and (step.action in MOVES_LIST):
+                yield selection
+                added = True
+            yield step
+        if not added:
+            yield selection
 
 
-class TriggerSpindle(BaseFilter):
+class TriggerSpindle(BaseStreamFilter):
     """ control the spindle spin for each tool selection
 
     A spin-up command is added after each tool selection.
     A spin-down command is added before each tool selection and after the last move.
-    If no tool selection is found, then single spin-up and spin-down commands are added before the
-    first move and after the last move.
+    If no tool selection is found before the first move, then a spin-up command is added before
+    the first move.
     """
 
     PARAMS = ("delay", )
     WEIGHT = 36
 
-    def filter_toolpath(self, toolpath):
-        def spin_up(path, index):
-            path.insert(index, ToolpathSteps.MachineSetting("spindle_enabled", True))
-            if self.settings["delay"]:
-                path.insert(index + 1, ToolpathSteps.MachineSetting("delay",
-                                                                    self.settings["delay"]))
-
-        def spin_down(path, index):
-            path.insert(index, ToolpathSteps.MachineSetting("spindle_enabled", False))
-
-        # find all positions of "select_tool"
-        tool_changes = [index for index, step in enumerate(toolpath)
-                        if (step.action == MACHINE_SETTING) and (step.key == "select_tool")]
-        if tool_changes:
-            tool_changes.reverse()
-            for index in tool_changes:
-                spin_up(toolpath, index + 1)
-                if index > 0:
-                    # add a "disable"
-                    spin_down(toolpath, index)
-        else:
-            # add a single spin-up before the first move
-            for index, step in enumerate(toolpath):
-                if step.action in MOVES_LIST:
-                    spin_up(toolpath, index)
-                    break
+    def filter_stream(self, toolpath):
+        spin_up = [ToolpathSteps.MachineSetting("spindle_enabled", True)]
+        if self.settings["delay"]:
+            spin_up.append(ToolpathSteps.MachineSetting("delay", self.settings["delay"]))
+        spin_down = ToolpathSteps.MachineSetting("spindle_enabled", False)
+        is_first_step = True
+        tool_selected = False
+        move_found = False
+        # the steps following the latest move are delayed: the final spin-down precedes them
+        pending = []
+        for step in toolpath:
+            if step.action in MOVES_LIST:
+                if not move_found and not tool_selected:
+                    yield from spin_up
+                move_found = True
+                yield from pending
+                pending = []
+                yield step
+            else:
+                new_steps = [step]
+                if (step.action == MACHINE_SETTING) and (step.key == "select_tool"):
+                    if not is_first_step:
+                        new_steps.insert(0, spin_down)
+                    new_steps.extend(spin_up)
+                    tool_selected = True
+                if move_found:
+                    pending.extend(new_steps)
+                else:
+                    yield from new_steps
+            is_first_step = False
         # add "stop spindle" just after the last move
-        index = len(toolpath) - 1
-        while (toolpath[index].action not in MOVES_LIST) and (index > 0):
-            index -= 1
-        if toolpath[index].action in MOVES_LIST:
-            spin_down(toolpath, index + 1)
-        return toolpath
+        if move_found:
+            yield spin_down
+        yield from pending
 
 
-class SpindleSpeed(BaseFilter):
+class SpindleSpeed(BaseStreamFilter):
     """ add a spindle speed command after each tool selection
 
-    If no tool selection is found, then a single spindle speed command is inserted before the first
-    move.
+    If no tool selection is found before the first move, then a spindle speed command is inserted
+    before the first move.
     """
 
     PARAMS = ("speed", )
     WEIGHT = 37
 
-    def filter_toolpath(self, toolpath):
-        def set_speed(path, index):
-            path.insert(index, ToolpathSteps.MachineSetting("spindle_speed",
-                                                            self.settings["speed"]))
-
-        # find all positions of "select_tool"
-        tool_changes = [index for index, step in enumerate(toolpath)
-                        if (step.action == MACHINE_SETTING) and (step.key == "select_tool")]
-        if tool_changes:
-            tool_changes.reverse()
-            for index in tool_changes:
-                set_speed(toolpath, index + 1)
-        else:
-            # no tool selections: add a single spindle speed command before the first move
-            for index, step in enumerate(toolpath):
-                if step.action in MOVES_LIST:
-                    set_speed(toolpath, index)
-                    break
-        return toolpath
+    def filter_stream(self, toolpath):
+        speed_step = ToolpathSteps.MachineSetting("spindle_speed", self.settings["speed"])
+        tool_selected = False
+        move_found = False
+        for step in toolpath:
+            if (step.action in MOVES_LIST) and not move_found:
+                move_found = True
+                if not tool_selected:
+                    yield speed_step
+            yield step
+            if (step.action == MACHINE_SETTING) and (step.key == "select_tool"):
+                yield speed_step
+                tool_selected = True
 
 
-class PlungeFeedrate(BaseFilter):
+class PlungeFeedrate(BaseStreamFilter):
 
     PARAMS = ("plunge_feedrate", )
     # must be greater than the weight of the SafetyHeight filter
     WEIGHT = 82
 
-    def filter_toolpath(self, toolpath):
-        new_path = []
+    def filter_stream(self, toolpath):
         last_pos = None
         original_feedrate = None
         current_feedrate = None
@@ -335,29 +372,26 @@ class PlungeFeedrate(BaseFilter):
                     max_feedrate = min(original_feedrate, max_feedrate)
                     if current_feedrate != max_feedrate:
                         # we are too slow or too fast
-                        new_path.append(ToolpathSteps.MachineSetting("feedrate", max_feedrate))
+                        yield ToolpathSteps.MachineSetting("feedrate", max_feedrate)
                         current_feedrate = max_feedrate
                 else:
                     # we do not move down
                     if current_feedrate != original_feedrate:
                         # switch back to the maximum feedrate
-                        new_path.append(ToolpathSteps.MachineSetting("feedrate",
-                                                                     original_feedrate))
+                        yield ToolpathSteps.MachineSetting("feedrate", original_feedrate)
                         current_feedrate = original_feedrate
                 last_pos = step.position
             else:
                 pass
-            new_path.append(step)
-        return new_path
+            yield step
 
 
-class Crop(BaseFilter):
+class Crop(BaseStreamFilter):
 
     PARAMS = ("polygons", )
     WEIGHT = 90
 
-    def filter_toolpath(self, toolpath):
-        new_path = []
+    def filter_stream(self, toolpath):
         last_pos = None
         optional_moves = []
         for step in toolpath:
@@ -371,16 +405,14 @@ class Crop(BaseFilter):
                     # turn these lines into moves
                     for line in inner_lines:
                         if pdist(line.p1, last_pos) > epsilon:
-                            new_path.append(ToolpathSteps.MoveSafety())
-                            new_path.append(
-                                ToolpathSteps.get_step_class_by_action(step.action)(line.p1))
+                            yield ToolpathSteps.MoveSafety()
+                            yield ToolpathSteps.get_step_class_by_action(step.action)(line.p1)
                         else:
                             # we continue where we left
                             if optional_moves:
-                                new_path.extend(optional_moves)
+                                yield from optional_moves
                                 optional_moves = []
-                        new_path.append(
-                            ToolpathSteps.get_step_class_by_action(step.action)(line.p2))
+                        yield ToolpathSteps.get_step_class_by_action(step.action)(line.p2)
                         last_pos = line.p2
                     optional_moves = []
                     # finish the line by moving to its end (if necessary)
@@ -391,29 +423,126 @@ class Crop(BaseFilter):
             elif step.action == MOVE_SAFETY:
                 optional_moves = []
             else:
-                new_path.append(step)
+                yield step
+
+
+class RapidMoveOrder(BaseFilter):
+    """ reorder the cutting segments of a toolpath in order to reduce the rapid moves
+
+    A segment is a sequence of moves between two safety moves.  Consecutive segments with the
+    same lowest height form a layer.  Only the segments within a layer are reordered - thus the
+    order of the layers is kept.  Segments are never reversed (this would change the milling
+    style).  Segments containing other steps (e.g. machine settings) are kept in place.
+    The safety move between two segments is replaced with a direct move, if both positions are
+    at the same height, their distance is below "max_link_distance" and the straight
+    connection does not collide with the models.
+    """
+
+    PARAMS = ("models", "cutter", "max_link_distance")
+    WEIGHT = 15
+
+    def filter_toolpath(self, toolpath):
+        if not toolpath:
+            return toolpath
+        segments = []
+        current_segment = []
+        for step in toolpath:
+            if step.action == MOVE_SAFETY:
+                if current_segment:
+                    segments.append(current_segment)
+                    current_segment = []
+            else:
+                current_segment.append(step)
+        if current_segment:
+            segments.append(current_segment)
+        ordered_segments = []
+        layer = []
+        layer_height = None
+        for segment in segments:
+            if self._is_movable(segment):
+                height = min(step.position[2] for step in segment)
+                if layer and (abs(height - layer_height) > epsilon):
+                    ordered_segments.extend(self._get_ordered_layer(layer, ordered_segments))
+                    layer = []
+                layer_height = height
+                layer.append(segment)
+            else:
+                ordered_segments.extend(self._get_ordered_layer(layer, ordered_segments))
+                layer = []
+                ordered_segments.append(segment)
+        ordered_segments.extend(self._get_ordered_layer(layer, ordered_segments))
+        # assemble the new toolpath
+        new_path = []
+        if toolpath[0].action == MOVE_SAFETY:
+            new_path.append(ToolpathSteps.MoveSafety())
+        last_position = None
+        for index, segment in enumerate(ordered_segments):
+            if (index > 0) and not self._can_link_directly(last_position, segment):
+                new_path.append(ToolpathSteps.MoveSafety())
+            new_path.extend(segment)
+            last_position = self._get_end_position(segment, last_position)
+        if toolpath[-1].action == MOVE_SAFETY:
+            new_path.append(ToolpathSteps.MoveSafety())
         return new_path
 
+    @staticmethod
+    def _is_movable(segment):
+        # an arc at the start of a segment depends on the previous position
+        return (segment[0].action != MOVE_ARC) and all(step.action in MOVES_LIST
+                                                       for step in segment)
 
-class TransformPosition(BaseFilter):
+    @staticmethod
+    def _get_end_position(segment, default=None):
+        for step in reversed(segment):
+            if step.action in MOVES_LIST:
+                return step.position
+        return default
+
+    def _get_ordered_layer(self, segments, previous_segments):
+        if len(segments) < 2:
+            return segments
+        start_position = None
+        for segment in reversed(previous_segments):
+            start_position = self._get_end_position(segment)
+            if start_position is not None:
+                break
+        starts = [segment[0].position for segment in segments]
+        ends = [segment[-1].position for segment in segments]
+        order = get_optimized_order(starts, ends, start_position=start_position)
+        return [segments[index] for index in order]
+
+    def _can_link_directly(self, position, segment):
+        if (position is None) or (segment[0].action != MOVE_STRAIGHT):
+            return False
+        target = segment[0].position
+        if abs(target[2] - position[2]) > epsilon:
+            return False
+        if math.hypot(target[0] - position[0],
+                      target[1] - position[1]) > self.settings["max_link_distance"]:
+            return False
+        free_path = get_free_paths_triangles(self.settings["models"], self.settings["cutter"],
+                                             position, target)
+        return ((len(free_path) == 2) and pnear(free_path[0], position)
+                and pnear(free_path[1], target))
+
+
+class TransformPosition(BaseStreamFilter):
     """ shift or rotate a toolpath based on a given 3x3 or 3x4 matrix
     """
 
     PARAMS = ("matrix", )
     WEIGHT = 85
 
-    def filter_toolpath(self, toolpath):
-        new_path = []
+    def filter_stream(self, toolpath):
         for step in toolpath:
             if step.action in MOVES_LIST:
                 new_pos = ptransform_by_matrix(step.position, self.settings["matrix"])
-                new_path.append(ToolpathSteps.get_step_class_by_action(step.action)(new_pos))
+                yield ToolpathSteps.get_step_class_by_action(step.action)(new_pos)
             else:
-                new_path.append(step)
-        return new_path
+                yield step
 
 
-class TimeLimit(BaseFilter):
+class TimeLimit(BaseStreamFilter):
     """ This filter is used for the toolpath simulation. It returns only a partial toolpath within
     a given duration limit.
     """
@@ -421,52 +550,208 @@ class TimeLimit(BaseFilter):
     PARAMS = ("timelimit", )
     WEIGHT = 100
 
-    def filter_toolpath(self, toolpath):
+    def filter_stream(self, toolpath):
         feedrate = min_feedrate = 1
-        new_path = []
         last_pos = None
         limit = self.settings["timelimit"]
         duration = 0
         for step in toolpath:
             if step.action in MOVES_LIST:
                 if last_pos:
-                    new_distance = pdist(step.position, last_pos)
+                    new_distance = get_move_length(last_pos, step)
                     new_duration = new_distance / max(feedrate, min_feedrate)
                     if (new_duration > 0) and (duration + new_duration > limit):
                         partial = (limit - duration) / new_duration
-                        destination = padd(last_pos, pmul(psub(step.position, last_pos), partial))
+                        if (step.action == MOVE_ARC) and (step.center is not None):
+                            destination = get_arc_position(last_pos, step, partial)
+                        else:
+                            destination = padd(last_pos,
+                                               pmul(psub(step.position, last_pos), partial))
                         duration = limit
                     else:
                         destination = step.position
                         duration += new_duration
                 else:
                     destination = step.position
-                new_path.append(ToolpathSteps.get_step_class_by_action(step.action)(destination))
+                if step.action == MOVE_ARC:
+                    yield step._replace(position=destination)
+                else:
+                    yield ToolpathSteps.get_step_class_by_action(step.action)(destination)
                 last_pos = step.position
             if (step.action == MACHINE_SETTING) and (step.key == "feedrate"):
                 feedrate = step.value
             if duration >= limit:
                 break
-        return new_path
 
 
-class MovesOnly(BaseFilter):
+class MovesOnly(BaseStreamFilter):
     """ Use this filter for checking if a given toolpath is empty/useless
     (only machine settings, safety moves, ...).
     """
 
     WEIGHT = 95
 
-    def filter_toolpath(self, toolpath):
-        return [step for step in toolpath if step.action in MOVES_LIST]
+    def filter_stream(self, toolpath):
+        return (step for step in toolpath if step.action in MOVES_LIST)
 
 
-class Copy(BaseFilter):
+class Copy(BaseStreamFilter):
 
     WEIGHT = 100
 
-    def filter_toolpath(self, toolpath):
-        return list(toolpath)
+    def filter_stream(self, toolpath):
+        return iter(toolpath)
+
+
+class ArcFitting(BaseStreamFilter):
+    """ replace sequences of straight moves following a circular arc with arc moves
+
+    Arcs are detected within the XY, XZ and YZ planes.  All positions of the original moves and
+    the straight lines between them deviate from the resulting arc by less than the given
+    tolerance.  Rapid moves are never combined.
+    """
+
+    PARAMS = ("tolerance", )
+    # must be greater than the weight of the SafetyHeight, PlungeFeedrate and Crop filters
+    WEIGHT = 92
+    # the minimum number of positions (including the start position) forming an arc
+    MIN_ARC_POSITIONS = 4
+    # stay clear of full circles - their start and end positions are ambiguous
+    MAX_ARC_ANGLE = 1.75 * math.pi
+    PLANES = (ArcPlane.XY, ArcPlane.XZ, ArcPlane.YZ)
+
+    def filter_stream(self, toolpath):
+        # the first item is the start position of the current sequence of straight moves
+        positions = []
+        for step in toolpath:
+            if step.action == MOVE_STRAIGHT:
+                if not positions:
+                    # an unknown start position: the first move cannot be part of an arc
+                    yield step
+                positions.append(tuple(step.position))
+                continue
+            yield from self._get_fitted_moves(positions)
+            yield step
+            if step.action in MOVES_LIST:
+                positions = [tuple(step.position)]
+            elif step.action == MOVE_SAFETY:
+                # the position is unknown after a safety move
+                positions = []
+            else:
+                # machine settings and comments do not change the position
+                positions = positions[-1:]
+        yield from self._get_fitted_moves(positions)
+
+    def _get_fitted_moves(self, positions):
+        """ turn the positions following the first one into straight moves and arcs """
+        result = []
+        index = 1
+        while index < len(positions):
+            arc_end, arc = self._get_longest_arc(positions, index - 1)
+            if arc is None:
+                result.append(ToolpathSteps.MoveStraight(positions[index]))
+                index += 1
+            else:
+                result.append(arc)
+                index = arc_end + 1
+        return result
+
+    def _get_longest_arc(self, positions, start):
+        """ find the longest arc starting at the given index of the positions
+
+        The number of positions covered by a valid arc is doubled until it fails.  Afterwards the
+        maximum length is determined via bisection.  Thus the effort is O(n*log(n)) for an arc
+        consisting of n positions.
+        @returns: the index of the last position of the arc and the arc move (or None)
+        """
+        first_end = start + self.MIN_ARC_POSITIONS - 1
+        if first_end >= len(positions):
+            return None, None
+        for plane in self.PLANES:
+            arc = self._get_arc(positions, start, first_end, plane)
+            if arc is not None:
+                break
+        else:
+            return None, None
+        good_end, good_arc = first_end, arc
+        bad_end = None
+        while good_end < len(positions) - 1:
+            end = min(start + 2 * (good_end - start), len(positions) - 1)
+            arc = self._get_arc(positions, start, end, plane)
+            if arc is None:
+                bad_end = end
+                break
+            good_end, good_arc = end, arc
+        if bad_end is not None:
+            while bad_end - good_end > 1:
+                end = (good_end + bad_end) // 2
+                arc = self._get_arc(positions, start, end, plane)
+                if arc is None:
+                    bad_end = end
+                else:
+                    good_end, good_arc = end, arc
+        return good_end, good_arc
+
+    def _get_arc(self, positions, start, end, plane):
+        """ try to represent the positions between "start" and "end" (inclusive) by one arc
+
+        @returns: an arc move or None (if the positions do not fit)
+        """
+        tolerance = self.settings["tolerance"]
+        axis1, axis2, normal = ARC_PLANE_AXES[plane]
+        level = positions[start][normal]
+        points = []
+        for position in positions[start:end + 1]:
+            if abs(position[normal] - level) > epsilon:
+                return None
+            points.append((position[axis1], position[axis2]))
+        center = _get_circle_center(points[0], points[(end - start) // 2], points[-1])
+        if center is None:
+            return None
+        radius = math.hypot(points[0][0] - center[0], points[0][1] - center[1])
+        # the maximum angle of a chord keeping its center within the tolerance
+        if tolerance >= radius:
+            return None
+        max_step_angle = 2 * math.acos(1 - tolerance / radius)
+        total_angle = 0
+        direction = None
+        last_vector = (points[0][0] - center[0], points[0][1] - center[1])
+        for point in points[1:]:
+            vector = (point[0] - center[0], point[1] - center[1])
+            if abs(math.hypot(*vector) - radius) > tolerance:
+                return None
+            step_angle = math.atan2(last_vector[0] * vector[1] - last_vector[1] * vector[0],
+                                    last_vector[0] * vector[0] + last_vector[1] * vector[1])
+            if direction is None:
+                direction = 1 if step_angle > 0 else -1
+            if (step_angle * direction <= 0) or (abs(step_angle) > max_step_angle):
+                # a reversal of direction, a duplicate position or a far-away point
+                return None
+            total_angle += abs(step_angle)
+            last_vector = vector
+        if total_angle > self.MAX_ARC_ANGLE:
+            return None
+        if radius * (1 - math.cos(total_angle / 2)) < tolerance:
+            # the arc is too flat: a straight line would represent it as well
+            return None
+        center_position = [None] * 3
+        center_position[axis1], center_position[axis2] = center
+        center_position[normal] = level
+        return ToolpathSteps.MoveArc(positions[end], center=tuple(center_position),
+                                     clockwise=(direction < 0), plane=plane)
+
+
+def _get_circle_center(p1, p2, p3):
+    """ calculate the center of the circle through three 2D points (None if they are colinear) """
+    ax, ay = p2[0] - p1[0], p2[1] - p1[1]
+    bx, by = p3[0] - p1[0], p3[1] - p1[1]
+    denominator = 2 * (ax * by - ay * bx)
+    if abs(denominator) < epsilon ** 2:
+        return None
+    a_sq = ax * ax + ay * ay
+    b_sq = bx * bx + by * by
+    return (p1[0] + (by * a_sq - ay * b_sq) / denominator,
+            p1[1] + (ax * b_sq - bx * a_sq) / denominator)
 
 
 def _get_num_of_significant_digits(number):
@@ -498,13 +783,13 @@ def _get_num_converter(step_width):
     return conv_func, format_string
 
 
-class StepWidth(BaseFilter):
+class StepWidth(BaseStreamFilter):
 
     PARAMS = ("step_width", )
     NUM_OF_AXES = 3
     WEIGHT = 60
 
-    def filter_toolpath(self, toolpath):
+    def filter_stream(self, toolpath):
         minimum_steps = []
         conv = []
         for key in "xyz":
@@ -512,7 +797,6 @@ class StepWidth(BaseFilter):
         for step_width in minimum_steps:
             conv.append(_get_num_converter(step_width)[0])
         last_pos = None
-        path = []
         for step in toolpath:
             if step.action in MOVES_LIST:
                 if last_pos:
@@ -541,11 +825,10 @@ class StepWidth(BaseFilter):
                 # conversion needs to move into the GCode output hook.
 #               destination = [a_conv(a_pos) for a_conv, a_pos in zip(conv, step.position)]
                 destination = real_target_position
-                path.append(ToolpathSteps.get_step_class_by_action(step.action)(destination))
+                yield ToolpathSteps.get_step_class_by_action(step.action)(destination)
                 # We store the real machine position (instead of the "wanted" position).
                 last_pos = real_target_position
             else:
                 # forget "last_pos" - we don't know what happened in between
                 last_pos = None
-                path.append(step)
-        return path
+                yield step
@@ -17,8 +17,10 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import collections
 import math
 import enum
+import threading
 
 from pycam.Geometry import epsilon, Point3D, Box3D
 from pycam.Geometry.Line import Line
@@ -27,10 +29,20 @@ from pycam.Geometry.PointUtils import padd, pcross, pmul, pnormalized, psub
 from pycam.Geometry.Polygon import PolygonSorter
 from pycam.Geometry.utils import get_angle_pi, get_points_of_arc
 import pycam.Utils.log
+from pycam.Utils.threading import run_in_parallel
 
 
 _log = pycam.Utils.log.get_logger()
 
+# the maximum number of offset polygons calculated for a single pocket
+POCKETING_LIMIT = 1000
+# the maximum number of pockets kept in the cache
+POCKETING_CACHE_SIZE = 1000
+
+# pockets (lists of offset polygons) by the geometry of their base polygon and the offset
+_pocketing_cache = collections.OrderedDict()
+_pocketing_cache_lock = threading.Lock()
+
 
 class GridDirection(enum.Enum):
     X = "x"
@@ -100,6 +112,27 @@ def resolve_multi_level_generator(generator, levels):
         return generator
 
 
+def get_restricted_grid(motion_grid, is_relevant_position):
+    """ remove the positions of a motion grid, that do not need to be visited
+
+    Every line of the grid is split into the sequences of consecutive relevant positions.
+    """
+    def get_restricted_layer(layer):
+        for line in layer:
+            part = []
+            for position in line:
+                if is_relevant_position(position):
+                    part.append(position)
+                elif part:
+                    yield part
+                    part = []
+            if part:
+                yield part
+
+    for layer in motion_grid:
+        yield get_restricted_layer(layer)
+
+
 def get_fixed_grid_line(start, end, line_pos, z, step_width=None, grid_direction=GridDirection.X):
     if step_width is None:
         # useful for PushCutter operations
@@ -535,7 +568,7 @@ def get_pocketing_polygons(polygons, offset, pocketing_type, callback=None):
         use_voronoi = False
     if use_voronoi:
         _log.debug("Using openvoronoi pocketing algorithm")
-        poly = pycam.Toolpath.OpenVoronoi.pocket_model(polygons, offset)
+        poly = pycam.Toolpath.OpenVoronoi.pocket_model(polygons, offset, callback=callback)
     else:
         _log.info("Failed to load openvoronoi library. Falling back to custom pocketing "
                   "algorithm.")
@@ -543,10 +576,25 @@ def get_pocketing_polygons(polygons, offset, pocketing_type, callback=None):
     return poly
 
 
+def _get_pocket_cache_key(polygon, offset):
+    """ the pocket of a polygon is defined by its geometry and the offset """
+    return (tuple(polygon.get_points()), polygon.is_closed, tuple(polygon.plane.n), offset)
+
+
+def _get_offset_polygons(args):
+    """ calculate the offset polygons of a single polygon
+
+    We need to use a global function here - otherwise it does not work with the multiprocessing
+    Pool.
+    @param args: tuple of the polygon and the offset
+    """
+    polygon, offset = args
+    return polygon.get_offset_polygons(offset)
+
+
 def get_pocketing_polygons_simple(polygons, offset, pocketing_type, callback=None):
     _log.debug("Calculating pocketing polygons: count=%d, offset=%d, pocketing=%s",
                len(polygons), offset, pocketing_type)
-    pocketing_limit = 1000
     base_polygons = []
     other_polygons = []
     if pocketing_type == PocketingType.HOLES:
@@ -580,32 +628,57 @@ def get_pocketing_polygons_simple(polygons, offset, pocketing_type, callback=Non
                 break
         else:
             base_filtered_polygons.append(candidate)
-    # start the pocketing for all remaining polygons
-    pocket_polygons = []
-    for index, base_polygon in enumerate(base_filtered_polygons):
-        _log.debug2("Pocketing Polygons: processing polygon %d/%d",
-                    index + 1, len(base_filtered_polygons))
-        pocket_polygons.append(base_polygon)
-        current_queue = [base_polygon]
-        next_queue = []
-        pocket_depth = 0
-        this_pocket_polygons = []
-        while current_queue and (pocket_depth < pocketing_limit):
-            if callback and callback():
-                return polygons
-            for poly in current_queue:
-                result = poly.get_offset_polygons(offset)
-                this_pocket_polygons.extend(result)
-                next_queue.extend(result)
-                pocket_depth += 1
-            current_queue = next_queue
-            next_queue = []
-        if pocket_depth < pocketing_limit:
-            # the result looks fine
-            pocket_polygons.extend(this_pocket_polygons)
-        else:
+    # take the pockets from the cache or prepare their calculation
+    cache_keys = [_get_pocket_cache_key(polygon, offset) for polygon in base_filtered_polygons]
+    pockets = []
+    queues = {}
+    pocket_depths = {}
+    with _pocketing_cache_lock:
+        for index, (base_polygon, cache_key) in enumerate(zip(base_filtered_polygons,
+                                                              cache_keys)):
+            if cache_key in _pocketing_cache:
+                _pocketing_cache.move_to_end(cache_key)
+                pockets.append(_pocketing_cache[cache_key])
+            else:
+                pockets.append([])
+                queues[index] = [base_polygon]
+                pocket_depths[index] = 0
+    _log.debug("Pocketing Polygons: calculating %d of %d pockets",
+               len(queues), len(base_filtered_polygons))
+    # All pockets are processed level by level.  The polygons of a level (from all pockets)
+    # are calculated in parallel.
+    while queues:
+        if callback and callback():
+            return polygons
+        jobs = [(index, poly) for index, queue in queues.items() for poly in queue]
+        next_queues = {index: [] for index in queues}
+        finished_count = 0
+        for (index, poly), result in zip(jobs, run_in_parallel(
+                _get_offset_polygons, [(poly, offset) for index, poly in jobs],
+                callback=callback)):
+            pockets[index].extend(result)
+            next_queues[index].extend(result)
+            finished_count += 1
+        if finished_count < len(jobs):
+            # we were interrupted
+            return polygons
+        for index, queue in queues.items():
+            pocket_depths[index] += len(queue)
+        queues = {index: queue for index, queue in next_queues.items()
+                  if queue and (pocket_depths[index] < POCKETING_LIMIT)}
+    for index, pocket_depth in pocket_depths.items():
+        if pocket_depth >= POCKETING_LIMIT:
             # probably there was a problem with the algorithm - throw away the result
             _log.warning("Pocketing Polygons: exceeded nesting limit - probably something went "
                          "wrong while processing a polygon. Skipping it.")
+            pockets[index] = []
+        with _pocketing_cache_lock:
+            _pocketing_cache[cache_keys[index]] = pockets[index]
+            while len(_pocketing_cache) > POCKETING_CACHE_SIZE:
+                _pocketing_cache.popitem(last=False)
+    pocket_polygons = []
+    for base_polygon, pocket in zip(base_filtered_polygons, pockets):
+        pocket_polygons.append(base_polygon)
+        pocket_polygons.extend(pocket)
     _log.debug("Pocketing Polygons: calculated %d polygons", len(pocket_polygons))
     return pocket_polygons
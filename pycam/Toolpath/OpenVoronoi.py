@@ -20,8 +20,10 @@ from pycam.Geometry import epsilon
 import pycam.Geometry.Model
 from pycam.Geometry.Line import Line
 import pycam.Geometry.Polygon
+from pycam.Geometry.RTree import RTree
 from pycam.Geometry.utils import get_points_of_arc
 import pycam.Utils.log
+from pycam.Utils.threading import run_in_parallel
 
 _log = pycam.Utils.log.get_logger()
 
@@ -46,55 +48,77 @@ def _add_connected_point_set_to_diagram(point_set, line_set, dia):
     for p in point_set:
         ovp = openvoronoi.Point(*p[:2])
         vpoints.append(dia.addVertexSite(ovp))
-    _log.info("all vertices added to openvoronoi!")
+    _log.debug("all vertices added to openvoronoi!")
     # now add all line-segments
     for segment in line_set:
         start_idx = vpoints[segment[0]]
         end_idx = vpoints[segment[1]]
         dia.addLineSite(start_idx, end_idx)
-    _log.info("all lines added to openvoronoi!")
+    _log.debug("all lines added to openvoronoi!")
 
 
-def _polygons_to_line_set(polygons):
+class _PointIndex:
+    """ collect unique 2D points - points closer than the tolerance are welded together
+
+    The points are stored in a grid of cells with the size of the tolerance.  Thus only the
+    neighbouring cells need to be searched for a close point.
+    """
+
+    def __init__(self, tolerance=epsilon):
+        self.tolerance = tolerance
+        self.points = []
+        self._cells = {}
+
+    def get_index(self, point):
+        """ return the index of the given point (or of the existing point close to it) """
+        cell_x = int(math.floor(point[0] / self.tolerance))
+        cell_y = int(math.floor(point[1] / self.tolerance))
+        for neighbour_x in (cell_x, cell_x - 1, cell_x + 1):
+            for neighbour_y in (cell_y, cell_y - 1, cell_y + 1):
+                for index in self._cells.get((neighbour_x, neighbour_y), ()):
+                    other = self.points[index]
+                    if math.hypot(other[0] - point[0], other[1] - point[1]) <= self.tolerance:
+                        return index
+        index = len(self.points)
+        self.points.append(point)
+        self._cells.setdefault((cell_x, cell_y), []).append(index)
+        return index
+
+
+def _polygons_to_line_set(polygons, tolerance=epsilon):
     # all points (unique!)
-    point_set = []
+    point_index = _PointIndex(tolerance)
     # all line-segments (indexes into the point_set array)
     line_set = []
-    previous_point_index = 0
     point_count = 0
     for polygon_index, polygon in enumerate(polygons):
-        _log.info("polygon #%d has %d vertices", polygon_index, len(polygon))
-        first_point = True
+        _log.debug("polygon #%d has %d vertices", polygon_index, len(polygon))
         poly_pts = polygon.get_points()
         # if the polygon is closed, repeat the first point at the end
         if polygon.is_closed and poly_pts:
             poly_pts.append(poly_pts[0])
+        previous_point_index = None
         for p in poly_pts:
             point_count += 1
-            if p not in point_set:
-                # this point is a new point we have not seen before
-                point_set.append(p)
-            current_point_index = point_set.index(p)
+            current_point_index = point_index.get_index(p)
             # on the first iteration we have no line-segment
-            if not first_point:
-                _log.info(" line from %s to %s", previous_point_index, current_point_index)
+            if (previous_point_index is not None) and \
+                    (previous_point_index != current_point_index):
                 line_set.append((previous_point_index, current_point_index))
-            else:
-                first_point = False
             previous_point_index = current_point_index
-    _log.info("point_count: %d", len(point_set))
-    _log.info("point_set size: %d", len(point_set))
-    _log.info("number of line-segments: %d", len(line_set))
-    _log.info("Point set: %s", str(point_set))
-    _log.info("Line set: %s", str(line_set))
+    point_set = point_index.points
+    _log.debug("point_count: %d", point_count)
+    _log.debug("point_set size: %d", len(point_set))
+    _log.debug("number of line-segments: %d", len(line_set))
     return point_set, line_set
 
 
 def _offset_loops_to_polygons(offset_loops):
     model = pycam.Geometry.Model.ContourModel()
-    before = None
     for n_loop, loop in enumerate(offset_loops):
         lines = []
+        # the first item of a loop is its start point
+        before = None
         _log.info("loop #%d has %d lines/arcs", n_loop, len(loop))
         for n_segment, item in enumerate(loop):
             point, radius = item[:2]
@@ -127,7 +151,58 @@ def _offset_loops_to_polygons(offset_loops):
     return model.get_polygons()
 
 
-def pocket_model(polygons, offset):
+def _get_independent_groups(polygons, offset):
+    """ split the polygons into groups, that do not influence the offset loops of each other
+
+    The offset loops of a group are within its bounding box (enlarged by the offset).  Polygons
+    with overlapping enlarged boxes are combined (transitively) into one group.  The groups are
+    sorted by the position of their first polygon.
+    """
+    distance = abs(offset)
+    boxes = [(poly.minx - distance, poly.miny - distance, poly.maxx + distance,
+              poly.maxy + distance) for poly in polygons]
+    tree = RTree((box, index) for index, box in enumerate(boxes))
+    group_ids = [None] * len(polygons)
+    groups = []
+    for index in range(len(polygons)):
+        if group_ids[index] is not None:
+            continue
+        group_ids[index] = len(groups)
+        members = [index]
+        queue = [index]
+        while queue:
+            for other in tree.get_overlapping(boxes[queue.pop()]):
+                if group_ids[other] is None:
+                    group_ids[other] = len(groups)
+                    members.append(other)
+                    queue.append(other)
+        groups.append([polygons[member] for member in sorted(members)])
+    return groups
+
+
+def _pocket_polygon_group(args):
+    """ calculate the offset loops for a group of polygons with a separate diagram
+
+    We need to use a global function here - otherwise it does not work with the multiprocessing
+    Pool.
+    @param args: tuple of the polygons, the offset and the radius of the diagram
+    """
+    polygons, offset, radius = args
+    bin_size = int(math.ceil(math.sqrt(sum([len(poly.get_points()) for poly in polygons]))))
+    _log.debug("bin_size: %f", bin_size)
+    dia = openvoronoi.VoronoiDiagram(radius, bin_size)
+    point_set, line_set = _polygons_to_line_set(polygons)
+    _add_connected_point_set_to_diagram(point_set, line_set, dia)
+    _log.debug("diagram complete")
+    _log.debug("diagram check: %s", str(dia.check()))
+    offset_dia = openvoronoi.Offset(dia.getGraph())
+    _log.debug("offset diagram created")
+    offset_loops = offset_dia.offset(offset)
+    _log.debug("got %d loops from openvoronoi", len(offset_loops))
+    return _offset_loops_to_polygons(offset_loops)
+
+
+def pocket_model(polygons, offset, callback=None):
     _log.info("number of polygons: %d", len(polygons))
     _log.info("offset distance: %f", offset)
     maxx = max([poly.maxx for poly in polygons])
@@ -136,18 +211,15 @@ def pocket_model(polygons, offset):
     miny = min([poly.miny for poly in polygons])
     radius = math.sqrt((maxx - minx) ** 2 + (maxy - miny) ** 2) / 1.8
     _log.info("Radius: %f", radius)
-    bin_size = int(math.ceil(math.sqrt(sum([len(poly.get_points()) for poly in polygons]))))
-    _log.info("bin_size: %f", bin_size)
-    dia = openvoronoi.VoronoiDiagram(radius, bin_size)
-    point_set, line_set = _polygons_to_line_set(polygons)
-    _add_connected_point_set_to_diagram(point_set, line_set, dia)
-    _log.info("diagram complete")
-    _log.info("diagram check: %s", str(dia.check()))
-    offset_dia = openvoronoi.Offset(dia.getGraph())
-    _log.info("offset diagram created")
-    offset_loops = offset_dia.offset(offset)
-    _log.info("got %d loops from openvoronoi", len(offset_loops))
-    return _offset_loops_to_polygons(offset_loops)
+    # independent groups of polygons are processed in parallel
+    groups = _get_independent_groups(polygons, offset)
+    _log.info("number of independent polygon groups: %d", len(groups))
+    result = []
+    for group_result in run_in_parallel(_pocket_polygon_group,
+                                        [(group, offset, radius) for group in groups],
+                                        callback=callback):
+        result.extend(group_result)
+    return result
 
 
 if __name__ == "__main__":
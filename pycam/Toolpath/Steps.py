@@ -20,7 +20,7 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 import collections
 
 from pycam.Toolpath import MOVE_STRAIGHT, MOVE_STRAIGHT_RAPID, MOVE_ARC, MOVE_SAFETY, \
-        MACHINE_SETTING, COMMENT
+        MACHINE_SETTING, COMMENT, ArcPlane
 
 
 def get_step_class_by_action(action):
@@ -35,13 +35,16 @@ def get_step_class_by_action(action):
 
 
 MoveClass = collections.namedtuple("Move", ("action", "position"))
+# "center" is the absolute position of the arc's center (its normal axis component is ignored)
+ArcClass = collections.namedtuple("Arc", ("action", "position", "center", "clockwise", "plane"))
 MachineSettingClass = collections.namedtuple("MachineSetting", ("action", "key", "value"))
 CommentClass = collections.namedtuple("Comment", ("action", "text"))
 
 
 MoveStraight = lambda position: MoveClass(MOVE_STRAIGHT, position)
 MoveStraightRapid = lambda position: MoveClass(MOVE_STRAIGHT_RAPID, position)
-MoveArc = lambda position: MoveClass(MOVE_ARC, position)
+MoveArc = lambda position, center=None, clockwise=False, plane=ArcPlane.XY: ArcClass(
+    MOVE_ARC, position, center, clockwise, plane)
 MoveSafety = lambda: MoveClass(MOVE_SAFETY, None)
 MachineSetting = lambda key, value: MachineSettingClass(MACHINE_SETTING, key, value)
 Comment = lambda text: CommentClass(COMMENT, text)
@@ -17,20 +17,25 @@ You should have received a copy of the GNU General Public License
 along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import bisect
+import collections.abc
 from enum import Enum
-from itertools import groupby
 import math
 import os
 
 try:
     import numpy
+except ImportError:
+    # required for visualization, only
+    numpy = None
+try:
     from OpenGL.arrays import vbo
 except ImportError:
-    # both modules are required for visualization, only
-    pass
+    # required for visualization, only
+    vbo = None
 
 from pycam.Geometry import epsilon, number, Box3D, DimensionalObject, Point3D
-from pycam.Geometry.PointUtils import padd, pcross, pdist, pmul, pnorm, pnormalized, psub
+from pycam.Geometry.PointUtils import padd, pdist, pmul, pnormalized, psub
 import pycam.Utils.log
 
 
@@ -48,6 +53,86 @@ class ToolpathPathMode(Enum):
     CORNER_STYLE_OPTIMIZE_TOLERANCE = "optimize_tolerance"
 
 
+class ArcPlane(Enum):
+    XY = "xy"
+    XZ = "xz"
+    YZ = "yz"
+
+
+# The axes (first, second, normal) of each arc plane form a right-handed system.  Thus a positive
+# rotation from the first axis to the second axis is counter-clockwise when viewed from the
+# positive end of the normal axis (as defined for G2/G3 in G17/G18/G19).
+ARC_PLANE_AXES = {ArcPlane.XY: (0, 1, 2),
+                  ArcPlane.XZ: (2, 0, 1),
+                  ArcPlane.YZ: (1, 2, 0)}
+
+
+def get_arc_angle(start, step):
+    """ calculate the signed sweep angle of an arc move
+
+    @value start: the position of the tool before the arc move
+    @value step: a MOVE_ARC step
+    @returns: the angle (radians) - positive for counter-clockwise arcs
+    """
+    axis1, axis2 = ARC_PLANE_AXES[step.plane][:2]
+    center = step.center
+    angle_start = math.atan2(start[axis2] - center[axis2], start[axis1] - center[axis1])
+    angle_end = math.atan2(step.position[axis2] - center[axis2],
+                           step.position[axis1] - center[axis1])
+    sweep = angle_end - angle_start
+    if step.clockwise:
+        while sweep >= 0:
+            sweep -= 2 * math.pi
+    else:
+        while sweep <= 0:
+            sweep += 2 * math.pi
+    return sweep
+
+
+def get_arc_position(start, step, fraction):
+    """ calculate a position along an arc move
+
+    The radius and the position along the normal axis of the arc plane are interpolated linearly
+    (in order to tolerate tiny differences between the start and end radius).
+    @value fraction: relative position along the arc (0..1)
+    """
+    axis1, axis2, normal = ARC_PLANE_AXES[step.plane]
+    center = step.center
+    radius_start = math.hypot(start[axis1] - center[axis1], start[axis2] - center[axis2])
+    radius_end = math.hypot(step.position[axis1] - center[axis1],
+                            step.position[axis2] - center[axis2])
+    radius = radius_start + fraction * (radius_end - radius_start)
+    angle = (math.atan2(start[axis2] - center[axis2], start[axis1] - center[axis1])
+             + fraction * get_arc_angle(start, step))
+    result = [None] * 3
+    result[axis1] = center[axis1] + radius * math.cos(angle)
+    result[axis2] = center[axis2] + radius * math.sin(angle)
+    result[normal] = start[normal] + fraction * (step.position[normal] - start[normal])
+    return tuple(result)
+
+
+def get_arc_positions(start, step, max_angle=math.pi / 18):
+    """ approximate an arc move by a list of positions (excluding the start position) """
+    count = max(1, int(math.ceil(abs(get_arc_angle(start, step)) / max_angle)))
+    positions = [get_arc_position(start, step, index / count) for index in range(1, count)]
+    positions.append(step.position)
+    return positions
+
+
+def get_move_length(start, step):
+    """ calculate the length of a move starting at the given position
+
+    Arc moves without a center are treated like straight moves.
+    """
+    if (step.action == MOVE_ARC) and (getattr(step, "center", None) is not None):
+        axis1, axis2, normal = ARC_PLANE_AXES[step.plane]
+        radius = math.hypot(start[axis1] - step.center[axis1], start[axis2] - step.center[axis2])
+        return math.hypot(radius * get_arc_angle(start, step),
+                          step.position[normal] - start[normal])
+    else:
+        return pdist(start, step.position)
+
+
 def _check_colinearity(p1, p2, p3):
     v1 = pnormalized(psub(p2, p1))
     v2 = pnormalized(psub(p3, p2))
@@ -77,6 +162,307 @@ def simplify_toolpath(path):
             index += 1
 
 
+# "indices" is None for plain lines (GL_LINES) - otherwise the buffers describe triangles
+OpenGLBuffer = collections.namedtuple("OpenGLBuffer",
+                                      ("vertices", "indices", "count", "is_rapid", "is_cone"))
+
+
+def get_move_segment_arrays(moves):
+    """ collect the straight segments of moves (arcs are approximated)
+
+    @returns: arrays of start and end positions (float32) and the "is rapid" flag of segments
+    """
+    positions = []
+    is_rapid = []
+    last_position = None
+    for step in moves:
+        if step.action not in MOVES_LIST:
+            continue
+        if last_position is not None:
+            if (step.action == MOVE_ARC) and (step.center is not None):
+                points = get_arc_positions(last_position, step)
+            else:
+                points = (step.position, )
+            positions.extend(points)
+            is_rapid.extend([step.action == MOVE_STRAIGHT_RAPID] * len(points))
+        else:
+            positions.append(step.position)
+        last_position = step.position
+    positions = numpy.array(positions, dtype=numpy.float32).reshape(-1, 3)
+    return positions[:-1], positions[1:], numpy.array(is_rapid, dtype=bool)
+
+
+def get_direction_cone_arrays(starts, ends, position=0.5, precision=12, size=0.1):
+    """ calculate the meshes of cones pointing along segments
+
+    The cones are instances of a single template (apex and a circle of base points), that is
+    scaled, rotated and moved for all segments at once.  Zero-length segments are skipped.
+    @returns: vertices (float32) and triangle indices (uint32) of all cones
+    """
+    starts = numpy.asarray(starts, dtype=numpy.float64)
+    distance = numpy.asarray(ends, dtype=numpy.float64) - starts
+    lengths = numpy.sqrt((distance ** 2).sum(axis=1))
+    valid = lengths > epsilon
+    starts, distance, lengths = starts[valid], distance[valid], lengths[valid]
+    direction = distance / lengths[:, numpy.newaxis]
+    # two axes perpendicular to the direction (a helper axis avoids parallel vectors)
+    helper = numpy.where((abs(direction[:, 2]) > 0.9)[:, numpy.newaxis], (1.0, 0, 0), (0, 0, 1.0))
+    axis1 = numpy.cross(direction, helper)
+    axis1 /= numpy.sqrt((axis1 ** 2).sum(axis=1))[:, numpy.newaxis]
+    axis2 = numpy.cross(direction, axis1)
+    cone_length = lengths * size
+    cone_radius = cone_length / 3.0
+    bottom = starts + distance * (position - size / 2)
+    angles = numpy.linspace(0, 2 * math.pi, precision, endpoint=False)
+    circle = (numpy.cos(angles)[numpy.newaxis, :, numpy.newaxis] * axis1[:, numpy.newaxis, :]
+              + numpy.sin(angles)[numpy.newaxis, :, numpy.newaxis] * axis2[:, numpy.newaxis, :])
+    base_points = bottom[:, numpy.newaxis, :] + cone_radius[:, numpy.newaxis, numpy.newaxis] \
+        * circle
+    top = bottom + direction * cone_length[:, numpy.newaxis]
+    # each cone consists of its apex followed by its base points
+    vertices = numpy.concatenate((top[:, numpy.newaxis, :], base_points), axis=1)
+    template = numpy.array([(0, 1 + index, 1 + (index + 1) % precision)
+                            for index in range(precision)], dtype=numpy.uint32)
+    offsets = (precision + 1) * numpy.arange(len(vertices), dtype=numpy.uint32)
+    indices = offsets[:, numpy.newaxis, numpy.newaxis] + template[numpy.newaxis, :, :]
+    return vertices.reshape(-1, 3).astype(numpy.float32), indices.reshape(-1)
+
+
+def get_opengl_line_buffers(starts, ends, is_rapid, show_directions=False):
+    """ create vertex buffer objects for segments (and their direction cones)
+
+    @returns: list of OpenGLBuffer instances
+    """
+    buffers = []
+    for rapid in (False, True):
+        selection = is_rapid == rapid
+        if not selection.any():
+            continue
+        # pairs of vertices for GL_LINES
+        vertices = numpy.stack((starts[selection], ends[selection]), axis=1)
+        buffers.append(OpenGLBuffer(vbo.VBO(vertices.reshape(-1, 3)), None, 2 * len(vertices),
+                                    rapid, False))
+        if show_directions:
+            vertices, indices = get_direction_cone_arrays(starts[selection], ends[selection])
+            buffers.append(OpenGLBuffer(vbo.VBO(vertices),
+                                        vbo.VBO(indices, target="GL_ELEMENT_ARRAY_BUFFER"),
+                                        indices.size, rapid, True))
+    return buffers
+
+
+# the cells of the levels of detail are encoded in 21 bits per axis
+_CELL_BITS = 21
+_CELL_MASK = (1 << _CELL_BITS) - 1
+
+
+def _encode_cells(cells):
+    return cells[:, 0] | (cells[:, 1] << _CELL_BITS) | (cells[:, 2] << (2 * _CELL_BITS))
+
+
+def _decode_cells(keys):
+    return numpy.stack((keys & _CELL_MASK, (keys >> _CELL_BITS) & _CELL_MASK,
+                        keys >> (2 * _CELL_BITS)), axis=1)
+
+
+def _get_unique_edges(first, second, is_rapid):
+    """ remove duplicate edges (regardless of their orientation) and edges within a cell
+
+    @param first: cell keys of the start points
+    @param second: cell keys of the end points
+    """
+    valid = first != second
+    first, second, is_rapid = first[valid], second[valid], is_rapid[valid]
+    first, second = numpy.minimum(first, second), numpy.maximum(first, second)
+    order = numpy.lexsort((is_rapid, second, first))
+    first, second, is_rapid = first[order], second[order], is_rapid[order]
+    keep = numpy.ones(len(first), dtype=bool)
+    keep[1:] = (first[1:] != first[:-1]) | (second[1:] != second[:-1]) \
+        | (is_rapid[1:] != is_rapid[:-1])
+    return first[keep], second[keep], is_rapid[keep]
+
+
+class ToolpathLevelOfDetail:
+    """ multi-resolution representation of the segments of a toolpath for the 3D preview
+
+    The segments are distributed to tiles (a regular grid in the xy plane).  Each coarse level
+    merges the vertices within cubic cells (the size of the cells doubles from level to level)
+    and removes duplicate edges.  Thus the number of edges of a level is limited by the number of
+    its cells instead of the length of the toolpath.  The full-resolution data of a tile is only
+    uploaded, when the tile is visible and the view is zoomed in far enough.
+    """
+
+    # number of tiles along the x and y axis
+    TILE_COUNT = 8
+    # number of cells along the largest dimension of the toolpath in the finest coarse level
+    FINEST_DIVISIONS = 4096
+    LEVEL_COUNT = 8
+    # the number of tiles with cached full-resolution buffers
+    MAX_CACHED_TILES = 16
+
+    def __init__(self, starts, ends, is_rapid):
+        if len(starts) == 0:
+            starts = ends = numpy.zeros((1, 3), dtype=numpy.float32)
+            is_rapid = numpy.zeros(1, dtype=bool)
+        self.low = numpy.minimum(starts.min(axis=0), ends.min(axis=0)).astype(float)
+        high = numpy.maximum(starts.max(axis=0), ends.max(axis=0)).astype(float)
+        extent = max(float((high - self.low).max()), epsilon)
+        self.cell_sizes = [extent / self.FINEST_DIVISIONS * 2 ** level
+                           for level in range(self.LEVEL_COUNT)]
+        self._tile_size = numpy.maximum(high[:2] - self.low[:2], epsilon) / self.TILE_COUNT
+        tile_count = self.TILE_COUNT ** 2
+        self.tile_lower = numpy.full((tile_count, 3), numpy.inf)
+        self.tile_upper = numpy.full((tile_count, 3), -numpy.inf)
+        # full resolution: the segments are sorted by tiles
+        self._segments = self._sort_by_tiles(starts, ends, is_rapid)
+        # the coarse levels are derived from the next finer level
+        cells = numpy.floor((numpy.concatenate((starts, ends)) - self.low) / self.cell_sizes[0])
+        keys = _encode_cells(numpy.clip(cells, 0, _CELL_MASK).astype(numpy.int64))
+        first, second, rapid = keys[:len(starts)], keys[len(starts):], is_rapid
+        self._levels = []
+        for cell_size in self.cell_sizes:
+            first, second, rapid = _get_unique_edges(first, second, rapid)
+            level_starts = self.low + (_decode_cells(first) + 0.5) * cell_size
+            level_ends = self.low + (_decode_cells(second) + 0.5) * cell_size
+            self._levels.append(self._sort_by_tiles(level_starts.astype(numpy.float32),
+                                                    level_ends.astype(numpy.float32), rapid))
+            first = _encode_cells(_decode_cells(first) >> 1)
+            second = _encode_cells(_decode_cells(second) >> 1)
+        self._buffers = collections.OrderedDict()
+
+    def _sort_by_tiles(self, starts, ends, is_rapid):
+        """ sort the segments by the tile containing their middle and update the tile limits
+
+        @returns: tuple of the sorted arrays and the offsets of the tiles
+        """
+        middle = (starts[:, :2] + ends[:, :2]) / 2
+        tile_xy = numpy.clip(((middle - self.low[:2]) / self._tile_size).astype(numpy.int64),
+                             0, self.TILE_COUNT - 1)
+        # small integers allow a (fast) radix sort
+        tiles = (tile_xy[:, 0] + self.TILE_COUNT * tile_xy[:, 1]).astype(numpy.int16)
+        order = numpy.argsort(tiles, kind="stable")
+        tiles, starts, ends, is_rapid = tiles[order], starts[order], ends[order], is_rapid[order]
+        offsets = numpy.searchsorted(tiles, numpy.arange(self.TILE_COUNT ** 2 + 1))
+        used = numpy.flatnonzero(offsets[1:] > offsets[:-1])
+        if len(used) > 0:
+            lower = numpy.minimum(numpy.minimum.reduceat(starts, offsets[used]),
+                                  numpy.minimum.reduceat(ends, offsets[used]))
+            upper = numpy.maximum(numpy.maximum.reduceat(starts, offsets[used]),
+                                  numpy.maximum.reduceat(ends, offsets[used]))
+            self.tile_lower[used] = numpy.minimum(self.tile_lower[used], lower)
+            self.tile_upper[used] = numpy.maximum(self.tile_upper[used], upper)
+        return starts, ends, is_rapid, offsets
+
+    def select_levels(self, projection, modelview, viewport_size, pixel_tolerance=1.0):
+        """ choose the level of detail for each visible tile
+
+        The coarsest level, whose cells are not bigger than a pixel (multiplied by the tolerance)
+        at any corner of the tile, is selected.
+        @param projection: the projection matrix (as returned by OpenGL)
+        @param modelview: the modelview matrix (as returned by OpenGL)
+        @param viewport_size: width and height of the view (in pixels)
+        @returns: list of tuples (tile index, level index or None for full resolution)
+        """
+        matrix = numpy.dot(numpy.reshape(modelview, (4, 4)), numpy.reshape(projection, (4, 4)))
+        tiles = numpy.flatnonzero((self.tile_lower <= self.tile_upper).all(axis=1))
+        lower, upper = self.tile_lower[tiles], self.tile_upper[tiles]
+        corners = numpy.stack([numpy.where(numpy.array(mask, dtype=bool), upper, lower)
+                               for mask in ((0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0),
+                                            (0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1))],
+                              axis=1)
+
+        def project(points):
+            return numpy.dot(numpy.concatenate((points, numpy.ones(points.shape[:-1] + (1, ))),
+                                               axis=-1), matrix)
+
+        clip = project(corners)
+        x, y, z, w = clip[..., 0], clip[..., 1], clip[..., 2], clip[..., 3]
+        # a tile is hidden, if all its corners are beyond one of the planes of the frustum
+        hidden = ((x < -w).all(axis=1) | (x > w).all(axis=1) | (y < -w).all(axis=1)
+                  | (y > w).all(axis=1) | (z < -w).all(axis=1) | (z > w).all(axis=1))
+        # the screen distance of small steps along the axes (in pixels per unit)
+        step = self.cell_sizes[0]
+        half_size = numpy.array(viewport_size[:2], dtype=float) / 2
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            screen = clip[..., :2] / w[..., numpy.newaxis] * half_size
+            scale = numpy.zeros(w.shape)
+            for axis in range(3):
+                moved = corners.copy()
+                moved[..., axis] += step
+                moved_clip = project(moved)
+                moved_screen = moved_clip[..., :2] / moved_clip[..., 3:] * half_size
+                scale = numpy.maximum(scale, numpy.sqrt(((moved_screen - screen) ** 2)
+                                                        .sum(axis=-1)) / step)
+            # corners behind the camera require the full resolution
+            scale[w <= 0] = numpy.inf
+            max_cell_size = pixel_tolerance / numpy.nan_to_num(scale.max(axis=1),
+                                                               nan=numpy.inf)
+        levels = numpy.searchsorted(self.cell_sizes, max_cell_size, side="right") - 1
+        return [(int(tile), None if level < 0 else int(level))
+                for tile, level, is_hidden in zip(tiles, levels, hidden) if not is_hidden]
+
+    def get_buffers(self, tile, level, show_directions=False):
+        """ return the vertex buffer objects of a tile (created on demand)
+
+        Direction cones are only available at full resolution.
+        @returns: list of OpenGLBuffer instances
+        """
+        show_directions = show_directions and (level is None)
+        key = (tile, level, show_directions)
+        if key in self._buffers:
+            self._buffers.move_to_end(key)
+        else:
+            starts, ends, is_rapid, offsets = \
+                self._segments if level is None else self._levels[level]
+            selection = slice(offsets[tile], offsets[tile + 1])
+            self._buffers[key] = get_opengl_line_buffers(
+                starts[selection], ends[selection], is_rapid[selection],
+                show_directions=show_directions)
+            # discard the least recently used full-resolution buffers
+            full_resolution = [item for item in self._buffers if item[1] is None]
+            for item in full_resolution[:-self.MAX_CACHED_TILES]:
+                del self._buffers[item]
+        return self._buffers[key]
+
+    def get_edge_count(self, level):
+        """ return the number of segments of a level (None: full resolution) """
+        return len((self._segments if level is None else self._levels[level])[0])
+
+
+class _MovesView(collections.abc.Sequence):
+    """ read-only view of a range of moves - optionally followed by a (partial) last move
+
+    The moves are not copied.  Thus the view is created in constant time.
+    """
+
+    def __init__(self, moves, start, stop, last_step=None):
+        self._moves = moves
+        self._start = start
+        self._stop = max(start, stop)
+        self._last_step = last_step
+
+    def __len__(self):
+        return self._stop - self._start + (0 if self._last_step is None else 1)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[item] for item in range(*index.indices(len(self)))]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("move index out of range: {:d}".format(index))
+        if index < self._stop - self._start:
+            return self._moves[self._start + index]
+        else:
+            return self._last_step
+
+    def __iter__(self):
+        for index in range(self._start, self._stop):
+            yield self._moves[index]
+        if self._last_step is not None:
+            yield self._last_step
+
+
 class Toolpath(DimensionalObject):
 
     def __init__(self, toolpath_path=None, toolpath_filters=None, tool=None, **kwargs):
@@ -96,7 +482,11 @@ class Toolpath(DimensionalObject):
     def __set_path(self, new_path):
         # use a read-only tuple instead of a list
         # (otherwise we can't detect changes)
-        self.__path = tuple(new_path)
+        # Other read-only sequences (e.g. the steps of a memory-mapped toolpath file) are kept.
+        if not isinstance(new_path, collections.abc.Sequence) \
+                or isinstance(new_path, collections.abc.MutableSequence):
+            new_path = tuple(new_path)
+        self.__path = new_path
         self.clear_cache()
 
     def __get_filters(self):
@@ -116,11 +506,13 @@ class Toolpath(DimensionalObject):
         return type(self)(toolpath_path=self.path, toolpath_filters=self.filters, tool=self.tool)
 
     def clear_cache(self):
-        self.opengl_safety_height = None
+        self._cache_opengl_buffers = None
+        self._cache_level_of_detail = None
         self._cache_basic_moves = None
         self._cache_visual_filters_string = None
         self._cache_visual_filters = None
         self._cache_machine_distance_and_time = None
+        self._cache_time_index = None
         self._minx = None
         self._maxx = None
         self._miny = None
@@ -177,155 +569,91 @@ class Toolpath(DimensionalObject):
         end_marker = self.toolpath_settings.META_MARKER_END
         return os.linesep.join((start_marker, meta, end_marker))
 
-    def get_moves(self, max_time=None):
+    def get_moves(self, max_time=None, start_index=None):
+        """ return the moves of the toolpath - optionally limited to a given duration
+
+        The result for a limited duration is the same as for the "TimeLimit" filter, but it is
+        based on a cached index of the cumulative durations of all moves.  Thus repeated calls
+        (e.g. for the toolpath simulation) are cheap: the moves are returned as a read-only view
+        (without copying the moves before the given time).
+        @param start_index: skip the given number of moves at the start (other steps than moves
+            are not counted and not returned, if a start index is given)
+        """
         moves = self.get_basic_moves()
-        if max_time is None:
+        if (max_time is None) and (start_index is None):
             return moves
-        else:
-            # late import due to dependency cycle
-            import pycam.Toolpath.Filters
-            return moves | pycam.Toolpath.Filters.TimeLimit(max_time)
-
-    def _rotate_point(self, rp, sp, v, angle):
-        vx = v[0]
-        vy = v[1]
-        vz = v[2]
-        x = ((sp[0] * (vy ** 2 + vz ** 2)
-              - vx * (sp[1] * vy
-                      + sp[2] * vz
-                      - vx * rp[0]
-                      - vy * rp[1]
-                      - vz * rp[2])) * (1 - math.cos(angle))
-             + rp[0] * math.cos(angle)
-             + (-sp[2] * vy + sp[1] * vz - vz * rp[1] + vy * rp[2]) * math.sin(angle))
-        y = ((sp[1] * (vx ** 2 + vz ** 2)
-              - vy * (sp[0] * vx
-                      + sp[2] * vz
-                      - vx * rp[0]
-                      - vy * rp[1]
-                      - vz * rp[2])) * (1 - math.cos(angle))
-             + rp[1] * math.cos(angle)
-             + (sp[2] * vx - sp[0] * vz + vz * rp[0] - vx * rp[2]) * math.sin(angle))
-        z = ((sp[2] * (vx ** 2 + vy ** 2)
-              - vz * (sp[0] * vx
-                      + sp[1] * vy
-                      - vx * rp[0]
-                      - vy * rp[1]
-                      - vz * rp[2])) * (1 - math.cos(angle))
-             + rp[2] * math.cos(angle)
-             + (-sp[1] * vx + sp[0] * vy - vy * rp[0] + vx * rp[1]) * math.sin(angle))
-        return (x, y, z)
-
-    def draw_direction_cone_mesh(self, p1, p2, position=0.5, precision=12, size=0.1):
-        distance = psub(p2, p1)
-        length = pnorm(distance)
-        direction = pnormalized(distance)
-        if direction is None or length < 0.5:
-            # zero-length line
-            return []
-        cone_length = length * size
-        cone_radius = cone_length / 3.0
-        bottom = padd(p1, pmul(psub(p2, p1), position - size / 2))
-        top = padd(p1, pmul(psub(p2, p1), position + size / 2))
-        # generate a a line perpendicular to this line, cross product is good at this
-        cross = pcross(direction, (0, 0, -1))
-        conepoints = []
-        if pnorm(cross) != 0:
-            # The line direction is not in line with the z axis.
-            conep1 = padd(bottom, pmul(cross, cone_radius))
-            conepoints = [self._rotate_point(conep1, bottom, direction, x)
-                          for x in numpy.linspace(0, 2 * math.pi, precision)]
-        else:
-            # Z axis
-            # just add cone radius to the x axis and rotate the point
-            conep1 = (bottom[0] + cone_radius, bottom[1], bottom[2])
-            conepoints = [self._rotate_point(conep1, p1, direction, x)
-                          for x in numpy.linspace(0, 2*math.pi, precision)]
-        triangles = [(top, conepoints[idx], conepoints[idx + 1])
-                     for idx in range(len(conepoints) - 1)]
-        return triangles
-
-    def get_moves_for_opengl(self, safety_height):
-        if self.opengl_safety_height != safety_height:
-            self.make_moves_for_opengl(safety_height)
-            self.make_vbo_for_moves()
-        return (self.opengl_coords, self.opengl_indices)
-
-    # separate vertex coordinates from line definitions and convert to indices
-    def make_vbo_for_moves(self):
-        index = 0
-        output = []
-        store_vertices = {}
-        vertices = []
-        for path in self.opengl_lines:
-            indices = []
-            triangles = []
-            triangle_indices = []
-            # compress the lines into a centeral array containing all the vertices
-            # generate a matching index for each line
-            for idx in range(len(path[0]) - 1):
-                point = path[0][idx]
-                if point not in store_vertices:
-                    store_vertices[point] = index
-                    vertices.insert(index, point)
-                    index += 1
-                indices.append(store_vertices[point])
-                point2 = path[0][idx + 1]
-                if point2 not in store_vertices:
-                    store_vertices[point2] = index
-                    vertices.insert(index, point2)
-                    index += 1
-                triangles.extend(self.draw_direction_cone_mesh(path[0][idx], path[0][idx + 1]))
-                for t in triangles:
-                    for p in t:
-                        if p not in store_vertices:
-                            store_vertices[p] = index
-                            vertices.insert(index, p)
-                            index += 1
-                        triangle_indices.append(store_vertices[p])
-            triangle_indices = numpy.array(triangle_indices, dtype=numpy.int32)
-            indices.append(store_vertices[path[0][-1]])
-            # this list comprehension removes consecutive duplicate points.
-            indices = numpy.array([x[0] for x in groupby(indices)], dtype=numpy.int32)
-            output.append((indices, triangle_indices, path[1]))
-        vertices = numpy.array(vertices, dtype=numpy.float32)
-        self.opengl_coords = vbo.VBO(vertices)
-        self.opengl_indices = output
-
-    def make_moves_for_opengl(self, safety_height):
-        # convert moves into lines for display with opengl
-        working_path = []
-        outpaths = []
-        for path in self.path:
-            if not path:
-                continue
-
-            if len(outpaths) != 0:
-                lastp = outpaths[-1][0][-1]
-                working_path.append((path[0][0], path[0][1], safety_height))
-                if ((abs(lastp[0] - path[0][0]) > epsilon)
-                        or (abs(lastp[1] - path[0][1]) > epsilon)):
-                    if ((abs(lastp[2] - path[0][2]) > epsilon)
-                            or (pdist(lastp, path[0]) > self._max_safe_distance + epsilon)):
-                        outpaths.append((tuple([x[0] for x in groupby(working_path)]), True))
+        if start_index is None:
+            start_index = 0
+        end_times, move_steps, start_positions = self._get_time_index()
+        if max_time is None:
+            return _MovesView(move_steps, start_index, len(move_steps))
+        # the first move, that is not finished before the given time
+        index = bisect.bisect_left(end_times, max_time)
+        if index >= len(move_steps):
+            return _MovesView(move_steps, start_index, len(move_steps))
+        elif index < start_index:
+            return _MovesView(move_steps, start_index, start_index)
+        step = move_steps[index]
+        start_position = start_positions[index]
+        if (start_position is not None) and (end_times[index] > max_time):
+            start_time = end_times[index - 1] if index > 0 else 0
+            partial = (max_time - start_time) / (end_times[index] - start_time)
+            if (step.action == MOVE_ARC) and (step.center is not None):
+                destination = get_arc_position(start_position, step, partial)
             else:
-                working_path.append((0, 0, 0))
-                working_path.append((path[0][0], path[0][1], safety_height))
-                outpaths.append((working_path, True))
+                destination = padd(start_position,
+                                   pmul(psub(step.position, start_position), partial))
+            step = step._replace(position=destination)
+        return _MovesView(move_steps, start_index, index, last_step=step)
 
-            # add this move to last move if last move was not rapid
-            if not outpaths[-1][1]:
-                outpaths[-1] = (outpaths[-1][0] + tuple(path), False)
-            else:
-                # last move was rapid, so add last point of rapid to beginning of path
-                outpaths.append((tuple([x[0] for x in groupby((outpaths[-1][0][-1],)
-                                                              + tuple(path))]), False))
-            working_path = []
-            working_path.append(path[-1])
-            working_path.append((path[-1][0], path[-1][1], safety_height))
-        outpaths.append((tuple([x[0] for x in groupby(working_path)]), True))
-        self.opengl_safety_height = safety_height
-        self.opengl_lines = outpaths
+    def _get_time_index(self):
+        """ calculate the time (in minutes) at the end of each move """
+        moves = self.get_basic_moves()
+        if self._cache_time_index is None:
+            min_feedrate = 1
+            feedrate = min_feedrate
+            duration = 0
+            current_position = None
+            end_times = []
+            move_steps = []
+            start_positions = []
+            for step in moves:
+                if (step.action == MACHINE_SETTING) and (step.key == "feedrate"):
+                    feedrate = step.value
+                elif step.action in MOVES_LIST:
+                    if current_position is not None:
+                        duration += (get_move_length(current_position, step)
+                                     / max(feedrate, min_feedrate))
+                    end_times.append(duration)
+                    move_steps.append(step)
+                    start_positions.append(current_position)
+                    current_position = step.position
+            self._cache_time_index = (end_times, move_steps, start_positions)
+        return self._cache_time_index
+
+    def get_opengl_buffers(self, filters=None, show_directions=False):
+        """ return vertex buffer objects for drawing the basic moves of the toolpath
+
+        The buffers are kept until the cache of the toolpath is cleared.
+        @returns: list of OpenGLBuffer instances
+        """
+        key = (str(filters), show_directions)
+        if (self._cache_opengl_buffers is None) or (self._cache_opengl_buffers[0] != key):
+            starts, ends, is_rapid = get_move_segment_arrays(self.get_basic_moves(filters))
+            self._cache_opengl_buffers = (key, get_opengl_line_buffers(
+                starts, ends, is_rapid, show_directions=show_directions))
+        return self._cache_opengl_buffers[1]
+
+    def get_level_of_detail(self, filters=None):
+        """ return the multi-resolution representation of the basic moves for the 3D preview
+
+        The representation is kept until the cache of the toolpath is cleared.
+        """
+        key = str(filters)
+        if (self._cache_level_of_detail is None) or (self._cache_level_of_detail[0] != key):
+            segments = get_move_segment_arrays(self.get_basic_moves(filters))
+            self._cache_level_of_detail = (key, ToolpathLevelOfDetail(*segments))
+        return self._cache_level_of_detail[1]
 
     def get_machine_time(self, safety_height=0.0):
         """ calculate an estimation of the time required for processing the
@@ -349,7 +677,7 @@ class Toolpath(DimensionalObject):
                     feedrate = step.value
                 elif step.action in MOVES_LIST:
                     if current_position is not None:
-                        distance = pdist(step.position, current_position)
+                        distance = get_move_length(current_position, step)
                         duration += distance / max(feedrate, min_feedrate)
                         length += distance
                     current_position = step.position
@@ -369,6 +697,7 @@ class Toolpath(DimensionalObject):
                                                                                 all_filters)
             self._cache_visual_filters_string = str(filters)
             self._cache_visual_filters = filters
+            self._cache_time_index = None
             _log.debug("Applying toolpath filters: %s",
                        ", ".join([str(fil) for fil in all_filters]))
             _log.debug("Toolpath step changes: %d (before) -> %d (after)",
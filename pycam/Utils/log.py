@@ -18,6 +18,7 @@ along with PyCAM.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import logging
+import threading
 import time
 
 
@@ -160,6 +161,11 @@ class GTKHandler(logging.Handler):
         self.parent_window = parent_window
 
     def emit(self, record):
+        if threading.current_thread() is not threading.main_thread():
+            # GTK may only be used by the main thread (e.g. not by a toolpath generator)
+            from gi.repository import GLib
+            GLib.idle_add(self.emit, record)
+            return
         message = self.format(record)
         # Replace all "<>" characters (invalid for markup styles) with html entities.
         message = message.replace("<", "&lt;").replace(">", "&gt;")
@@ -1,11 +1,103 @@
+import threading
+import time
+
 from pycam.Utils.events import get_event_handler, get_mainloop
 
 
+_thread_state = threading.local()
+
+
+def get_progress_channel():
+    """ return the progress channel of the current thread (or None) """
+    return getattr(_thread_state, "channel", None)
+
+
+def set_progress_channel(channel):
+    """ route the progress reports of the current thread to a channel (or back to the GUI) """
+    _thread_state.channel = channel
+
+
+class ProgressChannel:
+    """ thread-safe exchange of progress information between a worker and the GUI thread
+
+    The worker thread reports its state without touching the GUI.  The GUI thread polls the
+    most recent state (see "get_state") and requests a cancellation via "cancel".
+    Snapshots of the partial toolpath are copied at most "max_fps" times per second.
+    """
+
+    def __init__(self, max_fps=1):
+        self.max_fps = max_fps
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._text = None
+        self._percent = None
+        self._tool_position = None
+        self._toolpath = None
+        self._last_toolpath_time = None
+        self._changed = False
+
+    def update(self, text=None, percent=None, tool_position=None, toolpath=None):
+        """ store the current state of the worker
+
+        @returns: True if a cancellation was requested
+        """
+        current_time = time.time()
+        if (toolpath is not None) and ((self._last_toolpath_time is None)
+                                       or (current_time - self._last_toolpath_time
+                                           > 1.0 / self.max_fps)):
+            # the worker keeps on extending its list - thus we need a copy
+            toolpath = list(toolpath)
+            self._last_toolpath_time = current_time
+        else:
+            toolpath = None
+        with self._lock:
+            if text is not None:
+                self._text = text
+            if percent is not None:
+                self._percent = percent
+            if tool_position is not None:
+                self._tool_position = tool_position
+            if toolpath is not None:
+                self._toolpath = toolpath
+            self._changed = True
+        return self._cancel_event.is_set()
+
+    def get_state(self):
+        """ return the most recent state of the worker
+
+        @returns: tuple of "changed" flag, text, percent, tool position and partial toolpath
+        """
+        with self._lock:
+            changed, self._changed = self._changed, False
+            return changed, self._text, self._percent, self._tool_position, self._toolpath
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    # the following methods allow the channel to replace the "progress" object of the GUI
+
+    def finish(self):
+        pass
+
+    def set_multiple(self, count, base_text=None):
+        pass
+
+    def update_multiple(self):
+        pass
+
+
 class ProgressContext:
 
     def __init__(self, title):
         self._title = title
-        self._progress = get_event_handler().get("progress")
+        self._channel = get_progress_channel()
+        if self._channel is None:
+            self._progress = get_event_handler().get("progress")
+        else:
+            self._progress = self._channel
 
     def __enter__(self):
         if self._progress:
@@ -21,6 +113,9 @@ class ProgressContext:
             self._progress.finish()
 
     def update(self, *args, **kwargs):
+        if self._channel is not None:
+            # a worker thread: the GUI thread polls the channel
+            return self._channel.update(*args, **kwargs)
         mainloop = get_mainloop()
         if mainloop is None:
             return False
@@ -54,6 +54,17 @@ def get_args():
                         help="choose the verbosity of log messages")
     parser.add_argument("sources", metavar="FLOW_SPEC", type=argparse.FileType('r'), nargs="+",
                         help="processing flow description files in yaml format")
+    parser.add_argument("--streaming", action="store_true",
+                        help="write GCode while calculating the toolpaths (reduces memory usage)")
+    parser.add_argument("--parallel-export", action="store_true",
+                        help="format GCode in parallel processes (for very large toolpaths)")
+    parser.add_argument("--verify", action="store_true",
+                        help="simulate all toolpaths after the export and fail (exit code 2) if "
+                             "the tool cuts into a model")
+    parser.add_argument("--verify-resolution", type=float, default=0.2, metavar="DISTANCE",
+                        help="grid size of the simulated stock used for '--verify'")
+    parser.add_argument("--max-gouge-depth", type=float, default=0.01, metavar="DISTANCE",
+                        help="maximum tolerated depth of cuts into a model for '--verify'")
     parser.add_argument("--version", action="version", version="%(prog)s {}".format(VERSION))
     return parser.parse_args()
 
@@ -69,7 +80,28 @@ def main_func():
             sys.exit(1)
     pycam.Utils.set_application_key("pycam-cli")
     for export in pycam.workspace.data_models.Export.get_collection():
-        export.run_export()
+        export.run_export(streaming=args.streaming, parallel=args.parallel_export)
+    if args.verify and not verify_toolpaths(args.verify_resolution, args.max_gouge_depth):
+        sys.exit(2)
+
+
+def verify_toolpaths(resolution, max_gouge_depth):
+    success = True
+    for toolpath in pycam.workspace.data_models.Toolpath.get_collection():
+        try:
+            result = toolpath.verify(resolution, gouge_tolerance=max_gouge_depth)
+        except pycam.errors.PycamBaseException as exc:
+            print("Failed to verify toolpath '{}': {}".format(toolpath.get_id(), exc),
+                  file=sys.stderr)
+            success = False
+            continue
+        if result is None:
+            continue
+        print("Verification of toolpath '{}':".format(toolpath.get_id()))
+        print(result.get_report())
+        if result.gouge_moves:
+            success = False
+    return success
 
 
 if __name__ == "__main__":
@@ -37,6 +37,7 @@ class BoundsSpecification(Enum):
 
 class TaskType(Enum):
     MILLING = "milling"
+    REST_MACHINING = "rest_machining"
 
 
 class SourceType(Enum):
@@ -48,6 +49,7 @@ class SourceType(Enum):
     TOOLPATH = "toolpath"
     OBJECT = "object"
     SUPPORT_BRIDGES = "support_bridges"
+    TOOLPATH_FILE = "toolpath_file"
 
 
 class ModelTransformationAction(Enum):
@@ -114,6 +116,7 @@ class TargetType(Enum):
 class FormatType(Enum):
     GCODE = "gcode"
     MODEL = "model"
+    TOOLPATH = "toolpath"
 
 
 class FileType(Enum):
@@ -129,6 +132,7 @@ class ToolpathFilter(Enum):
     PLUNGE_FEEDRATE = "plunge_feedrate"
     STEP_WIDTH = "step_width"
     CORNER_STYLE = "corner_style"
+    ARC_FITTING = "arc_fitting"
     FILENAME_EXTENSION = "filename_extension"
     TOUCH_OFF = "touch_off"
     UNIT = "unit"
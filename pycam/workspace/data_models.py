@@ -23,6 +23,7 @@ from enum import Enum
 import functools
 import io
 import os.path
+import threading
 import time
 import uuid
 
@@ -32,11 +33,14 @@ from pycam.Cutters.ToroidalCutter import ToroidalCutter
 from pycam.Geometry import Box3D, Point3D
 import pycam.Geometry.Model
 from pycam.Geometry.Plane import Plane
-from pycam.PathGenerators import UpdateToolView
+from pycam.PathGenerators import ProgressToken, UpdateToolView
 import pycam.PathGenerators.DropCutter
 import pycam.PathGenerators.EngraveCutter
 import pycam.PathGenerators.PushCutter
+import pycam.Simulation.RestMachining
+import pycam.Simulation.Verification
 import pycam.Toolpath
+import pycam.Toolpath.BinaryFormat
 import pycam.Toolpath.Filters as tp_filters
 import pycam.Toolpath.MotionGrid as MotionGrid
 import pycam.Toolpath.SupportGrid
@@ -60,6 +64,8 @@ _log = pycam.Utils.log.get_logger()
 # dictionary of all collections by name
 _data_collections = {}
 _cache = {}
+# toolpaths may be calculated in multiple threads at the same time
+_cache_lock = threading.Lock()
 
 
 APPLICATION_ATTRIBUTES_KEY = "X-Application"
@@ -226,24 +232,43 @@ def _get_collection_resolver(collection_name, many=False):
     return functools.partial(_get_from_collection, collection_name, many=many)
 
 
+class _ParserContexts(threading.local):
+    """ the parser context descriptions of the current thread (by object id) """
+
+    def __init__(self):
+        self.by_object = {}
+
+
+_parser_contexts = _ParserContexts()
+
+
+def _get_parser_context(obj):
+    return _parser_contexts.by_object.get(id(obj))
+
+
 def _set_parser_context(description):
-    """ store a string describing the current parser context (useful for error messages) """
+    """ store a string describing the current parser context (useful for error messages)
+
+    The context is stored separately for each thread - a data object may be used by multiple
+    threads at the same time.
+    """
     def wrap(func):
         @functools.wraps(func)
         def inner_function(self, *args, **kwargs):
-            original_description = getattr(self, "_current_parser_context", None)
-            self._current_parser_context = description
+            contexts = _parser_contexts.by_object
+            original_description = contexts.get(id(self))
+            contexts[id(self)] = description
             try:
-                result = func(self, *args, **kwargs)
+                return func(self, *args, **kwargs)
             except PycamBaseException as exc:
                 # add a prefix to exceptions
-                exc.message = "{} -> {}".format(self._current_parser_context, exc)
+                exc.message = "{} -> {}".format(description, exc)
                 raise exc
-            if original_description is None:
-                delattr(self, "_current_parser_context")
-            else:
-                self._current_parser_context = original_description
-            return result
+            finally:
+                if original_description is None:
+                    contexts.pop(id(self), None)
+                else:
+                    contexts[id(self)] = original_description
         return inner_function
     return wrap
 
@@ -274,6 +299,12 @@ def _require_model_type(wanted_type):
     return wrap
 
 
+def _get_toolpath_progress_token(progress):
+    """ create the progress token for a path generator (visualizing its progress) """
+    max_fps = get_event_handler().get("tool_progress_max_fps", 1)
+    return ProgressToken(UpdateToolView(progress.update, max_fps=max_fps).update, max_fps=max_fps)
+
+
 class CacheStorage:
     """ cache result values of a method
 
@@ -307,6 +338,10 @@ class CacheStorage:
             yield hash(value)
         elif value is None:
             yield hash(None)
+        elif isinstance(value, Source):
+            yield from cls._get_stable_hashs_for_value(value.get_dict())
+            # a changed file invalidates the cached values
+            yield from cls._get_stable_hashs_for_value(value.get_file_state())
         elif isinstance(value, BaseDataContainer):
             yield from cls._get_stable_hashs_for_value(value.get_dict())
         elif isinstance(value, Enum):
@@ -334,23 +369,22 @@ class CacheStorage:
             _log.info("Directly serving value due to non-hashable instance (skipping the cache): "
                       "%s", inst)
             return calc_function(inst, *args, **kwargs)
-        try:
-            my_cache = _cache[hash(inst)]
-        except KeyError:
-            my_cache = {}
-            _cache[hash(inst)] = my_cache
         cache_key = self._get_cache_key(inst, args, kwargs)
-        try:
-            return my_cache[cache_key].content
-        except KeyError:
-            pass
+        with _cache_lock:
+            my_cache = _cache.setdefault(hash(inst), {})
+            try:
+                return my_cache[cache_key].content
+            except KeyError:
+                pass
+        # the calculation may take a while - other threads may access the cache in the meantime
         cache_item = CacheItem(time.time(), calc_function(inst, *args, **kwargs))
-        my_cache[cache_key] = cache_item
-        if len(my_cache) > self._max_cache_size:
-            # remove the oldest cache item
-            item_list = [(key, value.timestamp) for key, value in my_cache.items()]
-            item_list.sort(key=lambda item: item[1])
-            my_cache.pop(item_list[0][0])
+        with _cache_lock:
+            my_cache[cache_key] = cache_item
+            if len(my_cache) > self._max_cache_size:
+                # remove the oldest cache item
+                item_list = [(key, value.timestamp) for key, value in my_cache.items()]
+                item_list.sort(key=lambda item: item[1])
+                my_cache.pop(item_list[0][0])
         return cache_item.content
 
 
@@ -385,7 +419,7 @@ class BaseDataContainer:
             elif key in self.attribute_defaults:
                 raw_value = copy.deepcopy(self.attribute_defaults[key])
             else:
-                if hasattr(self, "_current_parser_context"):
+                if _get_parser_context(self) is not None:
                     # the context will be added automatically
                     raise MissingAttributeError("missing attribute '{}'".format(key))
                 else:
@@ -711,9 +745,25 @@ class Source(BaseDataContainer):
             return hash(self._get_source_object())
         elif source_type == SourceType.SUPPORT_BRIDGES:
             return hash(self._get_source_support_bridges())
+        elif source_type == SourceType.TOOLPATH_FILE:
+            return hash((self.get_value("location"), self.get_file_state()))
         else:
             raise InvalidKeyError(source_type, SourceType)
 
+    def get_file_state(self):
+        """ return the modification time and the size of a toolpath file (otherwise None)
+
+        The state is part of the cache key of the source - thus a changed file is loaded again.
+        """
+        if self.get_value("type") != SourceType.TOOLPATH_FILE:
+            return None
+        try:
+            stat = os.stat(os.path.expanduser(self.get_value("location")))
+        except OSError:
+            # the error is reported when loading the file
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
     @CacheStorage({"type"})
     @_set_parser_context("Source")
     def get(self, related_collection_name):
@@ -737,6 +787,8 @@ class Source(BaseDataContainer):
             return self._get_source_object()
         elif source_type == SourceType.SUPPORT_BRIDGES:
             return self._get_source_support_bridges()
+        elif source_type == SourceType.TOOLPATH_FILE:
+            return self._get_source_toolpath_file()
         else:
             raise InvalidKeyError(source_type, SourceType)
 
@@ -791,6 +843,17 @@ class Source(BaseDataContainer):
         toolpath_names = self.get_value("items")
         return _get_from_collection(CollectionName.TOOLPATHS, toolpath_names, many=True)
 
+    @_set_parser_context("Source 'toolpath_file'")
+    @_set_allowed_attributes({"type", "location"})
+    def _get_source_toolpath_file(self):
+        """ load a toolpath stored via the "toolpath" export format """
+        location = os.path.expanduser(self.get_value("location"))
+        toolpath = pycam.Toolpath.BinaryFormat.read_toolpath(location)
+        if toolpath.tool is not None:
+            # the tool is not part of the tools collection
+            toolpath.tool = Tool(None, toolpath.tool, add_to_collection=False)
+        return toolpath
+
     @_set_parser_context("Source 'object'")
     @_set_allowed_attributes({"type", "data"})
     def _get_source_object(self):
@@ -1103,6 +1166,7 @@ class Process(BaseCollectionItemDataContainer):
                                                                      many=True),
                             "rounded_corners": _bool_converter,
                             "radius_compensation": _bool_converter,
+                            "optimize_rapid_moves": _bool_converter,
                             "overlap": float,
                             "step_down": float}
     attribute_defaults = {"overlap": 0,
@@ -1110,7 +1174,8 @@ class Process(BaseCollectionItemDataContainer):
                           "grid_direction": MotionGrid.GridDirection.X,
                           "spiral_direction": MotionGrid.SpiralDirection.OUT,
                           "rounded_corners": True,
-                          "radius_compensation": False}
+                          "radius_compensation": False,
+                          "optimize_rapid_moves": False}
 
     @_set_parser_context("Process")
     def get_path_generator(self):
@@ -1309,55 +1374,156 @@ class Task(BaseCollectionItemDataContainer):
                             "tool": _get_collection_resolver(CollectionName.TOOLS),
                             "type": _get_enum_resolver(TaskType),
                             "collision_models": _get_collection_resolver(CollectionName.MODELS,
-                                                                         many=True)}
+                                                                         many=True),
+                            "previous_toolpaths": _get_collection_resolver(
+                                CollectionName.TOOLPATHS, many=True),
+                            "rest_threshold": float}
+    attribute_defaults = {"previous_toolpaths": [],
+                          "rest_threshold": 0.05}
+
+    def _get_milling_setup(self):
+        """ collect the items required for generating a milling toolpath
+
+        @returns: tuple of tool, cutter, models, path generator, motion grid and box (or None)
+        """
+        process = self.get_value("process")
+        bounds = self.get_value("bounds")
+        tool = self.get_value("tool")
+        box = bounds.get_absolute_limits(tool_radius=tool.radius,
+                                         models=self.get_value("collision_models"))
+        path_generator = process.get_path_generator()
+        if path_generator is None:
+            # we assume that an error message was given already
+            return None
+        models = [m.get_model() for m in self.get_value("collision_models")]
+        if not models:
+            # issue a warning - and go ahead ...
+            _log.warn("No collision model was selected. This can be intentional, but maybe "
+                      "you simply forgot it.")
+        if self.get_value("type") == TaskType.REST_MACHINING:
+            if process.get_value("strategy") != ProcessStrategy.SURFACE:
+                _log.error("Rest machining is only supported for the 'surface' strategy")
+                return None
+            is_relevant_position = self._get_rest_machining_filter(tool, models, box)
+            if is_relevant_position is None:
+                return None
+        motion_grid = process.get_motion_grid(tool.radius, box, recurse_immediately=True)
+        _log.debug("MotionGrid completed")
+        if motion_grid is None:
+            # we assume that an error message was given already
+            return None
+        if self.get_value("type") == TaskType.REST_MACHINING:
+            motion_grid = MotionGrid.get_restricted_grid(motion_grid, is_relevant_position)
+        return tool, tool.get_tool_geometry(), models, path_generator, motion_grid, box
 
-    @CacheStorage({"process", "bounds", "tool", "type", "collision_models"})
+    def _get_rest_machining_filter(self, tool, models, box):
+        """ simulate the previous toolpaths and locate the residual material
+
+        @returns: a function deciding whether the tool needs to visit a position (or None)
+        """
+        previous_toolpaths = []
+        for toolpath in self.get_value("previous_toolpaths"):
+            toolpath = toolpath.get_toolpath()
+            if toolpath is None:
+                continue
+            if not hasattr(toolpath.tool, "get_tool_geometry"):
+                _log.error("Rest machining: the tool of a previous toolpath is unknown")
+                return None
+            previous_toolpaths.append((toolpath, toolpath.tool.get_tool_geometry()))
+        # contour models do not describe a surface
+        models = [model for model in models if isinstance(model, pycam.Geometry.Model.Model)]
+        # use the step width of the surfacing motion grid
+        resolution = tool.radius / 4.0
+        with ProgressContext("Simulating previous toolpaths"):
+            residual_material = pycam.Simulation.RestMachining.ResidualMaterial(
+                previous_toolpaths, models, box, resolution)
+        return residual_material.get_position_filter(self.get_value("rest_threshold"),
+                                                     tool.radius)
+
+    def get_verification_setup(self):
+        """ collect the items required for verifying a toolpath against the models
+
+        @returns: tuple of cutter, triangle models and box (the stock)
+        """
+        tool = self.get_value("tool")
+        box = self.get_value("bounds").get_absolute_limits(
+            tool_radius=tool.radius, models=self.get_value("collision_models"))
+        # contour models do not describe a surface
+        models = [m.get_model() for m in self.get_value("collision_models")
+                  if isinstance(m.get_model(), pycam.Geometry.Model.Model)]
+        return tool.get_tool_geometry(), models, box
+
+    @CacheStorage({"process", "bounds", "tool", "type", "collision_models",
+                   "previous_toolpaths", "rest_threshold"})
     @_set_parser_context("Task")
     def generate_toolpath(self):
         _log.debug("Generating toolpath for task {}".format(self.get_id()))
         process = self.get_value("process")
-        bounds = self.get_value("bounds")
         task_type = self.get_value("type")
-        if task_type == TaskType.MILLING:
-            tool = self.get_value("tool")
-            box = bounds.get_absolute_limits(tool_radius=tool.radius,
-                                             models=self.get_value("collision_models"))
-            path_generator = process.get_path_generator()
-            if path_generator is None:
-                # we assume that an error message was given already
-                return
-            models = [m.get_model() for m in self.get_value("collision_models")]
-            if not models:
-                # issue a warning - and go ahead ...
-                _log.warn("No collision model was selected. This can be intentional, but maybe "
-                          "you simply forgot it.")
-            motion_grid = process.get_motion_grid(tool.radius, box, recurse_immediately=True)
-            _log.debug("MotionGrid completed")
-            if motion_grid is None:
-                # we assume that an error message was given already
+        if task_type in (TaskType.MILLING, TaskType.REST_MACHINING):
+            setup = self._get_milling_setup()
+            if setup is None:
                 return
+            tool, cutter, models, path_generator, motion_grid, box = setup
             with ProgressContext("Calculating toolpath") as progress:
-                draw_callback = UpdateToolView(
-                    progress.update,
-                    max_fps=get_event_handler().get("tool_progress_max_fps", 1)).update
+                draw_callback = _get_toolpath_progress_token(progress)
                 moves = path_generator.generate_toolpath(
-                    tool.get_tool_geometry(), models, motion_grid, minz=box.lower.z,
+                    cutter, models, motion_grid, minz=box.lower.z,
                     maxz=box.upper.z, draw_callback=draw_callback)
             if not moves:
                 _log.info("No valid moves found")
                 return None
+            if process.get_value("optimize_rapid_moves"):
+                # retracts dominate the machining time of paths with many short segments
+                moves = moves | tp_filters.RapidMoveOrder(models=tuple(models), cutter=cutter,
+                                                          max_link_distance=2 * tool.radius)
             return pycam.Toolpath.Toolpath(toolpath_path=moves, tool=tool,
                                            toolpath_filters=tool.get_toolpath_filters())
         else:
             raise InvalidKeyError(task_type, TaskType)
 
+    @_set_parser_context("Task")
+    def generate_toolpath_stream(self):
+        """ generate the moves of the toolpath on demand (e.g. for a streaming export)
+
+        Path generators providing "get_toolpath_lines" calculate the moves line by line while
+        the result is consumed.  Otherwise the complete toolpath is calculated in advance.
+        @returns: tuple of an iterable of moves and the toolpath filters (or None)
+        """
+        _log.debug("Generating toolpath stream for task {}".format(self.get_id()))
+        process = self.get_value("process")
+        task_type = self.get_value("type")
+        if task_type not in (TaskType.MILLING, TaskType.REST_MACHINING):
+            raise InvalidKeyError(task_type, TaskType)
+        if (process.get_value("optimize_rapid_moves")
+                or not hasattr(process.get_path_generator(), "get_toolpath_lines")):
+            # the complete toolpath is required
+            toolpath = self.generate_toolpath()
+            if toolpath is None:
+                return None
+            return toolpath.path, toolpath.filters
+        setup = self._get_milling_setup()
+        if setup is None:
+            return None
+        tool, cutter, models, path_generator, motion_grid, box = setup
+
+        def get_moves():
+            with ProgressContext("Calculating toolpath") as progress:
+                draw_callback = _get_toolpath_progress_token(progress)
+                for line_moves in path_generator.get_toolpath_lines(
+                        cutter, models, motion_grid, minz=box.lower.z, maxz=box.upper.z,
+                        draw_callback=draw_callback):
+                    yield from line_moves
+
+        return get_moves(), tool.get_toolpath_filters()
+
     def validate(self):
         # We cannot call "get_toolpath" - this would be too expensive. Use its attribute accesses
         # directly instead.
         self.get_value("process")
         self.get_value("bounds")
         task_type = self.get_value("type")
-        if task_type != TaskType.MILLING:
+        if task_type not in (TaskType.MILLING, TaskType.REST_MACHINING):
             raise InvalidKeyError(task_type, TaskType)
 
 
@@ -1454,14 +1620,54 @@ class Toolpath(BaseCollectionItemDataContainer):
     @_set_parser_context("Toolpath")
     def get_toolpath(self):
         _log.debug("Generating toolpath {}".format(self.get_id()))
-        task = self.get_value("source").get(CollectionName.TOOLPATHS)
-        toolpath = task.generate_toolpath()
+        source = self.get_value("source").get(CollectionName.TOOLPATHS)
+        if isinstance(source, pycam.Toolpath.Toolpath):
+            # a stored toolpath
+            toolpath = source
+        else:
+            toolpath = source.generate_toolpath()
         for transformation in self.get_value("transformations"):
             # the toolpath may be empty or invalidated by a transformation
             if toolpath is not None:
                 toolpath = transformation.get_transformed_toolpath(toolpath)
         return toolpath
 
+    @_set_parser_context("Toolpath")
+    def get_toolpath_stream(self):
+        """ return the moves (as an iterable) and the filters of the toolpath
+
+        See "Task.generate_toolpath_stream" for details.
+        """
+        if self.get_value("transformations"):
+            # transformations operate on the complete toolpath
+            toolpath = self.get_toolpath()
+            if toolpath is None:
+                return None
+            return toolpath.path, toolpath.filters
+        source = self.get_value("source").get(CollectionName.TOOLPATHS)
+        if isinstance(source, pycam.Toolpath.Toolpath):
+            return source.path, source.filters
+        return source.generate_toolpath_stream()
+
+    @_set_parser_context("Toolpath")
+    def verify(self, resolution, gouge_tolerance=0.001):
+        """ simulate the material removal and compare the remaining stock with the models
+
+        Only toolpaths generated directly by a task can be verified.
+        @returns: a VerificationResult instance (or None)
+        """
+        source = self.get_value("source").get(CollectionName.TOOLPATHS)
+        if not isinstance(source, Task) or self.get_value("transformations"):
+            _log.warning("Skipping verification of toolpath '%s': only untransformed toolpaths "
+                         "of tasks are supported", self.get_id())
+            return None
+        toolpath = self.get_toolpath()
+        if toolpath is None:
+            return None
+        cutter, models, box = source.get_verification_setup()
+        return pycam.Simulation.Verification.verify_toolpath(
+            toolpath, cutter, models, box, resolution, gouge_tolerance=gouge_tolerance)
+
     def append_transformation(self, transform_dict):
         current_transformations = self.get_value("transformations", raw=True)
         current_transformations.append(copy.deepcopy(transform_dict))
@@ -1505,6 +1711,11 @@ class ExportSettings(BaseCollectionItemDataContainer):
                 motion_tolerance = parameters.get("motion_tolerance", 0)
                 naive_tolerance = parameters.get("naive_tolerance", 0)
                 result.append(tp_filters.CornerStyle(mode, motion_tolerance, naive_tolerance))
+            elif filter_name == ToolpathFilter.ARC_FITTING:
+                tolerance = float(parameters)
+                # a tolerance of zero disables the arc fitting
+                if tolerance > 0:
+                    result.append(tp_filters.ArcFitting(tolerance))
             elif filter_name == ToolpathFilter.FILENAME_EXTENSION:
                 # this export setting is only used for filename dialogs
                 pass
@@ -1568,7 +1779,7 @@ class Formatter(BaseDataContainer):
                 message_template.format(" / ".join(get_type_name(item) for item in failing_items)))
 
     @_set_parser_context("Export formatter: type selection")
-    def write_data(self, source, target):
+    def write_data(self, source, target, streaming=False, parallel=False):
         _log.debug("Writing formatter data {}".format(self))
         # we expect a tuple of items as input
         if not isinstance(source, (list, tuple)):
@@ -1578,19 +1789,29 @@ class Formatter(BaseDataContainer):
         if format_type == FormatType.GCODE:
             self._test_sources(source, lambda item: isinstance(item, Toolpath),
                                "Invalid source data type: {} (expected: list of toolpaths)")
-            return self._write_gcode(source, target)
+            return self._write_gcode(source, target, streaming=streaming, parallel=parallel)
         elif format_type == FormatType.MODEL:
             self._test_sources(source, lambda item: isinstance(item, Model),
                                "Invalid source data type: {} (expected: list of models)")
             self._test_sources(source, lambda item: item.get_model().is_export_supported(),
                                "Sources lacking 'export' support: {}")
             return self._write_model(source, target)
+        elif format_type == FormatType.TOOLPATH:
+            self._test_sources(source, lambda item: isinstance(item, Toolpath),
+                               "Invalid source data type: {} (expected: list of toolpaths)")
+            return self._write_toolpath(source, target)
         else:
             raise InvalidKeyError(format_type, FormatType)
 
     @_set_parser_context("Export formatter 'GCode'")
     @_set_allowed_attributes({"type", "comment", "dialect", "export_settings"})
-    def _write_gcode(self, source, target):
+    def _write_gcode(self, source, target, streaming=False, parallel=False):
+        """ write the toolpaths as GCode
+
+        @param streaming: calculate and write the moves step by step (if supported by the path
+            generators) instead of collecting complete toolpaths first
+        @param parallel: format the moves in parallel processes
+        """
         comment = self.get_value("comment")
         dialect = self.get_value("dialect")
         if dialect == GCodeDialect.LINUXCNC:
@@ -1601,9 +1822,14 @@ class Formatter(BaseDataContainer):
         if export_settings:
             generator.add_filters(export_settings.get_toolpath_filters())
         for toolpath in source:
-            calculated = toolpath.get_toolpath()
-            # TODO: implement toolpath.get_meta_data()
-            generator.add_moves(calculated.path, calculated.filters)
+            if streaming:
+                calculated = toolpath.get_toolpath_stream()
+                if calculated is not None:
+                    generator.add_moves(*calculated, parallel=parallel)
+            else:
+                calculated = toolpath.get_toolpath()
+                # TODO: implement toolpath.get_meta_data()
+                generator.add_moves(calculated.path, calculated.filters, parallel=parallel)
         generator.finish()
         target.close()
         return True
@@ -1629,8 +1855,35 @@ class Formatter(BaseDataContainer):
         else:
             raise InvalidKeyError(filetype, FileType)
 
+    @_set_parser_context("Export formatter 'Toolpath'")
+    @_set_allowed_attributes({"type"})
+    def _write_toolpath(self, source, target):
+        """ store a single toolpath in the binary toolpath format """
+        if len(source) > 1:
+            raise InvalidDataError("The toolpath format accepts only a single toolpath "
+                                   "(received: {:d})".format(len(source)))
+        elif source:
+            toolpath = source[0].get_toolpath()
+            if toolpath is None:
+                raise InvalidDataError("Failed to store an empty toolpath")
+        else:
+            toolpath = pycam.Toolpath.Toolpath()
+        # the format is binary - text files (but not StringIO objects) provide a binary buffer
+        stream = getattr(target, "buffer", None)
+        if stream is None:
+            raise InvalidDataError("The toolpath format requires a target with a binary buffer "
+                                   "(received: {})".format(get_type_name(target)))
+        pycam.Toolpath.BinaryFormat.write_toolpath(toolpath, stream)
+        target.close()
+        return True
+
     def validate(self):
-        self.write_data([], io.StringIO())
+        if self.get_value("type") == FormatType.TOOLPATH:
+            # the binary toolpath format is written to the buffer of a text stream
+            target = io.TextIOWrapper(io.BytesIO())
+        else:
+            target = io.StringIO()
+        self.write_data([], target)
 
 
 class Export(BaseCollectionItemDataContainer):
@@ -1640,7 +1893,7 @@ class Export(BaseCollectionItemDataContainer):
                             "source": Source,
                             "target": Target}
 
-    def run_export(self, dry_run=False):
+    def run_export(self, dry_run=False, streaming=False, parallel=False):
         _log.debug("Running export {}".format(self.get_id()))
         formatter = self.get_value("format")
         source = self.get_value("source").get(CollectionName.EXPORTS)
@@ -1649,7 +1902,7 @@ class Export(BaseCollectionItemDataContainer):
             open_target = io.StringIO()
         else:
             open_target = target.open()
-        formatter.write_data(source, open_target)
+        formatter.write_data(source, open_target, streaming=streaming, parallel=parallel)
 
     def validate(self):
         self.run_export(dry_run=True)
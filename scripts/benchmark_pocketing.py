@@ -0,0 +1,40 @@
+""" Measure the simple pocketing algorithm (calculating offset polygons) for all SVG samples.
+
+Usage: benchmark_pocketing.py [RELATIVE_LINE_DISTANCE]
+
+The distance between the pocketing lines is relative to the size of each model.
+"""
+
+import glob
+import os
+import sys
+from time import time
+
+from pycam.Importers.SVGDirectImporter import import_model
+from pycam.Toolpath.MotionGrid import PocketingType, get_pocketing_polygons_simple
+from pycam.Utils.locations import get_data_file_location
+
+DEFAULT_RELATIVE_LINE_DISTANCE = 0.02
+
+
+def run_pocketing(filename, relative_line_distance):
+    model = import_model(filename)
+    polygons = model.get_polygons()
+    line_distance = relative_line_distance * min(model.maxx - model.minx,
+                                                 model.maxy - model.miny)
+    start_time = time()
+    pocket_polygons = get_pocketing_polygons_simple(polygons, line_distance,
+                                                    PocketingType.HOLES)
+    return len(polygons), len(pocket_polygons), time() - start_time
+
+
+if __name__ == '__main__':
+    relative_line_distance = (float(sys.argv[1]) if len(sys.argv) > 1
+                              else DEFAULT_RELATIVE_LINE_DISTANCE)
+    total_time = 0
+    for filename in sorted(glob.glob(os.path.join(get_data_file_location("samples"), "*.svg"))):
+        input_count, output_count, run_time = run_pocketing(filename, relative_line_distance)
+        total_time += run_time
+        print("%-28s %5d polygons -> %6d pocketing polygons: %8.3f seconds"
+              % (os.path.basename(filename), input_count, output_count, run_time))
+    print("Total: %.3f seconds" % total_time)